@@ -1,9 +1,10 @@
+import re
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config, pool
 
 from alembic import context
-from backend.db import alembic_connection_url
+from backend.db import get_alembic_connection_url
 from backend.models import Base
 
 config = context.config
@@ -15,14 +16,30 @@ if config.config_file_name is not None:
 # Base allows alembic to make migrations automatically via the current SQL ALCHEMY SCHEMA defined in models.py
 target_metadata = Base.metadata
 
+# tables managed by `backend.partitions` and `backend.online_migrations`,
+# not by the ORM models
+UNMANAGED_TABLES = re.compile(
+    r"^(standard_timer_(y\d{4}m\d{2}|default|archive)|online_migration_progress)$"
+)
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    # keep autogenerate from dropping partitions and the archive table
+    return not (type_ == "table" and name and UNMANAGED_TABLES.match(name))
+
+
+# migrate one shard at a time: alembic -x shard=<name> upgrade head
+SHARD = context.get_x_argument(as_dictionary=True).get("shard")
+
 
 def run_migrations_offline() -> None:
-    url = alembic_connection_url
+    url = get_alembic_connection_url(SHARD)
     context.configure(
         url=url,
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -30,7 +47,7 @@ def run_migrations_offline() -> None:
 
 
 def run_migrations_online() -> None:
-    config.set_main_option("sqlalchemy.url", alembic_connection_url)
+    config.set_main_option("sqlalchemy.url", get_alembic_connection_url(SHARD))
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -38,7 +55,14 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            # revisions with an autocommit block commit everything before it,
+            # so every revision commits on its own anyway
+            transaction_per_migration=True,
+        )
         with context.begin_transaction():
             context.run_migrations()
 
@@ -0,0 +1,185 @@
+"""Partitioned standard_timer by created_at and added archive table
+
+Converts `standard_timer` into a table range partitioned by month on
+`created_at`. The primary key becomes (id, created_at) because Postgres
+requires the partition key in every unique constraint; ids still come from
+the same sequence so the ORM keeps addressing timers by `id`. Existing rows
+are copied into the new partitions, which locks the table for the duration
+of the copy.
+
+Revision ID: 5e81f0a7c2d4
+Revises: 3c9d2e41b7a0
+Create Date: 2026-10-19 10:41:27.904113
+
+"""
+
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5e81f0a7c2d4"
+down_revision: Union[str, Sequence[str], None] = "3c9d2e41b7a0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+COLUMNS = (
+    "id, user_id, minutes, hours, start_time, end_time, elapsed_seconds, "
+    "total_paused_seconds, total_pause_count, last_pause_time, is_started, "
+    "is_paused, is_completed, created_at, updated_at"
+)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("ALTER TABLE standard_timer RENAME TO standard_timer_legacy")
+    op.execute(
+        "ALTER TABLE standard_timer_legacy "
+        "RENAME CONSTRAINT standard_timer_pkey TO standard_timer_legacy_pkey"
+    )
+    op.execute(
+        "ALTER TABLE standard_timer_legacy RENAME CONSTRAINT "
+        "standard_timer_user_id_fkey TO standard_timer_legacy_user_id_fkey"
+    )
+    # keep the id sequence alive when the legacy table is dropped
+    op.execute("ALTER SEQUENCE standard_timer_id_seq OWNED BY NONE")
+    op.execute(
+        """
+        CREATE TABLE standard_timer (
+            id integer NOT NULL DEFAULT nextval('standard_timer_id_seq'),
+            user_id uuid NOT NULL,
+            minutes integer NOT NULL,
+            hours integer NOT NULL,
+            start_time timestamptz,
+            end_time timestamptz,
+            elapsed_seconds integer NOT NULL,
+            total_paused_seconds integer NOT NULL,
+            total_pause_count integer NOT NULL,
+            last_pause_time timestamptz,
+            is_started boolean NOT NULL,
+            is_paused boolean NOT NULL,
+            is_completed boolean NOT NULL,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            updated_at timestamptz NOT NULL DEFAULT now(),
+            CONSTRAINT standard_timer_pkey PRIMARY KEY (id, created_at),
+            CONSTRAINT standard_timer_user_id_fkey
+                FOREIGN KEY (user_id) REFERENCES users (user_id)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute("ALTER SEQUENCE standard_timer_id_seq OWNED BY standard_timer.id")
+    # catches rows outside every monthly partition if the maintenance job lags
+    op.execute(
+        "CREATE TABLE standard_timer_default PARTITION OF standard_timer DEFAULT"
+    )
+
+    oldest = (
+        op.get_bind()
+        .execute(sa.text("SELECT min(created_at) FROM standard_timer_legacy"))
+        .scalar()
+    )
+    today = datetime.now(timezone.utc).date()
+    month = (oldest.date() if oldest else today).replace(day=1)
+    last = _add_months(today.replace(day=1), MONTHS_AHEAD)
+    while month <= last:
+        upper = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE standard_timer_y{month.year}m{month.month:02d} "
+            f"PARTITION OF standard_timer FOR VALUES "
+            f"FROM ('{month.isoformat()} 00:00+00') TO ('{upper.isoformat()} 00:00+00')"
+        )
+        month = upper
+
+    op.execute(
+        f"INSERT INTO standard_timer ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM standard_timer_legacy"
+    )
+    op.execute("DROP TABLE standard_timer_legacy")
+    op.create_index("ix_standard_timer_user_id", "standard_timer", ["user_id"])
+    # active timers are the only ones read on the hot path
+    op.create_index(
+        "ix_standard_timer_active",
+        "standard_timer",
+        ["user_id"],
+        postgresql_where=sa.text("NOT is_completed"),
+    )
+
+    # completed timers moved out of old partitions, one row per user and month
+    op.create_table(
+        "standard_timer_archive",
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("month", sa.Date(), nullable=False),
+        sa.Column("timer_count", sa.Integer(), nullable=False),
+        sa.Column("timers", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column(
+            "archived_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("user_id", "month"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE standard_timer RENAME TO standard_timer_partitioned")
+    op.execute(
+        "ALTER TABLE standard_timer_partitioned RENAME CONSTRAINT "
+        "standard_timer_pkey TO standard_timer_partitioned_pkey"
+    )
+    op.execute(
+        "ALTER TABLE standard_timer_partitioned RENAME CONSTRAINT "
+        "standard_timer_user_id_fkey TO standard_timer_partitioned_user_id_fkey"
+    )
+    op.execute("ALTER SEQUENCE standard_timer_id_seq OWNED BY NONE")
+    op.execute(
+        """
+        CREATE TABLE standard_timer (
+            id integer NOT NULL DEFAULT nextval('standard_timer_id_seq'),
+            user_id uuid NOT NULL,
+            minutes integer NOT NULL,
+            hours integer NOT NULL,
+            start_time timestamptz,
+            end_time timestamptz,
+            elapsed_seconds integer NOT NULL,
+            total_paused_seconds integer NOT NULL,
+            total_pause_count integer NOT NULL,
+            last_pause_time timestamptz,
+            is_started boolean NOT NULL,
+            is_paused boolean NOT NULL,
+            is_completed boolean NOT NULL,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            updated_at timestamptz NOT NULL DEFAULT now(),
+            CONSTRAINT standard_timer_pkey PRIMARY KEY (id),
+            CONSTRAINT standard_timer_user_id_fkey
+                FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        """
+    )
+    op.execute("ALTER SEQUENCE standard_timer_id_seq OWNED BY standard_timer.id")
+    op.execute(
+        f"INSERT INTO standard_timer ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM standard_timer_partitioned"
+    )
+    # unpack archived timers back into rows
+    op.execute(
+        f"INSERT INTO standard_timer ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM ("
+        "SELECT timer.* FROM standard_timer_archive archive CROSS JOIN LATERAL "
+        "jsonb_populate_recordset(NULL::standard_timer, archive.timers) timer"
+        ") archived"
+    )
+    op.drop_table("standard_timer_archive")
+    # dropping the parent drops every partition with it
+    op.execute("DROP TABLE standard_timer_partitioned")
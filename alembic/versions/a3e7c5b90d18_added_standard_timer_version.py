@@ -0,0 +1,35 @@
+"""Added standard_timer.version for optimistic concurrency
+
+A constant default is stored in the catalog, so existing rows aren't
+rewritten and every partition gets the column at once.
+
+Revision ID: a3e7c5b90d18
+Revises: f1c5d8e3a7b2
+Create Date: 2026-10-19 19:04:12.530871
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a3e7c5b90d18"
+down_revision: Union[str, Sequence[str], None] = "f1c5d8e3a7b2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "standard_timer",
+        sa.Column("version", sa.Integer(), server_default=sa.text("1"), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("standard_timer", "version")
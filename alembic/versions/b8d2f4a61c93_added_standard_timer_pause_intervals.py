@@ -0,0 +1,41 @@
+"""Added standard_timer.pause_intervals
+
+Packed pauses, see backend.pause_intervals. Like the version column, the
+constant default doesn't rewrite existing rows, which start empty.
+
+Revision ID: b8d2f4a61c93
+Revises: a3e7c5b90d18
+Create Date: 2026-10-19 19:41:27.116094
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b8d2f4a61c93"
+down_revision: Union[str, Sequence[str], None] = "a3e7c5b90d18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "standard_timer",
+        sa.Column(
+            "pause_intervals",
+            postgresql.ARRAY(sa.Integer()),
+            server_default=sa.text("'{}'"),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("standard_timer", "pause_intervals")
@@ -0,0 +1,56 @@
+"""Time-ordered UUIDv7 user ids
+
+Existing UUIDv4 user ids are kept, only new ids are time-ordered. The app
+generates them itself, the server default covers rows inserted outside it.
+
+Revision ID: c4a8e2f17b95
+Revises: 9b4f6c1d2e83
+Create Date: 2026-10-19 16:48:12.503117
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c4a8e2f17b95"
+down_revision: Union[str, Sequence[str], None] = "9b4f6c1d2e83"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # same function as backend.ids.UUID_V7_FUNCTION_SQL at this revision
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION uuid_generate_v7() RETURNS uuid AS $$
+            SELECT encode(
+                set_bit(
+                    set_bit(
+                        overlay(
+                            uuid_send(gen_random_uuid())
+                            placing substring(
+                                int8send(floor(extract(epoch FROM clock_timestamp()) * 1000)::bigint)
+                                FROM 3
+                            )
+                            FROM 1 FOR 6
+                        ),
+                        52, 1
+                    ),
+                    53, 1
+                ),
+                'hex'
+            )::uuid
+        $$ LANGUAGE sql VOLATILE
+        """
+    )
+    op.execute("ALTER TABLE users ALTER COLUMN user_id SET DEFAULT uuid_generate_v7()")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # v7 ids created meanwhile stay valid UUIDs
+    op.execute("ALTER TABLE users ALTER COLUMN user_id DROP DEFAULT")
+    op.execute("DROP FUNCTION uuid_generate_v7()")
@@ -0,0 +1,44 @@
+"""Added usage counter tables
+
+Revision ID: d7f3b9a14c62
+Revises: c4a8e2f17b95
+Create Date: 2026-10-19 17:21:40.118204
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d7f3b9a14c62"
+down_revision: Union[str, Sequence[str], None] = "c4a8e2f17b95"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "usage_minute_counts",
+        sa.Column("minute", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("event", sa.String(length=32), nullable=False),
+        sa.Column("worker_id", sa.String(length=32), nullable=False),
+        sa.Column("count", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("minute", "event", "worker_id"),
+    )
+    op.create_table(
+        "usage_daily_users",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("worker_id", sa.String(length=32), nullable=False),
+        sa.Column("registers", sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint("day", "worker_id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("usage_daily_users")
+    op.drop_table("usage_minute_counts")
@@ -0,0 +1,131 @@
+"""Added timezones table referenced by users.timezone_id
+
+Online, first of two steps. Users keep their `timezone` name alongside the
+new `timezone_id` and a trigger fills whichever one a writer left out, so
+old and new app versions can run side by side. Rows are backfilled in
+batches committed one at a time, and the foreign key and NOT NULL are
+validated without holding a lock that blocks writes. Upgrade to the next
+revision to drop the name once every worker runs the new version.
+
+Revision ID: e2b6a9c4d1f7
+Revises: d7f3b9a14c62
+Create Date: 2026-10-19 17:52:06.314470
+
+"""
+
+from typing import Sequence, Union
+from zoneinfo import available_timezones
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e2b6a9c4d1f7"
+down_revision: Union[str, Sequence[str], None] = "d7f3b9a14c62"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10_000
+
+SYNC_FUNCTION = """
+CREATE OR REPLACE FUNCTION users_sync_timezone() RETURNS trigger AS $$
+BEGIN
+    IF NEW.timezone_id IS NULL AND NEW.timezone IS NOT NULL THEN
+        INSERT INTO timezones (id, name)
+        SELECT COALESCE(MAX(id), 0) + 1, NEW.timezone FROM timezones
+        ON CONFLICT DO NOTHING;
+        SELECT id INTO NEW.timezone_id FROM timezones WHERE name = NEW.timezone;
+    ELSIF NEW.timezone IS NULL AND NEW.timezone_id IS NOT NULL THEN
+        SELECT name INTO NEW.timezone FROM timezones WHERE id = NEW.timezone_id;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    timezones = op.create_table(
+        "timezones",
+        sa.Column("id", sa.SmallInteger(), autoincrement=False, nullable=False),
+        sa.Column("name", sa.String(length=64), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    # same numbering as backend.timezones.iana_rows
+    op.bulk_insert(
+        timezones,
+        [
+            {"id": timezone_id, "name": name}
+            for timezone_id, name in enumerate(sorted(available_timezones()), start=1)
+        ],
+    )
+    # names users already have that the installed tzdata doesn't know
+    op.execute(
+        """
+        INSERT INTO timezones (id, name)
+        SELECT (SELECT MAX(id) FROM timezones) + ROW_NUMBER() OVER (ORDER BY timezone),
+               timezone
+        FROM (SELECT DISTINCT timezone FROM users) AS legacy
+        WHERE timezone NOT IN (SELECT name FROM timezones)
+        """
+    )
+    op.add_column("users", sa.Column("timezone_id", sa.SmallInteger(), nullable=True))
+    # new app versions no longer write the name
+    op.alter_column("users", "timezone", existing_type=sa.String(), nullable=True)
+    op.execute(SYNC_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER users_sync_timezone BEFORE INSERT OR UPDATE ON users "
+        "FOR EACH ROW EXECUTE FUNCTION users_sync_timezone()"
+    )
+    with op.get_context().autocommit_block():
+        # short transactions, so row locks are held one batch at a time
+        while True:
+            result = op.get_bind().execute(
+                sa.text(
+                    """
+                    UPDATE users SET timezone_id = timezones.id
+                    FROM timezones
+                    WHERE users.timezone = timezones.name
+                      AND users.user_id IN (
+                          SELECT user_id FROM users
+                          WHERE timezone_id IS NULL
+                          LIMIT :batch_size
+                      )
+                    """
+                ),
+                {"batch_size": BATCH_SIZE},
+            )
+            if result.rowcount == 0:
+                break
+        # NOT VALID constraints are added without a scan, validating them
+        # doesn't block writes
+        op.execute(
+            "ALTER TABLE users ADD CONSTRAINT users_timezone_id_fkey "
+            "FOREIGN KEY (timezone_id) REFERENCES timezones (id) NOT VALID"
+        )
+        op.execute("ALTER TABLE users VALIDATE CONSTRAINT users_timezone_id_fkey")
+        op.execute(
+            "ALTER TABLE users ADD CONSTRAINT users_timezone_id_not_null "
+            "CHECK (timezone_id IS NOT NULL) NOT VALID"
+        )
+        op.execute("ALTER TABLE users VALIDATE CONSTRAINT users_timezone_id_not_null")
+        # proven by the validated check, so this skips the table scan
+        op.execute("ALTER TABLE users ALTER COLUMN timezone_id SET NOT NULL")
+        op.execute("ALTER TABLE users DROP CONSTRAINT users_timezone_id_not_null")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER users_sync_timezone ON users")
+    op.execute("DROP FUNCTION users_sync_timezone()")
+    op.execute(
+        "UPDATE users SET timezone = timezones.name FROM timezones "
+        "WHERE users.timezone IS NULL AND timezones.id = users.timezone_id"
+    )
+    op.alter_column("users", "timezone", existing_type=sa.String(), nullable=False)
+    op.drop_constraint("users_timezone_id_fkey", "users", type_="foreignkey")
+    op.drop_column("users", "timezone_id")
+    op.drop_table("timezones")
@@ -0,0 +1,60 @@
+"""Dropped users.timezone now that users reference timezones by id
+
+Second step of e2b6a9c4d1f7, run once no worker writes the name anymore.
+
+Revision ID: f1c5d8e3a7b2
+Revises: e2b6a9c4d1f7
+Create Date: 2026-10-19 17:58:44.901255
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f1c5d8e3a7b2"
+down_revision: Union[str, Sequence[str], None] = "e2b6a9c4d1f7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# same function as in e2b6a9c4d1f7
+SYNC_FUNCTION = """
+CREATE OR REPLACE FUNCTION users_sync_timezone() RETURNS trigger AS $$
+BEGIN
+    IF NEW.timezone_id IS NULL AND NEW.timezone IS NOT NULL THEN
+        INSERT INTO timezones (id, name)
+        SELECT COALESCE(MAX(id), 0) + 1, NEW.timezone FROM timezones
+        ON CONFLICT DO NOTHING;
+        SELECT id INTO NEW.timezone_id FROM timezones WHERE name = NEW.timezone;
+    ELSIF NEW.timezone IS NULL AND NEW.timezone_id IS NOT NULL THEN
+        SELECT name INTO NEW.timezone FROM timezones WHERE id = NEW.timezone_id;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("DROP TRIGGER users_sync_timezone ON users")
+    op.execute("DROP FUNCTION users_sync_timezone()")
+    # dropping a column only updates the catalog, rows aren't rewritten
+    op.drop_column("users", "timezone")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column("users", sa.Column("timezone", sa.String(), nullable=True))
+    op.execute(
+        "UPDATE users SET timezone = timezones.name FROM timezones "
+        "WHERE timezones.id = users.timezone_id"
+    )
+    op.execute(SYNC_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER users_sync_timezone BEFORE INSERT OR UPDATE ON users "
+        "FOR EACH ROW EXECUTE FUNCTION users_sync_timezone()"
+    )
@@ -0,0 +1,84 @@
+"""
+Routing file for operational endpoints, all paths will be prefixed with /admin
+"""
+
+import os
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import backend.pause_intervals as pause_intervals
+import backend.usage as usage
+from backend.db import get_db
+from backend.models import StandardTimer
+from backend.rate_limit import limiters
+
+
+def is_admin_token(token: str | None) -> bool:
+    """
+    Tests if a token matches the `ADMIN_TOKEN` env variable
+    :param token: admin token
+    :return: bool: True if the token is set and matches, False otherwise
+    """
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected or token is None:
+        return False
+    return secrets.compare_digest(token, expected)
+
+
+async def require_admin_token(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    Ensures the X-Admin-Token header matches the `ADMIN_TOKEN` env variable
+    :param x_admin_token: admin token
+    :return: None if authorized, else raise HttpException
+    """
+    if x_admin_token is None:
+        raise HTTPException(status_code=403, detail="Admin token required")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(
+    prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin_token)]
+)
+
+
+@router.get("/rate-limits")
+async def get_rate_limits() -> dict[str, dict[str, int | float]]:
+    return {group: limiter.stats() for group, limiter in limiters.items()}
+
+
+@router.get("/usage")
+async def get_usage(
+    minutes: int = Query(60, ge=1, le=24 * 60),
+    db: AsyncSession = Depends(get_db),
+) -> dict[str, Any]:
+    # includes this worker's latest counts, other workers lag by a flush
+    await usage.recorder.flush(db)
+    now = datetime.now(timezone.utc)
+    since = now.replace(second=0, microsecond=0) - timedelta(minutes=minutes - 1)
+    counts = await usage.get_events_per_minute(since, db)
+    return {
+        "day": now.date().isoformat(),
+        "active_users": await usage.get_active_users(now.date(), db),
+        "timers_per_minute": [
+            {
+                "minute": minute.isoformat(),
+                **{event: events.get(event, 0) for event in usage.TRANSITION_EVENTS},
+            }
+            for minute, events in counts.items()
+        ],
+    }
+
+
+@router.get("/pauses")
+async def get_pauses(
+    days: int = Query(30, ge=1, le=366),
+    db: AsyncSession = Depends(get_db),
+) -> dict[str, Any]:
+    # timers created in the window, so only their partitions are scanned
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    return await pause_intervals.get_pause_stats(db, StandardTimer.created_at >= since)
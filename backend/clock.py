@@ -0,0 +1,40 @@
+"""
+Server clock used to keep clients in sync.
+
+Clients estimate their offset from the server NTP style: they record their
+own clock before (t0) and after (t3) calling `/time`, then
+offset = server_time - (t0 + t3) / 2 with an error bound of (t3 - t0) / 2.
+Every timer response also carries the instant it was computed at, so a
+client can render a countdown from a single state fetch.
+"""
+
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+
+def now() -> datetime:
+    """
+    Gets the current server time
+    :return: datetime: Timezone aware UTC timestamp
+    """
+    return datetime.now(timezone.utc)
+
+
+def server_time_body() -> bytes:
+    """
+    Builds the `/time` response body. Serialised by hand so the timestamp is
+    taken as late as possible and without validation overhead
+    :return: bytes: JSON body with the ISO 8601 time and Unix epoch milliseconds
+    """
+    nanoseconds = time.time_ns()
+    seconds, remainder = divmod(nanoseconds, 1_000_000_000)
+    instant = datetime.fromtimestamp(seconds, timezone.utc) + timedelta(
+        microseconds=remainder // 1000
+    )
+    return json.dumps(
+        {
+            "server_time": instant.isoformat(),
+            "epoch_ms": nanoseconds / 1_000_000,
+        }
+    ).encode()
@@ -1,36 +1,303 @@
+import asyncio
+import bisect
+import hashlib
 import os
+import random
+import time
+import uuid
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Iterable
 
 from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from fastapi import Request
+from sqlalchemy import make_url, text
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-load_dotenv()
-
-connection_url: str = f"postgresql+asyncpg://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
-alembic_connection_url: str = f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
-engine = create_async_engine(
-    connection_url,
-    pool_size=20,
-    max_overflow=0,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    echo=False,
-    future=True,
-)
+from backend.ids import uuid7
+from backend.load_shedding import shedder
 
 Base = declarative_base()
 
-async_session_generator = async_sessionmaker(engine, expire_on_commit=False)
+# names the database in DB_* when DB_SHARDS isn't set
+DEFAULT_SHARD = "primary"
+VNODES: int = 128  # ring points per shard, more spread users more evenly
+POOL_SIZE: int = 20  # connections per shard
+
+# created on first use so importing the app doesn't build the pools
+_shard_map: "ShardMap | None" = None
+
+
+def _database_url(
+    driver: str,
+    host: str | None = None,
+    port: str | None = None,
+    name: str | None = None,
+) -> str:
+    load_dotenv()
+    return f"postgresql+{driver}://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{host or os.getenv('DB_HOST')}:{port or os.getenv('DB_PORT')}/{name or os.getenv('DB_NAME')}"
+
+
+def get_connection_url(shard: str | None = None) -> str:
+    return get_shard_map().url(shard, "asyncpg")
+
+
+def get_alembic_connection_url(shard: str | None = None) -> str:
+    return get_shard_map().url(shard, "psycopg2")
 
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+class TimedQueuePool(AsyncAdaptedQueuePool):
     """
-    Yields a database connection used via dependency injections
-    in fast api endpoint handling
+    Connection pool reporting how long each checkout waited to the load shedder
     """
-    async with async_session_generator() as session:
+
+    def _do_get(self):  # type: ignore[no-untyped-def]
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            shedder.record_pool_wait(time.perf_counter() - start)
+
+
+def _ring_hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring. Every shard owns `vnodes` points, a key belongs to
+    the first point after its hash, so adding a shard only moves the keys
+    that land on the new shard's points
+    """
+
+    def __init__(self, names: Iterable[str], vnodes: int = VNODES) -> None:
+        points = sorted(
+            (_ring_hash(f"{name}#{n}".encode()), name)
+            for name in names
+            for n in range(vnodes)
+        )
+        if not points:
+            raise ValueError("a ring needs at least one shard")
+        self.points = [point for point, _ in points]
+        self.names = [name for _, name in points]
+
+    def get(self, key: bytes) -> str:
+        index = bisect.bisect(self.points, _ring_hash(key)) % len(self.points)
+        return self.names[index]
+
+
+class ShardMap:
+    """
+    Databases holding users and everything they own, with the ring assigning
+    users to them. Usage counts are kept on the primary, the first shard,
+    which also numbers the timezones every shard holds a copy of. Idempotency
+    keys are stored next to what their request wrote: on the user's shard, or
+    for a new user on the shard `get_new_user_db` picks from the key
+    """
+
+    def __init__(
+        self, urls: dict[str, str], previous: Iterable[str] | None = None
+    ) -> None:
+        """
+        :param urls: Async database URL of every shard by name, primary first
+        :param previous: Shard names before the last shard was added, while
+        users are being moved to it
+        """
+        self.urls = urls
+        self.names = list(urls)
+        self.primary = self.names[0]
+        self.ring = HashRing(self.names)
+        self.previous_ring: HashRing | None = None
+        if previous:
+            previous = list(previous)
+            unknown = set(previous) - set(urls)
+            if unknown:
+                raise ValueError(f"unknown previous shards {sorted(unknown)}")
+            self.previous_ring = HashRing(previous)
+        self.engines: dict[str, AsyncEngine] = {}
+        self.session_generators: dict[str, async_sessionmaker[AsyncSession]] = {}
+        self.closing = False  # set by `dispose`, refuses new engines
+
+    def url(self, shard: str | None, driver: str) -> str:
+        url = make_url(self.urls[shard or self.primary])
+        return url.set(drivername=f"postgresql+{driver}").render_as_string(
+            hide_password=False
+        )
+
+    def engine(self, shard: str | None = None) -> AsyncEngine:
+        """
+        Gets a shard's engine, creating it and its pool on first use
+        :param shard: Shard name, defaults to the primary
+        :raises RuntimeError: if the map is being disposed and the shard has
+            no engine yet
+        """
+        shard = shard or self.primary
+        engine = self.engines.get(shard)
+        if engine is None:
+            if self.closing:
+                # it would never be disposed
+                raise RuntimeError(f"shard map is closing, no engine for {shard}")
+            engine = self.engines[shard] = create_async_engine(
+                self.urls[shard],
+                poolclass=TimedQueuePool,
+                pool_size=POOL_SIZE,
+                max_overflow=0,
+                pool_pre_ping=True,
+                pool_recycle=3600,
+                echo=False,
+                future=True,
+            )
+        return engine
+
+    def session_generator(
+        self, shard: str | None = None
+    ) -> async_sessionmaker[AsyncSession]:
+        """
+        Gets the session factory of a shard, its sessions carry the shard's
+        name in `session.info["shard"]`
+        :param shard: Shard name, defaults to the primary
+        """
+        shard = shard or self.primary
+        generator = self.session_generators.get(shard)
+        if generator is None:
+            generator = self.session_generators[shard] = async_sessionmaker(
+                self.engine(shard), expire_on_commit=False, info={"shard": shard}
+            )
+        return generator
+
+    def home(self, user_id: uuid.UUID) -> str:
+        """
+        Gets the shard a user belongs on
+        :param user_id: User's UUID
+        :return: str: Shard name
+        """
+        return self.ring.get(user_id.bytes)
+
+    async def locate(self, user_id: uuid.UUID) -> str:
+        """
+        Gets the shard holding a user. While users are being moved to a new
+        shard, one not moved yet is still on its previous shard
+        :param user_id: User's UUID
+        :return: str: Shard name
+        """
+        home = self.home(user_id)
+        if self.previous_ring is None:
+            return home
+        previous = self.previous_ring.get(user_id.bytes)
+        if previous == home:
+            return home
+        async with self.engine(home).connect() as connection:
+            moved = await connection.scalar(
+                text("SELECT EXISTS (SELECT 1 FROM users WHERE user_id = :user_id)"),
+                {"user_id": user_id},
+            )
+        return home if moved else previous
+
+    async def dispose(self, drain_timeout: float = 10.0) -> None:
+        """
+        Waits for checked out connections to be returned to the pools, then
+        closes every connection. Sessions can still be opened on the existing
+        engines meanwhile, no new engine is created
+        :param drain_timeout: Seconds to wait for in-flight sessions to finish
+        """
+        self.closing = True
+        engines = list(self.engines.values())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + drain_timeout
+        while (
+            any(engine.pool.checkedout() > 0 for engine in engines)  # type: ignore[attr-defined]
+            and loop.time() < deadline
+        ):
+            await asyncio.sleep(0.05)
+        for engine in engines:
+            await engine.dispose()
+        self.engines.clear()
+        self.session_generators.clear()
+
+
+def load_shard_map() -> ShardMap:
+    """
+    Builds the shard map from the environment. `DB_SHARDS` lists the shards
+    as comma separated `name=[host[:port]/]database` entries, the host and
+    port defaulting to DB_HOST and DB_PORT. Without it the database in DB_*
+    is the only shard. `DB_SHARDS_PREVIOUS` lists the names before the last
+    shard was added, set only while `python -m backend.shards rebalance` runs
+    """
+    load_dotenv()
+    spec = os.getenv("DB_SHARDS")
+    if not spec:
+        return ShardMap({DEFAULT_SHARD: _database_url("asyncpg")})
+    urls = {}
+    for entry in spec.split(","):
+        name, _, location = entry.strip().partition("=")
+        address, _, database = location.rpartition("/")
+        host, _, port = address.partition(":")
+        urls[name] = _database_url("asyncpg", host or None, port or None, database)
+    previous = os.getenv("DB_SHARDS_PREVIOUS")
+    return ShardMap(urls, previous.split(",") if previous else None)
+
+
+def get_shard_map() -> ShardMap:
+    global _shard_map
+    if _shard_map is None:
+        _shard_map = load_shard_map()
+    return _shard_map
+
+
+def get_engine(shard: str | None = None) -> AsyncEngine:
+    """
+    Gets the engine of a shard, the primary by default
+    """
+    return get_shard_map().engine(shard)
+
+
+def get_session_generator(
+    shard: str | None = None,
+) -> async_sessionmaker[AsyncSession]:
+    """
+    Gets the session factory bound to a shard, the primary by default
+    """
+    return get_shard_map().session_generator(shard)
+
+
+async def dispose_engine(drain_timeout: float = 10.0) -> None:
+    """
+    Closes the connections of every shard. Called when the application shuts
+    down
+    :param drain_timeout: Seconds to wait for in-flight sessions to finish
+    """
+    global _shard_map
+    if _shard_map is None:
+        return
+    shard_map = _shard_map
+    # kept registered while it drains, so late callers reuse its engines
+    # instead of building a new map whose pools nobody disposes
+    await shard_map.dispose(drain_timeout)
+    if _shard_map is shard_map:
+        _shard_map = None
+
+
+def get_route_user_id(request: Request) -> uuid.UUID | None:
+    """
+    Gets the user a request is for, from the X-User-ID header or the path UUID
+    :param request: Incoming request
+    :return: UUID, or None if missing or malformed (the handler rejects those)
+    """
+    value = request.headers.get("x-user-id") or request.path_params.get("user_uuid")
+    try:
+        return uuid.UUID(value) if value else None
+    except ValueError:
+        return None
+
+
+async def _yield_session(shard: str) -> AsyncGenerator[AsyncSession, None]:
+    async with get_session_generator(shard)() as session:
         try:
             yield session
         except Exception:
@@ -40,12 +307,54 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Yields a database connection used via dependency injections
+    in fast api endpoint handling, on the shard of the request's user.
+    Requests without a user get the primary
+    """
+    shard_map = get_shard_map()
+    user_id = get_route_user_id(request)
+    shard = await shard_map.locate(user_id) if user_id else shard_map.primary
+    async for session in _yield_session(shard):
+        yield session
+
+
+async def get_new_user_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Yields a database connection for creating a user, on a shard picked by
+    the Idempotency-Key so a retry finds the stored response, else at random.
+    Create the user with an id from `new_user_id`
+    """
+    shard_map = get_shard_map()
+    key = request.headers.get("idempotency-key")
+    shard = shard_map.ring.get(key.encode()) if key else random.choice(shard_map.names)
+    async for session in _yield_session(shard):
+        yield session
+
+
+def new_user_id(db: AsyncSession) -> uuid.UUID:
+    """
+    Generates a user id the ring assigns to the session's shard. Takes as many
+    tries as there are shards on average
+    :param db: Session from `get_new_user_db`
+    :return: UUID
+    """
+    shard = db.info.get("shard")
+    shard_map = get_shard_map()
+    while True:
+        user_id = uuid7()
+        if shard is None or shard_map.home(user_id) == shard:
+            return user_id
+
+
 @asynccontextmanager
-async def general_db() -> AsyncGenerator[AsyncSession, None]:
+async def general_db(shard: str | None = None) -> AsyncGenerator[AsyncSession, None]:
     """
     Yields a database connection used via regular async functions
+    :param shard: Shard name, defaults to the primary
     """
-    async with async_session_generator() as session:
+    async with get_session_generator(shard)() as session:
         try:
             yield session
         except Exception:
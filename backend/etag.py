@@ -0,0 +1,137 @@
+"""
+Weak ETag support for read endpoints.
+
+ETags are derived from `updated_at`. The latest ETag of every row served by
+this worker is remembered in a bounded version map, so a matching
+If-None-Match can be answered with a 304 before the row is loaded. Entries
+are dropped when this process updates the row and expire after a short TTL
+so writes made by other workers are picked up.
+"""
+
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable
+
+from fastapi import Response
+from sqlalchemy import event
+
+from backend.models import StandardTimer, User
+
+CACHE_CONTROL: str = "private, no-cache"  # always revalidate with the server
+VERSION_TTL_SECONDS: float = 5.0
+MAX_VERSIONS: int = 100_000
+
+
+class VersionMap:
+    """
+    LRU map of resource key to its latest known ETag
+    """
+
+    def __init__(
+        self,
+        max_entries: int = MAX_VERSIONS,
+        ttl_seconds: float = VERSION_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    def get(self, key: str) -> str | None:
+        """
+        Gets the latest known ETag for a resource
+        :param key: Resource key
+        :return: ETag, or None if unknown or expired
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        tag, expires_at = entry
+        if expires_at <= self.clock():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return tag
+
+    def set(self, key: str, tag: str) -> None:
+        """
+        Remembers the ETag of a resource, evicting the least recently used entry
+        :param key: Resource key
+        :param tag: ETag of the resource
+        """
+        self.entries[key] = (tag, self.clock() + self.ttl_seconds)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        """
+        Forgets the ETag of a resource
+        :param key: Resource key
+        """
+        self.entries.pop(key, None)
+
+
+versions = VersionMap()
+
+
+def user_key(user_id: Any) -> str:
+    return f"user:{user_id}"
+
+
+def standard_timer_key(user_id: Any, timer_id: Any) -> str:
+    return f"standard:{user_id}:{timer_id}"
+
+
+def make_etag(updated_at: datetime) -> str:
+    """
+    Builds a weak ETag from a row's `updated_at`
+    :param updated_at: Last update time of the row
+    :return: str: Weak ETag
+    """
+    return f'W/"{int(updated_at.timestamp() * 1_000_000):x}"'
+
+
+def matches(if_none_match: str | None, tag: str | None) -> bool:
+    """
+    Weakly compares an If-None-Match header against an ETag
+    :param if_none_match: If-None-Match header value
+    :param tag: Current ETag of the resource
+    :return: bool: True if the client's copy is current, False otherwise
+    """
+    if if_none_match is None or tag is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = tag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def set_headers(response: Response, tag: str) -> None:
+    response.headers["ETag"] = tag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def not_modified(tag: str) -> Response:
+    response = Response(status_code=304)
+    set_headers(response, tag)
+    return response
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user(mapper: Any, connection: Any, target: User) -> None:
+    versions.invalidate(user_key(target.user_id))
+
+
+@event.listens_for(StandardTimer, "after_update")
+@event.listens_for(StandardTimer, "after_delete")
+def _invalidate_standard_timer(
+    mapper: Any, connection: Any, target: StandardTimer
+) -> None:
+    versions.invalidate(standard_timer_key(target.user_id, target.id))
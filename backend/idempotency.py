@@ -0,0 +1,267 @@
+"""
+Idempotency-Key support for POST endpoints.
+
+Responses are saved in the same transaction as the rows the handler creates,
+so a retried request is answered from the stored response instead of
+creating duplicate rows. Stored responses are read through a bounded
+in-memory cache, filled when the first request commits, so hot retries skip
+the database entirely. Keys are scoped to the route and the X-User-ID. Routes
+used before a user exists scope them to the route only: keys are random, and
+a key reused for a different body is rejected.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+
+from fastapi import Header
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models import IdempotencyRecord
+
+IDEMPOTENCY_TTL_SECONDS: int = 24 * 60 * 60  # how long a key can be replayed
+MAX_CACHED_RESPONSES: int = 10_000
+
+
+class CachedResponse:
+    """
+    Stored response kept in the in-memory cache
+    """
+
+    __slots__ = ("request_hash", "status_code", "body", "expires_at")
+
+    def __init__(
+        self, request_hash: str, status_code: int, body: Any, expires_at: float
+    ) -> None:
+        self.request_hash = request_hash
+        self.status_code = status_code
+        self.body = body
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """
+    LRU cache of stored responses with a per entry time to live
+    """
+
+    def __init__(
+        self,
+        max_entries: int = MAX_CACHED_RESPONSES,
+        ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.entries: OrderedDict[str, CachedResponse] = OrderedDict()
+
+    def get(self, key: str) -> CachedResponse | None:
+        """
+        Gets a cached response, dropping it if it has expired
+        :param key: Scoped idempotency key
+        :return: CachedResponse or None
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= self.clock():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def set(
+        self, key: str, request_hash: str, status_code: int, body: Any, ttl: float
+    ) -> None:
+        """
+        Caches a response, evicting the least recently used entry when full
+        :param key: Scoped idempotency key
+        :param request_hash: Fingerprint of the request that produced the response
+        :param status_code: Response status code
+        :param body: JSON response body
+        :param ttl: Seconds the entry stays valid, capped at the cache TTL
+        """
+        expires_at = self.clock() + min(ttl, self.ttl_seconds)
+        self.entries[key] = CachedResponse(request_hash, status_code, body, expires_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+response_cache = ResponseCache()
+
+
+async def get_idempotency_key(
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+) -> str | None:
+    """
+    Gets the optional Idempotency-Key from provided header
+    :param idempotency_key: client generated key, usually a UUID
+    :return: key if provided, else None
+    """
+    return idempotency_key
+
+
+class IdempotentRequest:
+    """
+    Scoped key and body fingerprint of a request sent with an Idempotency-Key,
+    and the response saved for it
+    """
+
+    __slots__ = ("key", "request_hash", "status_code", "body")
+
+    def __init__(self, key: str, request_hash: str) -> None:
+        self.key = key
+        self.request_hash = request_hash
+        self.status_code: int | None = None
+        self.body: Any = None
+
+
+def for_request(
+    route: str,
+    idempotency_key: str | None,
+    data: BaseModel,
+    user_id: str | None = None,
+) -> IdempotentRequest | None:
+    """
+    Scopes the client key to the route and user so the same key can't collide
+    across them, and fingerprints the body so a key can't be reused for a
+    different request. Not scoped to the client's address, which a mobile
+    client retrying may have changed
+    :param route: Name of the route the key is used on
+    :param idempotency_key: Key sent by the client
+    :param data: Validated request body
+    :param user_id: X-User-ID of the caller, if any
+    :return: IdempotentRequest, or None if no key was sent
+    """
+    if idempotency_key is None:
+        return None
+    raw = f"{route}\x00{user_id or ''}\x00{idempotency_key}"
+    return IdempotentRequest(
+        key=hashlib.sha256(raw.encode()).hexdigest(),
+        request_hash=hashlib.sha256(data.model_dump_json().encode()).hexdigest(),
+    )
+
+
+def _replay(entry: CachedResponse, request: IdempotentRequest) -> JSONResponse:
+    if entry.request_hash != request.request_hash:
+        return JSONResponse(
+            status_code=422,
+            content={
+                "message": "Idempotency-Key was already used with a different request"
+            },
+        )
+    return JSONResponse(
+        status_code=entry.status_code,
+        content=entry.body,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+async def get_stored_response(
+    request: IdempotentRequest, db: AsyncSession
+) -> JSONResponse | None:
+    """
+    Gets the stored response for a request, checking the cache before the database
+    :param request: Idempotent request
+    :param db: Database session
+    :return: JSONResponse replaying the stored response, or None if unseen
+    """
+    entry = response_cache.get(request.key)
+    if entry is not None:
+        return _replay(entry, request)
+    record: IdempotencyRecord | None = await db.get(IdempotencyRecord, request.key)
+    if record is None:
+        return None
+    age = datetime.now(timezone.utc) - record.created_at
+    remaining = IDEMPOTENCY_TTL_SECONDS - age.total_seconds()
+    if remaining <= 0:
+        # expired, the key can be used again
+        await db.delete(record)
+        await db.flush()
+        return None
+    response_cache.set(
+        request.key,
+        record.request_hash,
+        record.status_code,
+        record.response_body,
+        remaining,
+    )
+    return _replay(response_cache.entries[request.key], request)
+
+
+def save_response(
+    request: IdempotentRequest,
+    response: BaseModel,
+    db: AsyncSession,
+    status_code: int = 200,
+) -> None:
+    """
+    Adds the response to the session so it is committed with the handler's rows
+    :param request: Idempotent request
+    :param response: Response returned by the handler
+    :param db: Database session
+    :param status_code: Response status code
+    """
+    request.status_code = status_code
+    request.body = response.model_dump(mode="json")
+    db.add(
+        IdempotencyRecord(
+            key=request.key,
+            request_hash=request.request_hash,
+            status_code=status_code,
+            response_body=request.body,
+        )
+    )
+
+
+async def commit_or_replay(
+    request: IdempotentRequest | None, db: AsyncSession
+) -> JSONResponse | None:
+    """
+    Commits the handler's transaction and caches the saved response. If a
+    concurrent retry with the same key committed first, the transaction is
+    rolled back and its response replayed
+    :param request: Idempotent request, or None if no key was sent
+    :param db: Database session
+    :return: JSONResponse replaying the winning response, or None if committed
+    """
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        if request is None:
+            raise
+        stored = await get_stored_response(request, db)
+        if stored is None:
+            raise
+        return stored
+    if request is not None and request.status_code is not None:
+        response_cache.set(
+            request.key,
+            request.request_hash,
+            request.status_code,
+            request.body,
+            IDEMPOTENCY_TTL_SECONDS,
+        )
+    return None
+
+
+async def purge_expired_responses(db: AsyncSession) -> int:
+    """
+    Deletes stored responses older than the TTL
+    :param db: Database session
+    :return: int: Number of deleted rows
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+    result = await db.execute(
+        delete(IdempotencyRecord).where(IdempotencyRecord.created_at < cutoff)
+    )
+    await db.commit()
+    return result.rowcount  # type: ignore[attr-defined]
@@ -0,0 +1,125 @@
+"""
+Load shedding for when the connection pool can't keep up.
+
+Once every pooled connection is busy, further requests wait for one inside
+the session until their clients give up, and the queue makes everyone slow.
+The pool reports how long each checkout waited and a middleware counts the
+requests in flight. Past either threshold, routes depending on `shed_load`
+answer 503 with `Retry-After` right away, leaving the pool to the timer
+transitions, which stay admitted. `GET /ready` reports the same state so a
+load balancer can send traffic to other workers.
+"""
+
+import math
+import os
+import time
+from typing import Callable
+
+from fastapi import HTTPException
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# average checkout wait that counts as overloaded
+MAX_POOL_WAIT_SECONDS: float = (
+    float(os.getenv("LOAD_SHED_MAX_POOL_WAIT_MS", "50")) / 1000
+)
+# requests being served by this worker
+MAX_IN_FLIGHT: int = int(os.getenv("LOAD_SHED_MAX_IN_FLIGHT", "64"))
+WAIT_HALF_LIFE_SECONDS: float = 1.0  # the average decays when nothing checks out
+WAIT_SMOOTHING: float = 0.2  # weight of the newest checkout in the average
+
+
+class LoadShedder:
+    """
+    Tracks pool checkout wait and requests in flight for this worker
+    """
+
+    def __init__(
+        self,
+        max_pool_wait: float = MAX_POOL_WAIT_SECONDS,
+        max_in_flight: float = MAX_IN_FLIGHT,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_pool_wait = max_pool_wait
+        self.max_in_flight = max_in_flight
+        self.clock = clock
+        self.in_flight = 0
+        self.draining = False  # set on shutdown
+        self.counters: dict[str, int] = {"shed": 0}
+        self._wait = 0.0
+        self._wait_updated_at = clock()
+
+    def pool_wait(self) -> float:
+        """
+        Gets the recent average checkout wait, decayed while no one checks out
+        :return: float: Seconds
+        """
+        elapsed = self.clock() - self._wait_updated_at
+        return self._wait * 0.5 ** (elapsed / WAIT_HALF_LIFE_SECONDS)
+
+    def record_pool_wait(self, seconds: float) -> None:
+        current = self.pool_wait()
+        self._wait = current + WAIT_SMOOTHING * (seconds - current)
+        self._wait_updated_at = self.clock()
+
+    def is_overloaded(self) -> bool:
+        return (
+            self.in_flight > self.max_in_flight or self.pool_wait() > self.max_pool_wait
+        )
+
+    def retry_after(self) -> int:
+        """
+        Seconds a shed client should wait, about how long the backlog takes to clear
+        :return: int: Seconds, at least 1
+        """
+        return max(1, math.ceil(self.pool_wait() * 10))
+
+    def reset(self) -> None:
+        self.in_flight = 0
+        self.draining = False
+        self.counters["shed"] = 0
+        self._wait = 0.0
+
+    def stats(self) -> dict[str, int | float | bool]:
+        return {
+            **self.counters,
+            "in_flight": self.in_flight,
+            "pool_wait_ms": round(self.pool_wait() * 1000, 2),
+            "overloaded": self.is_overloaded(),
+            "draining": self.draining,
+        }
+
+
+shedder = LoadShedder()
+
+
+async def shed_load() -> None:
+    """
+    Rejects the request with 503 while the worker is overloaded.
+    Add it first in the route's `dependencies`, before rate limiting and `get_db`
+    """
+    if shedder.is_overloaded():
+        shedder.counters["shed"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Server overloaded, retry later",
+            headers={"Retry-After": str(shedder.retry_after())},
+        )
+
+
+class InFlightMiddleware:
+    """
+    ASGI middleware counting the HTTP requests being served
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        shedder.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            shedder.in_flight -= 1
@@ -1,50 +1,92 @@
 """
 This module stores the global logging configuration dictionary
+
+Every record carries the ID of the request that produced it, taken from the
+`X-Request-ID` header or generated, so one request can be followed through
+the logs. The feature loggers are sampled per request (`LOG_SAMPLE_RATES`):
+a request's lines are either all kept or all dropped. Warnings, errors and
+slow requests are always kept with every line of their request, so the lines
+of a request left out of the sample are held until it ends. Records are
+handed to a queue and written by a listener thread, so file writes, rotation
+and compressing the rotated files never block the event loop.
 """
 
+import contextvars
+import gzip
+import logging
+import logging.config
+import logging.handlers
 import os
+import queue
+import re
+import shutil
+import time
+import uuid
+import zlib
+from collections import OrderedDict
 from typing import Any
 
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LOGS_DIR = os.path.join(BASE_DIR, "logs")
 
+REQUEST_ID_HEADER = b"x-request-id"
+REQUEST_ID_PATTERN = re.compile(rb"[A-Za-z0-9._:-]{1,128}")
+SLOW_REQUEST_MS: float = float(os.getenv("LOG_SLOW_REQUEST_MS", "500"))
+MAX_HELD_REQUESTS: int = 1000  # requests whose lines are held, oldest dropped
+MAX_HELD_LINES: int = 100  # lines held per request, later ones are dropped
+# share of requests logged below WARNING, overridden with e.g. LOG_SAMPLE_RATE_STANDARD
+LOG_SAMPLE_RATES: dict[str, float] = {
+    name: float(os.getenv(f"LOG_SAMPLE_RATE_{name.upper()}", "1"))
+    for name in ("standard", "pomodoro", "interval", "deep")
+}
+
+request_id: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "request_id", default=None
+)
+
 LOGGING_CONFIG: dict[str, Any] = {
     "version": 1,
     "disable_existing_loggers": False,
     "formatters": {
         "json": {
             "()": "pythonjsonlogger.jsonlogger.JsonFormatter",
-            "format": "%(asctime)s %(name)s %(levelname)s %(message)s",
+            "format": "%(asctime)s %(name)s %(levelname)s %(request_id)s %(message)s",
         }
     },
     "handlers": {
         "standard_timer": {
-            "class": "logging.handlers.RotatingFileHandler",
+            "class": "backend.logging.CompressingRotatingFileHandler",
             "filename": os.path.join(LOGS_DIR, "standard.log"),
             "maxBytes": 10485760,  # 10MB
             "formatter": "json",
             "backupCount": 5,
+            "delay": True,  # open the file on the first record, not at startup
         },
         "pomodoro_timer": {
-            "class": "logging.handlers.RotatingFileHandler",
+            "class": "backend.logging.CompressingRotatingFileHandler",
             "filename": os.path.join(LOGS_DIR, "pomodoro.log"),
             "maxBytes": 10485760,
             "formatter": "json",
             "backupCount": 5,
+            "delay": True,
         },
         "interval_timer": {
-            "class": "logging.handlers.RotatingFileHandler",
+            "class": "backend.logging.CompressingRotatingFileHandler",
             "filename": os.path.join(LOGS_DIR, "interval.log"),
             "maxBytes": 10485760,
             "formatter": "json",
             "backupCount": 5,
+            "delay": True,
         },
         "deep_timer": {
-            "class": "logging.handlers.RotatingFileHandler",
+            "class": "backend.logging.CompressingRotatingFileHandler",
             "filename": os.path.join(LOGS_DIR, "deep.log"),
             "maxBytes": 10485760,
             "backupCount": 5,
             "formatter": "json",
+            "delay": True,
         },
         "console": {"class": "logging.StreamHandler", "formatter": "json"},
     },
@@ -71,3 +113,219 @@ LOGGING_CONFIG: dict[str, Any] = {
         },
     },
 }
+
+# one listener thread per feature logger, started by `configure_logging`
+_listeners: list[logging.handlers.QueueListener] = []
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotating file handler gzipping each file as it is rotated out.
+    Runs on a queue listener thread, never on the event loop
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.namer = lambda name: f"{name}.gz"
+        self.rotator = compress_file
+
+
+def compress_file(source: str, dest: str) -> None:
+    with open(source, "rb") as file, gzip.open(dest, "wb") as compressed:
+        shutil.copyfileobj(file, compressed)
+    os.remove(source)
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Adds the current request's ID to every record as `request_id`
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a share of the records below WARNING. The decision is made per
+    request ID, so a kept request keeps all of its lines
+    """
+
+    def __init__(self, rate: float, slow_ms: float = SLOW_REQUEST_MS) -> None:
+        super().__init__()
+        self.rate = rate
+        self.slow_ms = slow_ms
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return self.always_kept(record) or self.sampled(record)
+
+    def always_kept(self, record: logging.LogRecord) -> bool:
+        # warnings, errors and slow requests
+        if record.levelno >= logging.WARNING:
+            return True
+        return getattr(record, "duration_ms", 0) >= self.slow_ms
+
+    def sampled(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1:
+            return True
+        key = getattr(record, "request_id", None) or f"{record.process}{record.msecs}"
+        return zlib.crc32(key.encode()) < self.rate * 2**32
+
+
+class SamplingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler sampling records with a `SamplingFilter`. The lines of a
+    request left out of the sample are held until its access line: a warning,
+    an error or a slow access line lets them and the rest of the request
+    through, otherwise they are dropped
+    """
+
+    def __init__(
+        self,
+        records: queue.SimpleQueue[logging.LogRecord],
+        sampler: SamplingFilter,
+        max_requests: int = MAX_HELD_REQUESTS,
+        max_lines: int = MAX_HELD_LINES,
+    ) -> None:
+        super().__init__(records)  # type: ignore[arg-type]
+        self.sampler = sampler
+        self.max_requests = max_requests
+        self.max_lines = max_lines
+        self.held: OrderedDict[str, list[logging.LogRecord]] = OrderedDict()
+        self.kept: OrderedDict[str, None] = OrderedDict()  # requests let through
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # called with the handler's lock held
+        key = getattr(record, "request_id", None)
+        if key is None or self.sampler.sampled(record):
+            if self.sampler.filter(record):
+                super().emit(record)
+            return
+        ends = hasattr(record, "duration_ms")  # the access line is the last
+        if key in self.kept or self.sampler.always_kept(record):
+            for earlier in self.held.pop(key, ()):
+                super().emit(earlier)
+            super().emit(record)
+            if ends:
+                self.kept.pop(key, None)
+            else:
+                self._remember(self.kept, key, None)
+            return
+        if ends:
+            self.held.pop(key, None)
+            return
+        lines = self.held.get(key)
+        if lines is None:
+            lines = self._remember(self.held, key, [])
+        if len(lines) < self.max_lines:
+            lines.append(record)
+
+    def _remember(self, requests: OrderedDict[str, Any], key: str, value: Any) -> Any:
+        requests[key] = value
+        requests.move_to_end(key)
+        if len(requests) > self.max_requests:
+            requests.popitem(last=False)
+        return value
+
+
+def get_request_id(scope: Scope) -> str:
+    """
+    Gets the request's ID from its `X-Request-ID` header, or generates one
+    :param scope: ASGI scope
+    :return: str: Request ID
+    """
+    for name, value in scope["headers"]:
+        if name == REQUEST_ID_HEADER and REQUEST_ID_PATTERN.fullmatch(value):
+            return value.decode()
+    return uuid.uuid4().hex
+
+
+def get_access_logger(scope: Scope) -> logging.Logger | None:
+    """
+    Gets the feature logger for a request's path, e.g. `standard` for /api/standard/...
+    :param scope: ASGI scope
+    :return: Logger, None for paths outside the timer features
+    """
+    path: str = scope["path"]
+    root_path: str = scope.get("root_path", "")
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path) :]
+    feature = path.lstrip("/").partition("/")[0]
+    return logging.getLogger(feature) if feature in LOG_SAMPLE_RATES else None
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware setting the request ID for the request's log records and
+    echoing it in the response. Timer requests also get one access line,
+    carrying `duration_ms` so slow requests survive sampling
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        current_id = get_request_id(scope)
+        token = request_id.set(current_id)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_header(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER, current_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            logger = get_access_logger(scope)
+            if logger is not None:
+                duration_ms = round((time.perf_counter() - start) * 1000, 1)
+                logger.log(
+                    logging.ERROR if status >= 500 else logging.INFO,
+                    "%s %s %s",
+                    scope["method"],
+                    scope["path"],
+                    status,
+                    extra={"status": status, "duration_ms": duration_ms},
+                )
+            request_id.reset(token)
+
+
+def configure_logging() -> None:
+    """
+    Applies the logging configuration, called from the application lifespan.
+    Each feature logger's handlers are moved behind a queue. The filters stay
+    on the logger's side, where the request ID context is still set
+    """
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    shutdown_logging()
+    logging.config.dictConfig(LOGGING_CONFIG)
+    for name, rate in LOG_SAMPLE_RATES.items():
+        logger = logging.getLogger(name)
+        records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+        queue_handler = SamplingQueueHandler(records, SamplingFilter(rate))
+        queue_handler.addFilter(RequestIdFilter())
+        listener = logging.handlers.QueueListener(
+            records, *logger.handlers, respect_handler_level=True
+        )
+        logger.handlers = [queue_handler]
+        listener.start()
+        _listeners.append(listener)
+
+
+def shutdown_logging() -> None:
+    """
+    Stops the listener threads, writing out the records still queued
+    """
+    while _listeners:
+        _listeners.pop().stop()
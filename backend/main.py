@@ -1,21 +1,33 @@
-import logging.config
 import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Optional
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-import backend.queries as queries
-from backend.db import get_db
-from backend.logging import LOGGING_CONFIG
+import backend.clock as clock
+import backend.etag as etag
+import backend.idempotency as idempotency
+import backend.usage as usage
+from backend.admin import router as admin_router
+from backend.db import dispose_engine, get_new_user_db, new_user_id
+from backend.ids import ACCEPTED_UUID_VERSIONS
+from backend.load_shedding import InFlightMiddleware, shed_load, shedder
+from backend.logging import RequestIdMiddleware, configure_logging, shutdown_logging
 from backend.models import User
-from backend.schemas import CreateUserIn, CreateUserOut, GetUserOut
+from backend.profiling import ProfilingMiddleware
+from backend.rate_limit import rate_limit
+from backend.repository import Repository, get_repository
+from backend.schemas import CreateUserIn, CreateUserOut, GetUserOut, ServerTimeOut
+from backend.standard_timer import services as standard_services
 from backend.standard_timer.routers import router as standard_router
-
-# LOGGING
-logging.config.dictConfig(LOGGING_CONFIG)
+from backend.timezones import load_registry as load_timezones
+from backend.timezones import registry as timezone_registry
+from backend.webhooks.routers import router as webhooks_router
+from backend.webhooks.services import dispatcher as webhook_dispatcher
 
 origins: list[str] = [
     "http://localhost:8080",  # frontend dev server
@@ -24,7 +36,28 @@ origins: list[str] = [
     # "https://domain.com",
     # "https://www.domain.com",
 ]
-app = FastAPI(root_path="/api")  # /domain/api/ to view api endpoints
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    # the engine and its pool are created lazily, running timers are loaded
+    # in the background. Only the small timezone table is read before serving
+    configure_logging()
+    await load_timezones()
+    await standard_services.start_scheduler()
+    webhook_dispatcher.start()
+    usage.recorder.start()
+    yield
+    # fail readiness so the load balancer stops sending requests
+    shedder.draining = True
+    await standard_services.scheduler.stop()
+    await webhook_dispatcher.stop()
+    await usage.recorder.stop()
+    await dispose_engine()
+    shutdown_logging()
+
+
+app = FastAPI(root_path="/api", lifespan=lifespan)  # /domain/api/ to view api endpoints
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,8 +66,16 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# counts requests in flight for load shedding
+app.add_middleware(InFlightMiddleware)
+# sets the request ID for every log record of the request
+app.add_middleware(RequestIdMiddleware)
+# outermost, so profiles cover every other middleware and dependency
+app.add_middleware(ProfilingMiddleware)
 # include routers below
 app.include_router(standard_router)
+app.include_router(webhooks_router)
+app.include_router(admin_router)
 
 
 # global endpoints
@@ -48,46 +89,111 @@ def test_connection() -> JSONResponse:
     )
 
 
-@app.get("/users/{user_uuid}", response_model=GetUserOut)
+@app.get(path="/time", response_model=ServerTimeOut)
+async def get_server_time() -> Response:
+    # no dependencies so nothing delays the timestamp
+    return Response(
+        content=clock.server_time_body(),
+        media_type="application/json",
+        headers={"Cache-Control": "no-store"},
+    )
+
+
+@app.get(path="/ready")
+async def get_readiness() -> JSONResponse:
+    # for load balancers, no dependencies so it answers even when overloaded
+    stats = shedder.stats()
+    if stats["overloaded"] or stats["draining"]:
+        return JSONResponse(
+            content={"status": "unavailable", **stats},
+            status_code=503,
+            headers={
+                "Retry-After": str(shedder.retry_after()),
+                "Cache-Control": "no-store",
+            },
+        )
+    return JSONResponse(
+        content={"status": "ready", **stats}, headers={"Cache-Control": "no-store"}
+    )
+
+
+@app.get(
+    "/users/{user_uuid}",
+    response_model=GetUserOut,
+    dependencies=[Depends(shed_load), Depends(rate_limit("users"))],
+)
 async def get_user(
-    user_uuid: str, db: AsyncSession = Depends(get_db)
-) -> JSONResponse | GetUserOut:
+    user_uuid: str,
+    response: Response,
+    repository: Repository = Depends(get_repository),
+    if_none_match: Optional[str] = Header(None),
+) -> Response | GetUserOut:
     result: int = is_valid_uuid(user_uuid)
     if not result:
         return JSONResponse(content={"message": "Invalid UUID"}, status_code=400)
-    user: User | None = await queries.get_user_by_uuid(user_uuid, db)
+    # answer revalidations from the version map without loading the user
+    version_key = etag.user_key(uuid.UUID(user_uuid))
+    known_tag = etag.versions.get(version_key)
+    if known_tag and etag.matches(if_none_match, known_tag):
+        return etag.not_modified(known_tag)
+    user = await repository.get_user_by_uuid(user_uuid)
     if not user:
         return JSONResponse(
             content={"message": f"User with UUID:{user_uuid} does not exist"},
             status_code=400,
         )
-    return GetUserOut(**user.__dict__)
+    tag = etag.make_etag(user.updated_at)
+    etag.versions.set(version_key, tag)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    etag.set_headers(response, tag)
+    return GetUserOut.model_validate(user)
 
 
-@app.post("/users", response_model=CreateUserOut)
+@app.post(
+    "/users",
+    response_model=CreateUserOut,
+    dependencies=[Depends(shed_load), Depends(rate_limit("users"))],
+)
 async def create_user(
-    data: CreateUserIn, db: AsyncSession = Depends(get_db)
+    data: CreateUserIn,
+    db: AsyncSession = Depends(get_new_user_db),
+    idempotency_key: str | None = Depends(idempotency.get_idempotency_key),
 ) -> JSONResponse | CreateUserOut:
-    result: bool = is_valid_timezone(data.timezone)
-    if not result:
-        return JSONResponse(status_code=400, content={"message": "Invalid timezone"})
-    new_user = User(user_id=uuid.uuid4(), timezone=data.timezone)  # type: ignore | Pyright uneccessary warning with sqlalchemy model
+    request = idempotency.for_request("create_user", idempotency_key, data)
+    if request:
+        stored = await idempotency.get_stored_response(request, db)
+        if stored:
+            return stored
+    timezone_id = timezone_registry.get_id(data.timezone)
+    if timezone_id is None:
+        # only names missing from the timezone table are checked against tzdata
+        result: bool = is_valid_timezone(data.timezone)
+        if not result:
+            return JSONResponse(
+                status_code=400, content={"message": "Invalid timezone"}
+            )
+        timezone_id = await timezone_registry.add(data.timezone, db)
+    new_user = User(user_id=new_user_id(db), timezone_id=timezone_id)  # type: ignore | Pyright uneccessary warning with sqlalchemy model
     db.add(new_user)
-    await db.commit()
-    await db.refresh(new_user)
-    return CreateUserOut(**new_user.__dict__)
+    response = CreateUserOut(user_id=new_user.user_id, timezone=new_user.timezone)
+    if request:
+        idempotency.save_response(request, response, db)
+    replay = await idempotency.commit_or_replay(request, db)
+    if replay:
+        return replay
+    return response
 
 
 # helper functions
 def is_valid_uuid(user_uuid: str) -> bool:
     """
-    Tests if the given uuid is a valid uuid
+    Tests if the given uuid is a valid uuid, v4 or v7
     :param user_uuid:
     :return: bool: True if is valid uuid, false otherwise
     """
     try:
-        uuid.UUID(user_uuid, version=4)
-        return True
+        return uuid.UUID(user_uuid).version in ACCEPTED_UUID_VERSIONS
     except ValueError:
         return False
 
@@ -96,5 +202,5 @@ def is_valid_timezone(timezone: str) -> bool:
     try:
         ZoneInfo(timezone)
         return True
-    except ZoneInfoNotFoundError:
+    except (ZoneInfoNotFoundError, ValueError):
         return False
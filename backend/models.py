@@ -2,12 +2,62 @@
 All models for this web application will go here
 """
 
-from datetime import datetime
+from datetime import date, datetime
 
-from sqlalchemy import UUID, DateTime, ForeignKey, func
-from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
+from sqlalchemy import (
+    DDL,
+    UUID,
+    BigInteger,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    SmallInteger,
+    String,
+    Text,
+    event,
+    func,
+    text,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.orm import (
+    Mapped,
+    declared_attr,
+    mapped_column,
+    relationship,
+    validates,
+)
 
 from backend.db import Base
+from backend.ids import UUID_V7_FUNCTION_SQL, uuid7
+from backend.timezones import registry as timezone_registry
+
+# largest value an integer id column holds, larger path ids match no row
+MAX_INTEGER_ID: int = 2**31 - 1
+
+
+def validate_duration_field(key: str, value: int) -> None:
+    """
+    Validates a single duration field (minutes or hours)
+    :param key: field being evaluated
+    :param value: value of the field
+    """
+    if key == "minutes" and (value < 0 or value > 59):
+        raise ValueError("Minutes must be between 1 and 59 inclusive")
+    if key == "hours" and (value < 0 or value > 23):
+        raise ValueError("Hours must be between 0 and 23 inclusive")
+
+
+def validate_total_duration(minutes: int | None, hours: int | None) -> None:
+    """
+    Validates that a timer lasts at least one minute
+    :param minutes: minute duration
+    :param hours: hour duration
+    """
+    if minutes == 0 and hours == 0:
+        raise ValueError("Timer duration must be at least 1 minute")
 
 
 class TimeStampMixin:
@@ -48,17 +98,59 @@ class TimerMixin:
         default=False
     )  # updated on every pause/resume request
     is_completed: Mapped[bool] = mapped_column(default=False)  # updated on end request
+    # every pause as (seconds since the previous one ended, length) pairs,
+    # see `backend.pause_intervals`
+    pause_intervals: Mapped[list[int]] = mapped_column(
+        ARRAY(Integer), default=list, server_default=text("'{}'")
+    )
+    # bumped by every update, which only applies if the row still has the
+    # version it was loaded with (raises StaleDataError otherwise)
+    version: Mapped[int] = mapped_column(nullable=False, server_default=text("1"))
+
+    @declared_attr.directive
+    def __mapper_args__(cls) -> dict:
+        return {"version_id_col": cls.__table__.c.version}  # type: ignore[attr-defined]
+
+
+class Timezone(Base):
+    # IANA timezone names, referenced by id and loaded into `backend.timezones.registry`
+    __tablename__ = "timezones"
+    id: Mapped[int] = mapped_column(SmallInteger, primary_key=True, autoincrement=False)
+    name: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
 
 
 class User(TimeStampMixin, Base):
     # One User to Many Timers
     __tablename__ = "users"
-    user_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
-    timezone: Mapped[str] = mapped_column(nullable=False)
+    # time-ordered, the server default covers rows inserted outside the app
+    user_id: Mapped[UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid7,
+        server_default=text("uuid_generate_v7()"),
+    )
+    timezone_id: Mapped[int] = mapped_column(
+        SmallInteger, ForeignKey("timezones.id"), nullable=False
+    )
     standard_timers: Mapped[list["StandardTimer"]] = relationship(
         back_populates="user", cascade="all, delete-orphan"
     )
 
+    # the IANA name, translated through the timezone registry
+    @property
+    def timezone(self) -> str:
+        return timezone_registry.name(self.timezone_id)
+
+    @timezone.setter
+    def timezone(self, name: str) -> None:
+        timezone_id = timezone_registry.get_id(name)
+        if timezone_id is None:
+            raise ValueError(f"Unknown timezone {name}")
+        self.timezone_id = timezone_id
+
+
+event.listen(User.__table__, "before_create", DDL(UUID_V7_FUNCTION_SQL))
+
 
 class StandardTimer(TimerMixin, TimeStampMixin, Base):
     # Many StandardTimers to One User
@@ -75,12 +167,70 @@ class StandardTimer(TimerMixin, TimeStampMixin, Base):
         :param key: current field being evaluated
         :param value: value of current field being evaluated
         """
-        if key == "minutes" and (value < 0 or value > 59):
-            raise ValueError("Minutes must be between 1 and 59 inclusive")
-        if key == "hours" and (value < 0 or value > 23):
-            raise ValueError("Hours must be between 0 and 23 inclusive")
+        validate_duration_field(key, value)
         minutes = value if key == "minutes" else getattr(self, "minutes", 0)
         hours = value if key == "hours" else getattr(self, "hours", 0)
-        if minutes == 0 and hours == 0:
-            raise ValueError("Timer duration must be at least 1 minute")
+        validate_total_duration(minutes, hours)
         return value
+
+
+class IdempotencyRecord(TimeStampMixin, Base):
+    # Stored response for a request sent with an `Idempotency-Key` header
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (Index("ix_idempotency_keys_created_at", "created_at"),)
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    status_code: Mapped[int] = mapped_column(nullable=False)
+    response_body: Mapped[dict] = mapped_column(JSONB, nullable=False)
+
+
+class WebhookSubscription(TimeStampMixin, Base):
+    # Endpoint notified of a user's timer events
+    __tablename__ = "webhook_subscriptions"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[UUID] = mapped_column(
+        ForeignKey("users.user_id", ondelete="CASCADE"), index=True
+    )
+    url: Mapped[str] = mapped_column(String(2048), nullable=False)
+    secret: Mapped[str] = mapped_column(String(64), nullable=False)  # signs bodies
+
+
+class WebhookDelivery(TimeStampMixin, Base):
+    # One event owed to one subscription, rows double as the retry queue
+    __tablename__ = "webhook_deliveries"
+    __table_args__ = (
+        Index(
+            "ix_webhook_deliveries_due",
+            "next_attempt_at",
+            postgresql_where=text("NOT is_failed"),
+        ),
+    )
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    subscription_id: Mapped[int] = mapped_column(
+        ForeignKey("webhook_subscriptions.id", ondelete="CASCADE"), index=True
+    )
+    event: Mapped[str] = mapped_column(String(64), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    attempts: Mapped[int] = mapped_column(default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    is_failed: Mapped[bool] = mapped_column(default=False)  # gave up retrying
+
+
+class UsageMinuteCount(Base):
+    # One worker's count of one timer event in one minute, summed on read
+    __tablename__ = "usage_minute_counts"
+    minute: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    event: Mapped[str] = mapped_column(String(32), primary_key=True)
+    worker_id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    count: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+
+class UsageDailyUsers(Base):
+    # One worker's HyperLogLog of the users active on one day, merged on read
+    __tablename__ = "usage_daily_users"
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    worker_id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    registers: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
@@ -0,0 +1,336 @@
+"""
+Helpers for online schema changes in Alembic revisions.
+
+A change that would rewrite or scan a large table while holding its lock is
+split into expand and contract steps instead: add the new column nullable
+(no rewrite), ship the app writing it, backfill the existing rows, then
+enforce NOT NULL and build indexes. What the app stopped using is dropped by
+a later revision, once every worker runs the new version.
+
+The helpers run inside an autocommit block, so every statement is its own
+short transaction:
+
+    with op.get_context().autocommit_block():
+        run_guarded("ALTER TABLE standard_timer ADD COLUMN planned_seconds integer")
+        backfill(
+            "standard_timer",
+            "planned_seconds = hours * 3600 + minutes * 60",
+            "planned_seconds IS NULL",
+            name=revision,
+        )
+        add_not_null("standard_timer", "planned_seconds")
+        create_index_concurrently(
+            "ix_standard_timer_planned", "standard_timer", "user_id, planned_seconds"
+        )
+
+DDL runs under a short `lock_timeout` and is retried with backoff: a
+statement waiting for its lock queues every query that comes after it, so
+it gives up quickly rather than stall the table behind a long transaction.
+Backfills walk the key in bounded batches, record how far they got in
+`online_migration_progress` in the same statement as each batch, and pick
+up from there when the revision is run again.
+"""
+
+import logging
+import time
+from typing import Any
+
+from sqlalchemy import Connection, CursorResult, text
+from sqlalchemy.exc import OperationalError
+
+from alembic import op
+
+# a child of alembic's logger, so `alembic upgrade` prints the progress
+logger = logging.getLogger("alembic.online_migrations")
+
+PROGRESS_TABLE = "online_migration_progress"
+LOCK_TIMEOUT: str = "2s"
+LOCK_ATTEMPTS: int = 10
+RETRY_DELAY: float = 0.5  # seconds, doubled after every attempt
+MAX_RETRY_DELAY: float = 30.0
+BATCH_SIZE: int = 5_000
+THROTTLE: float = 1.0  # sleep this many times each batch's duration after it
+LOG_SECONDS: float = 10.0
+MAX_NAME_LENGTH = 63  # Postgres truncates longer identifiers
+LOCK_NOT_AVAILABLE = "55P03"
+
+
+def _connection() -> Connection:
+    connection = op.get_bind()
+    if connection.get_execution_options().get("isolation_level") != "AUTOCOMMIT":
+        raise RuntimeError(
+            "online migration helpers run inside op.get_context().autocommit_block()"
+        )
+    return connection
+
+
+def run_guarded(
+    statement: str,
+    params: dict[str, Any] | None = None,
+    lock_timeout: str = LOCK_TIMEOUT,
+    attempts: int = LOCK_ATTEMPTS,
+) -> CursorResult:
+    """
+    Runs a statement in its own transaction, giving up on its locks after
+    `lock_timeout` and retrying with backoff
+    :param statement: SQL statement
+    :param params: Bound parameters
+    :param lock_timeout: Longest wait for a lock, as a Postgres interval
+    :param attempts: Tries before the lock timeout error is raised
+    :return: CursorResult
+    """
+    connection = _connection()
+    attempt = 1
+    delay = RETRY_DELAY
+    connection.execute(text(f"SET lock_timeout = '{lock_timeout}'"))
+    try:
+        while True:
+            try:
+                return connection.execute(text(statement), params or {})
+            except OperationalError as exc:
+                locked = getattr(exc.orig, "pgcode", None) == LOCK_NOT_AVAILABLE
+                if not locked or attempt >= attempts:
+                    raise
+                logger.warning(
+                    "lock not available (attempt %d of %d), retrying in %.1f s: %s",
+                    attempt,
+                    attempts,
+                    delay,
+                    " ".join(statement.split())[:80],
+                )
+                time.sleep(delay)
+                attempt += 1
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+    finally:
+        connection.execute(text("RESET lock_timeout"))
+
+
+def _create_progress_table() -> None:
+    _connection().execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {PROGRESS_TABLE} ("
+            "name text PRIMARY KEY, "
+            "last_key bigint NOT NULL, "
+            "rows_updated bigint NOT NULL, "
+            "updated_at timestamptz NOT NULL DEFAULT now())"
+        )
+    )
+
+
+def backfill(
+    table: str,
+    assignments: str,
+    pending: str,
+    name: str,
+    key: str = "id",
+    batch_size: int = BATCH_SIZE,
+    throttle: float = THROTTLE,
+) -> int:
+    """
+    Updates existing rows in batches of consecutive keys, each committed on
+    its own, so row locks are held one batch at a time. A rerun with the same
+    name resumes after the last committed batch
+    :param table: Table name
+    :param assignments: SET clause, e.g. "planned_seconds = hours * 3600"
+    :param pending: Condition of the rows still to update, e.g.
+    "planned_seconds IS NULL". Rows the app already wrote are skipped
+    :param name: Unique name of the backfill, e.g. the revision id
+    :param key: Indexed integer column the batches walk in order
+    :param batch_size: Keys per batch
+    :param throttle: Pause after each batch, as a multiple of its duration
+    :return: int: Rows updated by this run
+    """
+    _create_progress_table()
+    connection = _connection()
+    first, last = connection.execute(
+        text(f"SELECT min({key}), max({key}) FROM {table}")
+    ).one()
+    if first is None:
+        return 0
+    after = connection.execute(
+        text(f"SELECT last_key FROM {PROGRESS_TABLE} WHERE name = :name"),
+        {"name": name},
+    ).scalar()
+    if after is None:
+        after = first - 1
+    else:
+        logger.info("%s: resuming after %s %s", name, key, after)
+    # the batch, its update and the progress row commit together. Updating
+    # the batch's key range rather than its keys lets every partition scan
+    # its index once instead of being probed per key
+    statement = f"""
+        WITH batch AS (
+            SELECT {key} FROM {table} WHERE {key} > :after ORDER BY {key} LIMIT :limit
+        ), updated AS (
+            UPDATE {table} SET {assignments}
+            WHERE {key} > :after AND {key} <= (SELECT max({key}) FROM batch)
+              AND ({pending})
+            RETURNING 1
+        ), progress AS (
+            INSERT INTO {PROGRESS_TABLE} (name, last_key, rows_updated)
+            SELECT :name, max({key}), (SELECT count(*) FROM updated) FROM batch
+            HAVING count(*) > 0
+            ON CONFLICT (name) DO UPDATE SET
+                last_key = excluded.last_key,
+                rows_updated = {PROGRESS_TABLE}.rows_updated + excluded.rows_updated,
+                updated_at = now()
+        )
+        SELECT (SELECT max({key}) FROM batch), (SELECT count(*) FROM updated)
+    """
+    updated = 0
+    started = logged = time.monotonic()
+    while True:
+        batch_started = time.monotonic()
+        batch_last, batch_updated = run_guarded(
+            statement, {"after": after, "limit": batch_size, "name": name}
+        ).one()
+        if batch_last is None:
+            break
+        after = batch_last
+        updated += batch_updated
+        now = time.monotonic()
+        if now - logged >= LOG_SECONDS:
+            logged = now
+            logger.info(
+                "%s: %d rows updated, %s %s of %s (%.0f%%), %.0f rows/s",
+                name,
+                updated,
+                key,
+                after,
+                last,
+                100 * min(1.0, (after - first + 1) / (last - first + 1)),
+                updated / (now - started),
+            )
+        # leaves the table to the app for a while after every batch
+        time.sleep((now - batch_started) * throttle)
+    connection.execute(
+        text(f"DELETE FROM {PROGRESS_TABLE} WHERE name = :name"), {"name": name}
+    )
+    logger.info(
+        "%s: backfilled %d rows in %.1f s", name, updated, time.monotonic() - started
+    )
+    return updated
+
+
+def add_not_null(table: str, column: str) -> None:
+    """
+    Sets a column NOT NULL without holding a lock that blocks writes while
+    the table is scanned
+    :param table: Table name
+    :param column: Column name, every row must already have a value
+    """
+    constraint = f"{table}_{column}_not_null"[:MAX_NAME_LENGTH]
+    # left behind if a previous run failed to validate
+    run_guarded(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {constraint}")
+    # NOT VALID constraints are added without a scan, validating them
+    # doesn't block writes
+    run_guarded(
+        f"ALTER TABLE {table} ADD CONSTRAINT {constraint} "
+        f"CHECK ({column} IS NOT NULL) NOT VALID"
+    )
+    run_guarded(f"ALTER TABLE {table} VALIDATE CONSTRAINT {constraint}")
+    # proven by the validated check, so this skips the table scan
+    run_guarded(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL")
+    run_guarded(f"ALTER TABLE {table} DROP CONSTRAINT {constraint}")
+
+
+def _drop_invalid_index(name: str) -> None:
+    # a concurrent build that failed leaves an invalid index that is still
+    # maintained on every write
+    invalid = _connection().scalar(
+        text(
+            "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"
+        ),
+        {"name": name},
+    )
+    if invalid:
+        logger.info("dropping invalid index %s", name)
+        _connection().execute(text(f"DROP INDEX CONCURRENTLY {name}"))
+
+
+def create_index_concurrently(
+    name: str,
+    table: str,
+    columns: str,
+    where: str | None = None,
+    unique: bool = False,
+) -> None:
+    """
+    Builds an index while the table stays writable. A partitioned table gets
+    an index on the parent alone, then one built concurrently on every
+    partition and attached to it. Picks up where an interrupted run stopped
+    :param name: Index name
+    :param table: Table name, plain or partitioned one level deep
+    :param columns: Indexed columns or expressions, e.g. "user_id, created_at"
+    :param where: Condition of a partial index
+    :param unique: Whether the index is unique
+    """
+    connection = _connection()
+    definition = f"({columns})" + (f" WHERE {where}" if where else "")
+    index = "UNIQUE INDEX" if unique else "INDEX"
+    kind, partitions = connection.execute(
+        text(
+            "SELECT c.relkind, ARRAY("
+            "SELECT i.inhrelid::regclass::text FROM pg_inherits i "
+            "WHERE i.inhparent = c.oid ORDER BY 1"
+            ") FROM pg_class c WHERE c.oid = CAST(:table AS regclass)"
+        ),
+        {"table": table},
+    ).one()
+    # concurrent builds also wait for older transactions to finish, they run
+    # without the lock timeout so that wait doesn't cancel them
+    if kind != "p":
+        _drop_invalid_index(name)
+        connection.execute(
+            text(
+                f"CREATE {index} CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}"
+            )
+        )
+        return
+    # stays invalid until every partition has its index attached. Partitions
+    # created meanwhile get theirs from it
+    run_guarded(f"CREATE {index} IF NOT EXISTS {name} ON ONLY {table} {definition}")
+    for partition in partitions:
+        attached = connection.scalar(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM pg_inherits i "
+                "JOIN pg_index x ON x.indexrelid = i.inhrelid "
+                "WHERE i.inhparent = CAST(:name AS regclass) "
+                "AND x.indrelid = CAST(:partition AS regclass))"
+            ),
+            {"name": name, "partition": partition},
+        )
+        if attached:
+            continue
+        child = f"{name}_{partition.removeprefix(f'{table}_')}"[:MAX_NAME_LENGTH]
+        _drop_invalid_index(child)
+        started = time.monotonic()
+        connection.execute(
+            text(
+                f"CREATE {index} CONCURRENTLY IF NOT EXISTS {child} "
+                f"ON {partition} {definition}"
+            )
+        )
+        run_guarded(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+        logger.info(
+            "%s: built on %s in %.1f s", name, partition, time.monotonic() - started
+        )
+
+
+def drop_index_concurrently(name: str) -> None:
+    """
+    Drops an index while the table stays writable
+    :param name: Index name, nothing happens if it doesn't exist
+    """
+    kind = _connection().scalar(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"),
+        {"name": name},
+    )
+    if kind is None:
+        return
+    if kind == "I":
+        # partitioned indexes can't be dropped concurrently, this takes a
+        # short lock on every partition
+        run_guarded(f"DROP INDEX {name}")
+    else:
+        _connection().execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
@@ -0,0 +1,235 @@
+"""
+Maintenance jobs for the monthly partitions of `standard_timer`.
+
+Run them from a scheduler (e.g. a daily cron entry):
+    python -m backend.partitions create --months-ahead 3
+    python -m backend.partitions archive --retention-months 6
+"""
+
+import argparse
+import asyncio
+import re
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db import dispose_engine, general_db, get_shard_map
+
+PARENT_TABLE = "standard_timer"
+DEFAULT_PARTITION = "standard_timer_default"
+ARCHIVE_TABLE = "standard_timer_archive"
+MONTHS_AHEAD: int = 3  # partitions kept ready for future inserts
+RETENTION_MONTHS: int = 6  # completed timers older than this are archived
+LOCK_TIMEOUT: str = "5s"  # give up rather than queue behind long transactions
+PARTITION_NAME = re.compile(rf"^{PARENT_TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+
+def add_months(month: date, months: int) -> date:
+    """
+    Moves a date to the first day of the month `months` away
+    :param month: Any day of the starting month
+    :param months: Months to move, may be negative
+    :return: date: First day of the resulting month
+    """
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_y{month.year}m{month.month:02d}"
+
+
+def month_bounds(month: date) -> dict[str, datetime]:
+    # the range a monthly partition covers, as query parameters
+    upper = add_months(month, 1)
+    return {
+        "lower": datetime(month.year, month.month, 1, tzinfo=timezone.utc),
+        "upper": datetime(upper.year, upper.month, 1, tzinfo=timezone.utc),
+    }
+
+
+def parse_partition_name(name: str) -> date | None:
+    """
+    Gets the month covered by a monthly partition
+    :param name: Table name
+    :return: date: First day of the month, or None if not a monthly partition
+    """
+    match = PARTITION_NAME.match(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+async def get_partition_months(db: AsyncSession) -> list[date]:
+    """
+    Lists the months that currently have a partition, oldest first
+    :param db: Database session
+    :return: list of month start dates
+    """
+    result = await db.scalars(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = CAST(:parent AS regclass)"
+        ),
+        {"parent": PARENT_TABLE},
+    )
+    months = [parse_partition_name(name) for name in result]
+    return sorted(month for month in months if month is not None)
+
+
+async def create_future_partitions(
+    db: AsyncSession, months_ahead: int = MONTHS_AHEAD, today: date | None = None
+) -> list[str]:
+    """
+    Creates any missing partitions from the current month to `months_ahead`
+    months in the future. Rows the default partition caught in a new month's
+    range (inserted while the job lagged) are moved into that partition
+    :param db: Database session
+    :param months_ahead: How many months ahead to prepare
+    :param today: Current date, defaults to today in UTC
+    :return: list of created partition names
+    """
+    current = (today or datetime.now(timezone.utc).date()).replace(day=1)
+    existing = set(await get_partition_months(db))
+    missing = [
+        month
+        for month in (add_months(current, offset) for offset in range(months_ahead + 1))
+        if month not in existing
+    ]
+    await db.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+    has_default = await db.scalar(
+        text("SELECT to_regclass(:name) IS NOT NULL"), {"name": DEFAULT_PARTITION}
+    )
+    # creating a partition fails while the default one holds rows in its range
+    stray = [
+        month
+        for month in missing
+        if has_default
+        and await db.scalar(
+            text(
+                f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} "
+                f"WHERE created_at >= :lower AND created_at < :upper)"
+            ),
+            month_bounds(month),
+        )
+    ]
+    if stray:
+        await db.execute(
+            text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}")
+        )
+    created: list[str] = []
+    for month in missing:
+        upper = add_months(month, 1)
+        await db.execute(
+            text(
+                f'CREATE TABLE "{partition_name(month)}" PARTITION OF {PARENT_TABLE} '
+                f"FOR VALUES FROM ('{month.isoformat()} 00:00+00') "
+                f"TO ('{upper.isoformat()} 00:00+00')"
+            )
+        )
+        created.append(partition_name(month))
+    if stray:
+        for month in stray:
+            await db.execute(
+                text(
+                    f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+                    f"WHERE created_at >= :lower AND created_at < :upper "
+                    f"RETURNING *) INSERT INTO {PARENT_TABLE} SELECT * FROM moved"
+                ),
+                month_bounds(month),
+            )
+        await db.execute(
+            text(
+                f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"
+            )
+        )
+    await db.commit()
+    return created
+
+
+async def archive_partition(db: AsyncSession, month: date) -> tuple[int, bool]:
+    """
+    Moves the completed timers of one monthly partition into the archive
+    table, packed as one JSONB array per user (compressed by TOAST). The
+    partition is detached and dropped once it holds no rows
+    :param db: Database session
+    :param month: Month covered by the partition
+    :return: tuple: (archived row count, whether the partition was dropped)
+    """
+    name = partition_name(month)
+    await db.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+    archived = await db.scalar(
+        text(
+            f'WITH moved AS (DELETE FROM "{name}" WHERE is_completed RETURNING *), '
+            f"packed AS ("
+            f"INSERT INTO {ARCHIVE_TABLE} (user_id, month, timer_count, timers) "
+            f"SELECT user_id, :month, count(*), jsonb_agg(to_jsonb(moved) ORDER BY id) "
+            f"FROM moved GROUP BY user_id "
+            f"ON CONFLICT (user_id, month) DO UPDATE SET "
+            f"timer_count = {ARCHIVE_TABLE}.timer_count + excluded.timer_count, "
+            f"timers = {ARCHIVE_TABLE}.timers || excluded.timers, "
+            f"archived_at = now() "
+            f"RETURNING 1) "
+            f"SELECT count(*) FROM moved"
+        ),
+        {"month": month},
+    )
+    remaining = await db.scalar(text(f'SELECT EXISTS (SELECT 1 FROM "{name}")'))
+    dropped = False
+    if not remaining:
+        await db.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION "{name}"'))
+        await db.execute(text(f'DROP TABLE "{name}"'))
+        dropped = True
+    await db.commit()
+    return archived or 0, dropped
+
+
+async def archive_old_partitions(
+    db: AsyncSession,
+    retention_months: int = RETENTION_MONTHS,
+    today: date | None = None,
+) -> dict[str, tuple[int, bool]]:
+    """
+    Archives every partition whose month ended more than `retention_months` ago
+    :param db: Database session
+    :param retention_months: Months of completed timers kept in the live table
+    :param today: Current date, defaults to today in UTC
+    :return: dict of partition name to (archived row count, dropped)
+    """
+    current = (today or datetime.now(timezone.utc).date()).replace(day=1)
+    cutoff = add_months(current, -retention_months)
+    summary: dict[str, tuple[int, bool]] = {}
+    for month in await get_partition_months(db):
+        if add_months(month, 1) <= cutoff:
+            summary[partition_name(month)] = await archive_partition(db, month)
+    return summary
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="create future partitions")
+    create.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD)
+    archive = commands.add_parser("archive", help="archive old completed timers")
+    archive.add_argument("--retention-months", type=int, default=RETENTION_MONTHS)
+    args = parser.parse_args()
+
+    # every shard holds timers
+    for shard in get_shard_map().names:
+        async with general_db(shard) as db:
+            if args.command == "create":
+                for name in await create_future_partitions(db, args.months_ahead):
+                    print(f"{shard}: created {name}")
+            else:
+                summary = await archive_old_partitions(db, args.retention_months)
+                for name, (archived, dropped) in summary.items():
+                    print(
+                        f"{shard}: {name}: archived {archived} rows, dropped={dropped}"
+                    )
+    await dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+"""
+Packed pause intervals for analytics.
+
+Every pause of a timer is kept on its row, in the `pause_intervals` integer
+array, as two numbers: the seconds since the end of the previous pause (the
+start for the first one), then the pause's length in seconds. The offsets
+stay small whatever the timer's length, and a resume appends two elements
+to the array instead of inserting a row per pause.
+
+Analytics unnest the arrays inside Postgres, so medians and histograms over
+many timers return a handful of numbers and never build a Python object per
+pause. `decode_intervals` is for looking at a single timer.
+"""
+
+from datetime import datetime
+from typing import Any, Sequence
+
+from sqlalchemy import ColumnElement, and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models import StandardTimer
+
+# lower bounds in seconds of every histogram bucket after the first (0 to 10)
+HISTOGRAM_EDGES: tuple[int, ...] = (10, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+def append_interval(
+    packed: Sequence[int] | None,
+    start_time: datetime,
+    paused_at: datetime,
+    resumed_at: datetime,
+) -> list[int]:
+    """
+    Adds a finished pause to a timer's packed intervals
+    :param packed: Timer's `pause_intervals`, None for a timer not saved yet
+    :param start_time: Timer's start time
+    :param paused_at: Time the pause began
+    :param resumed_at: Time the pause ended
+    :return: list[int]: New packed intervals, assign it to the timer
+    """
+    packed = list(packed or ())
+    # the previous pause ended this many seconds after the start
+    previous_end = sum(packed)
+    offset = max(0, int((paused_at - start_time).total_seconds()) - previous_end)
+    length = max(0, int((resumed_at - paused_at).total_seconds()))
+    packed.extend((offset, length))
+    return packed
+
+
+def decode_intervals(packed: Sequence[int]) -> list[tuple[int, int]]:
+    """
+    Unpacks a timer's pauses
+    :param packed: Timer's `pause_intervals`
+    :return: list of (seconds from the start to the pause, pause length) tuples
+    """
+    intervals = []
+    position = 0
+    for offset, length in zip(packed[::2], packed[1::2]):
+        position += offset
+        intervals.append((position, length))
+        position += length
+    return intervals
+
+
+def pause_lengths(*where: ColumnElement[bool], model: Any = StandardTimer) -> Any:
+    """
+    Builds a subquery with one `seconds` row per recorded pause
+    :param where: Conditions selecting the timers
+    :param model: Timer model, any model using `TimerMixin`
+    :return: Subquery
+    """
+    # lengths are the even positions. Subscripting skips the offsets, and a
+    # set-returning function in the select list avoids a function scan per row
+    positions = func.generate_series(2, func.cardinality(model.pause_intervals), 2)
+    return (
+        select(model.pause_intervals[positions].label("seconds"))
+        .where(*where)
+        .subquery()
+    )
+
+
+async def get_pause_stats(
+    db: AsyncSession,
+    *where: ColumnElement[bool],
+    model: Any = StandardTimer,
+    edges: Sequence[int] = HISTOGRAM_EDGES,
+) -> dict[str, Any]:
+    """
+    Gets the distribution of pause lengths over the selected timers, in one
+    pass over their arrays
+    :param db: Database session
+    :param where: Conditions selecting the timers, e.g. a `created_at` range
+    :param model: Timer model, any model using `TimerMixin`
+    :param edges: Histogram bucket lower bounds in seconds, ascending
+    :return: dict with the pause count, the median length and, for every
+    bucket, its lower bound and count
+    """
+    seconds = pause_lengths(*where, model=model).c.seconds
+    bounds = (0, *edges)
+    buckets = [
+        func.count().filter(
+            and_(seconds >= bound, seconds < upper)
+            if upper is not None
+            else seconds >= bound
+        )
+        for bound, upper in zip(bounds, (*edges, None))
+    ]
+    row = (
+        await db.execute(
+            select(
+                func.count(),
+                func.percentile_cont(0.5).within_group(seconds),
+                *buckets,
+            )
+        )
+    ).one()
+    return {
+        "pauses": row[0],
+        "median_seconds": row[1],
+        "histogram": [
+            {"from_seconds": bound, "count": count}
+            for bound, count in zip(bounds, row[2:])
+        ],
+    }
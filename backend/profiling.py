@@ -0,0 +1,243 @@
+"""
+On-demand request profiling.
+
+A request is profiled when it carries `X-Profile` together with a valid
+`X-Admin-Token`, or when it is picked by `PROFILE_SAMPLE_RATE` (env, 0 to 1,
+off by default). A sampling thread records the request task's stack every
+`PROFILE_INTERVAL_SECONDS`. While the task is suspended, the sample is its
+chain of awaiting coroutines, so time spent waiting on the database is
+charged to the code that awaited it. That makes it a wall-clock profile.
+
+Profiles use the collapsed stack format (`frame;frame;frame count`), which
+flamegraph.pl, speedscope and inferno read directly. They are written to a
+bounded ring of files in `PROFILES_DIR`. With `X-Profile: collapsed` the
+profile replaces the response body instead. Requests that aren't profiled
+only pay for one header lookup.
+"""
+
+import asyncio
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Any
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.admin import is_admin_token
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILES_DIR = os.path.join(BASE_DIR, "profiles")
+MAX_PROFILES: int = 50  # oldest profiles are deleted past this
+PROFILE_INTERVAL_SECONDS: float = 0.001
+PROFILE_HEADER = b"x-profile"
+ADMIN_TOKEN_HEADER = b"x-admin-token"
+COLLAPSED = b"collapsed"
+
+
+def describe_frame(frame: FrameType) -> str:
+    code = frame.f_code
+    name = (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+    return name.replace(";", ":")
+
+
+class StackSampler:
+    """
+    Samples the stack of one asyncio task from a background thread
+    """
+
+    def __init__(
+        self, task: asyncio.Task, interval: float = PROFILE_INTERVAL_SECONDS
+    ) -> None:
+        self.task = task
+        self.interval = interval
+        self.thread_id = threading.get_ident()  # the event loop's thread
+        self.counts: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            stack = self.sample()
+            if stack:
+                self.counts[stack] += 1
+                self.samples += 1
+
+    def sample(self) -> str:
+        """
+        Captures the task's current stack, outermost frame first
+        :return: str: frames joined with semicolons, empty once the task is done
+        """
+        chain: list[FrameType] = []
+        awaited: Any = self.task.get_coro()
+        while awaited is not None:
+            frame = getattr(awaited, "cr_frame", None) or getattr(
+                awaited, "gi_frame", None
+            )
+            if frame is None:
+                break
+            chain.append(frame)
+            awaited = getattr(awaited, "cr_await", None) or getattr(
+                awaited, "gi_yieldfrom", None
+            )
+        if not chain:
+            return ""
+        names = [describe_frame(frame) for frame in chain]
+        # the task is running: add the synchronous frames it called
+        running: list[FrameType] = []
+        frame: FrameType | None = sys._current_frames().get(self.thread_id)
+        while frame is not None and frame is not chain[-1]:
+            running.append(frame)
+            frame = frame.f_back
+        if frame is chain[-1]:
+            names.extend(describe_frame(caller) for caller in reversed(running))
+        else:
+            names.append(f"[await {type(awaited).__name__}]")
+        return ";".join(names)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.items())
+
+
+def write_profile(directory: str, name: str, body: str, max_profiles: int) -> None:
+    """
+    Writes a profile into the ring of profile files, deleting the oldest
+    :param directory: Profiles directory
+    :param name: File name
+    :param body: Collapsed stacks
+    :param max_profiles: Number of profiles kept
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, name), "w") as file:
+        file.write(body)
+    profiles = sorted(
+        entry for entry in os.listdir(directory) if entry.endswith(".collapsed")
+    )
+    for stale in profiles[: max(0, len(profiles) - max_profiles)]:
+        os.remove(os.path.join(directory, stale))
+
+
+def profile_name(scope: Scope) -> str:
+    path = re.sub(r"[^A-Za-z0-9]+", "_", scope.get("path", "")).strip("_")
+    return f"{time.time_ns()}-{scope.get('method', '')}-{path or 'root'}.collapsed"
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling the whole request, dependencies included
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        sample_rate: float | None = None,
+        profiles_dir: str = PROFILES_DIR,
+        max_profiles: int = MAX_PROFILES,
+        interval: float = PROFILE_INTERVAL_SECONDS,
+    ) -> None:
+        self.app = app
+        if sample_rate is None:
+            sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        self.sample_rate = sample_rate
+        self.profiles_dir = profiles_dir
+        self.max_profiles = max_profiles
+        self.interval = interval
+
+    def get_trigger(self, scope: Scope) -> bytes | None:
+        """
+        Decides whether to profile a request
+        :param scope: ASGI scope
+        :return: X-Profile header value, b"" when sampled, None to skip
+        """
+        trigger = admin_token = None
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                trigger = value
+            elif name == ADMIN_TOKEN_HEADER:
+                admin_token = value
+        if trigger is not None and is_admin_token(
+            admin_token.decode("latin-1") if admin_token is not None else None
+        ):
+            return trigger
+        if self.sample_rate and random.random() < self.sample_rate:
+            return b""
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = self.get_trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        task = asyncio.current_task()
+        assert task is not None
+        sampler = StackSampler(task, self.interval)
+        if trigger.strip().lower() == COLLAPSED:
+            await self.respond_with_profile(sampler, scope, receive, send)
+            return
+        name = profile_name(scope)
+
+        async def send_with_header(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-file", name.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            sampler.stop()
+            await asyncio.to_thread(
+                write_profile,
+                self.profiles_dir,
+                name,
+                sampler.collapsed(),
+                self.max_profiles,
+            )
+
+    async def respond_with_profile(
+        self, sampler: StackSampler, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        status = 500
+
+        async def discard(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            sampler.stop()
+        body = sampler.collapsed().encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/plain; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"x-profiled-status", str(status).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -2,10 +2,38 @@
 Global queries used throughout the application
 """
 
-from sqlalchemy import select
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import bindparam, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.models import User
+from backend.single_flight import single_flight
+from backend.timezones import registry as timezone_registry
+
+USERS = User.__table__
+
+
+@dataclass(slots=True, frozen=True)
+class UserRow:
+    # read-only copy of a user, not tracked by the session
+    user_id: uuid.UUID
+    timezone_id: int
+    created_at: datetime
+    updated_at: datetime
+
+    @property
+    def timezone(self) -> str:
+        return timezone_registry.name(self.timezone_id)
+
+
+# built once: the compiled form is cached and asyncpg reuses its prepared
+# statement, so a call only binds the parameter
+SELECT_USER = select(
+    USERS.c.user_id, USERS.c.timezone_id, USERS.c.created_at, USERS.c.updated_at
+).where(USERS.c.user_id == bindparam("user_id"))
 
 
 async def get_user_by_uuid(user_uuid: str, db: AsyncSession) -> User | None:
@@ -16,4 +44,27 @@ async def get_user_by_uuid(user_uuid: str, db: AsyncSession) -> User | None:
     :return: User or None
     """
     result = await db.scalars(select(User).where(User.user_id == user_uuid))
-    return result.one_or_none()
+    user = result.one_or_none()
+    if user is not None:
+        await timezone_registry.ensure_loaded(user.timezone_id, db)
+    return user
+
+
+@single_flight
+async def fetch_user(user_uuid: str, db: AsyncSession) -> UserRow | None:
+    """
+    Gets a read-only user by its UUID. Runs on the session's connection
+    without the ORM, so use `get_user_by_uuid` to change the user.
+    Concurrent calls for the same user share one query
+    :param user_uuid: User's UUID
+    :param db: Database session
+    :return: UserRow or None
+    """
+    connection = await db.connection()
+    result = await connection.execute(SELECT_USER, {"user_id": user_uuid})
+    row = result.first()
+    if row is None:
+        return None
+    user = UserRow(*row)
+    await timezone_registry.ensure_loaded(user.timezone_id, connection)
+    return user
@@ -0,0 +1,144 @@
+"""
+In-memory token-bucket admission control keyed on the requesting user
+"""
+
+import math
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException, Request
+
+# per route group bucket settings, tune these using the counters exposed by
+# `GET /admin/rate-limits`
+RATE_LIMIT_CONFIG: dict[str, dict[str, float]] = {
+    "users": {"capacity": 10, "refill_per_second": 1},
+    "standard": {"capacity": 10, "refill_per_second": 1},
+    "standard_transitions": {"capacity": 20, "refill_per_second": 4},
+    "webhooks": {"capacity": 5, "refill_per_second": 0.5},
+}
+MAX_BUCKETS: int = 100_000  # upper bound on buckets kept in memory per group
+
+
+class TokenBucket:
+    """
+    Single token bucket, refilled lazily whenever it is consumed from
+    """
+
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, tokens: float, updated_at: float) -> None:
+        self.tokens = tokens
+        self.updated_at = updated_at
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter with LRU eviction of idle buckets
+    """
+
+    def __init__(
+        self,
+        capacity: float,
+        refill_per_second: float,
+        max_buckets: int = MAX_BUCKETS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.max_buckets = max_buckets
+        self.clock = clock
+        self.buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self.counters: dict[str, int] = {"allowed": 0, "rejected": 0, "evicted": 0}
+
+    def acquire(self, key: str) -> bool:
+        """
+        Takes a token from the bucket belonging to `key`
+        :param key: Identifier of the caller (usually the user's UUID)
+        :return: bool: True if the request is admitted, False otherwise
+        """
+        now = self.clock()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.capacity, now)
+            self.buckets[key] = bucket
+            if len(self.buckets) > self.max_buckets:
+                # least recently used bucket sits at the front
+                self.buckets.popitem(last=False)
+                self.counters["evicted"] += 1
+        else:
+            self.buckets.move_to_end(key)
+            elapsed = now - bucket.updated_at
+            bucket.tokens = min(
+                self.capacity, bucket.tokens + elapsed * self.refill_per_second
+            )
+            bucket.updated_at = now
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            self.counters["allowed"] += 1
+            return True
+        self.counters["rejected"] += 1
+        return False
+
+    def retry_after(self, key: str) -> int:
+        """
+        Seconds until the bucket belonging to `key` holds a whole token again
+        :param key: Identifier of the caller
+        :return: int: Seconds to wait, rounded up
+        """
+        bucket = self.buckets.get(key)
+        if bucket is None or bucket.tokens >= 1:
+            return 0
+        return math.ceil((1 - bucket.tokens) / self.refill_per_second)
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        Returns the counters and settings for this limiter
+        """
+        return {
+            **self.counters,
+            "buckets": len(self.buckets),
+            "capacity": self.capacity,
+            "refill_per_second": self.refill_per_second,
+        }
+
+
+limiters: dict[str, RateLimiter] = {
+    group: RateLimiter(settings["capacity"], settings["refill_per_second"])
+    for group, settings in RATE_LIMIT_CONFIG.items()
+}
+
+
+def get_rate_limit_key(request: Request) -> str:
+    """
+    Gets the key used to bucket a request.
+    Falls back to the path UUID and then the client address when the
+    X-User-ID header is missing (e.g. when a user is being created)
+    :param request: Incoming request
+    :return: str: Bucket key
+    """
+    user_id = request.headers.get("x-user-id") or request.path_params.get("user_uuid")
+    if user_id:
+        return user_id
+    return request.client.host if request.client else "anonymous"
+
+
+def rate_limit(group: str) -> Callable[[Request], Awaitable[None]]:
+    """
+    Builds a dependency enforcing the limiter of the given route group.
+    Add it to the route's `dependencies` so it is resolved before `get_db`
+    :param group: Key in `RATE_LIMIT_CONFIG`
+    :return: FastAPI dependency raising 429 when the bucket is empty
+    """
+    limiter = limiters[group]
+
+    async def dependency(request: Request) -> None:
+        key = get_rate_limit_key(request)
+        if not limiter.acquire(key):
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(limiter.retry_after(key))},
+            )
+
+    return dependency
@@ -0,0 +1,153 @@
+"""
+Storage backends for the reads served by `GET /users/{uuid}` and
+`GET /standard/{timer_id}`.
+
+`PostgresRepository` wraps the Core fast path used in production.
+`MemoryRepository` keeps rows in dictionaries with the same semantics, so
+those handlers and the app overhead benchmark can run without a database.
+Both return the same frozen rows. Writes and state transitions go through
+the session in their handlers; `MemoryRepository.add_user` and
+`add_standard_timer` only seed it.
+"""
+
+import itertools
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+
+from fastapi import Depends
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import backend.queries as queries
+from backend.db import get_db
+from backend.models import StandardTimer, User
+from backend.queries import UserRow
+from backend.standard_timer import queries as standard_queries
+from backend.standard_timer.queries import StandardTimerRow
+from backend.timezones import iana_rows
+from backend.timezones import registry as timezone_registry
+
+
+class Repository(ABC):
+    """
+    Data access used by the request handlers.
+    UUID arguments must already be validated by the caller
+    """
+
+    @abstractmethod
+    async def get_user_by_uuid(self, user_uuid: str) -> UserRow | None:
+        """
+        Gets a user by its UUID, for reading only
+        :param user_uuid: User's UUID
+        :return: UserRow or None
+        """
+
+    @abstractmethod
+    async def get_standard_timer(
+        self, timer_id: int, user_id: str
+    ) -> StandardTimerRow | None:
+        """
+        Gets a standard timer belonging to the given user, for reading only
+        :param timer_id: Timer's ID
+        :param user_id: Owner's UUID
+        :return: StandardTimerRow or None
+        """
+
+
+class PostgresRepository(Repository):
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def get_user_by_uuid(self, user_uuid: str) -> UserRow | None:
+        return await queries.fetch_user(user_uuid, self.db)
+
+    async def get_standard_timer(
+        self, timer_id: int, user_id: str
+    ) -> StandardTimerRow | None:
+        return await standard_queries.fetch_timer(timer_id, user_id, self.db)
+
+
+class MemoryRepository(Repository):
+    def __init__(self) -> None:
+        self.users: dict[uuid.UUID, User] = {}
+        self.standard_timers: dict[int, StandardTimer] = {}
+        self._timer_ids = itertools.count(1)
+        if not timezone_registry.loaded:
+            # the ids a freshly migrated database starts with
+            timezone_registry.load_rows(iana_rows())
+
+    async def get_user_by_uuid(self, user_uuid: str) -> UserRow | None:
+        user = self.users.get(uuid.UUID(str(user_uuid)))
+        if user is None:
+            return None
+        return UserRow(
+            user_id=uuid.UUID(str(user.user_id)),
+            timezone_id=user.timezone_id,
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+        )
+
+    async def get_standard_timer(
+        self, timer_id: int, user_id: str
+    ) -> StandardTimerRow | None:
+        timer = self.standard_timers.get(timer_id)
+        if timer is None or str(timer.user_id) != str(uuid.UUID(str(user_id))):
+            return None
+        # a copy, like the row the database returns
+        return StandardTimerRow(
+            **{name: getattr(timer, name) for name in StandardTimerRow.__slots__}
+        )
+
+    async def add_user(self, user: User) -> User:
+        """
+        Seeds a user, filling in its timestamps
+        :param user: New user
+        :return: The saved user
+        :raises IntegrityError: if a user with the same UUID exists
+        """
+        key = uuid.UUID(str(user.user_id))
+        if key in self.users:
+            raise IntegrityError(
+                "INSERT INTO users", None, ValueError("duplicate user_id")
+            )
+        user.created_at = user.updated_at = datetime.now(timezone.utc)
+        self.users[key] = user
+        return user
+
+    async def add_standard_timer(self, timer: StandardTimer) -> StandardTimer:
+        """
+        Seeds a standard timer, assigning its ID and timestamps
+        :param timer: New timer
+        :return: The saved timer
+        :raises IntegrityError: if the owning user does not exist
+        """
+        if uuid.UUID(str(timer.user_id)) not in self.users:
+            raise IntegrityError(
+                "INSERT INTO standard_timer", None, ValueError("unknown user_id")
+            )
+        # mirror the column defaults applied by the database
+        for column, default in (
+            ("elapsed_seconds", 0),
+            ("total_paused_seconds", 0),
+            ("total_pause_count", 0),
+            ("is_started", False),
+            ("is_paused", False),
+            ("is_completed", False),
+            ("version", 1),
+            ("pause_intervals", []),
+        ):
+            if getattr(timer, column) is None:
+                setattr(timer, column, default)
+        timer.id = next(self._timer_ids)
+        timer.created_at = timer.updated_at = datetime.now(timezone.utc)
+        self.standard_timers[timer.id] = timer
+        return timer
+
+
+async def get_repository(db: AsyncSession = Depends(get_db)) -> Repository:
+    """
+    Gets the repository used via dependency injections in fast api endpoint
+    handling, override it to swap the storage backend
+    """
+    return PostgresRepository(db)
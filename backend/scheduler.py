@@ -0,0 +1,234 @@
+"""
+In-process scheduler for timer deadlines.
+
+Deadlines live in a hierarchical timing wheel: level 0 has one slot per
+tick, and each higher level has slots spanning a whole rotation of the level
+below it. Scheduling and cancelling are O(1) dictionary operations. Each
+entry is moved down a level at most `levels - 1` times before it fires, so
+memory stays proportional to the number of pending deadlines rather than to
+how far away they are.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+TICK_SECONDS: float = 1.0
+SLOT_BITS: int = 6  # 64 slots per level
+LEVELS: int = 4  # 64**4 ticks, about 194 days at one tick per second
+
+Handler = Callable[[Hashable], Awaitable[None]]
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel keyed by caller supplied keys. Time is measured
+    in integer ticks; the caller decides how long a tick is
+    """
+
+    def __init__(
+        self, current_tick: int = 0, slot_bits: int = SLOT_BITS, levels: int = LEVELS
+    ) -> None:
+        self.current_tick = current_tick
+        self.slot_bits = slot_bits
+        self.levels = levels
+        self.mask = (1 << slot_bits) - 1
+        # every slot maps key -> deadline tick
+        self.slots: list[list[dict[Hashable, int]]] = [
+            [{} for _ in range(1 << slot_bits)] for _ in range(levels)
+        ]
+        # key -> slot holding it, so cancelling never scans the wheel
+        self.locations: dict[Hashable, dict[Hashable, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.locations
+
+    def deadline(self, key: Hashable) -> int | None:
+        """
+        Gets the tick a key is scheduled to fire at
+        :param key: Scheduled key
+        :return: int: Deadline tick, or None if the key is not scheduled
+        """
+        slot = self.locations.get(key)
+        return None if slot is None else slot[key]
+
+    def schedule(self, key: Hashable, deadline_tick: int) -> None:
+        """
+        Schedules a key, replacing any deadline it already had. Deadlines that
+        already passed fire on the next tick
+        :param key: Key to schedule
+        :param deadline_tick: Tick the key fires at
+        """
+        self.cancel(key)
+        self._place(key, max(deadline_tick, self.current_tick + 1))
+
+    def cancel(self, key: Hashable) -> bool:
+        """
+        Removes a scheduled key
+        :param key: Key to remove
+        :return: bool: True if the key was scheduled, False otherwise
+        """
+        slot = self.locations.pop(key, None)
+        if slot is None:
+            return False
+        del slot[key]
+        return True
+
+    def clear(self) -> None:
+        for level in self.slots:
+            for slot in level:
+                slot.clear()
+        self.locations.clear()
+
+    def advance(self, to_tick: int) -> list[Hashable]:
+        """
+        Moves the wheel forward, collecting every key whose deadline passed
+        :param to_tick: Tick to advance to
+        :return: list of expired keys, in deadline order
+        """
+        expired: list[Hashable] = []
+        while self.current_tick < to_tick:
+            if not self.locations:
+                # nothing pending, skip the idle ticks
+                self.current_tick = to_tick
+                break
+            self.current_tick += 1
+            self._cascade()
+            slot = self.slots[0][self.current_tick & self.mask]
+            if slot:
+                for key in slot:
+                    del self.locations[key]
+                expired.extend(slot)
+                slot.clear()
+        return expired
+
+    def _place(self, key: Hashable, deadline_tick: int) -> None:
+        delta = deadline_tick - self.current_tick
+        for level in range(self.levels):
+            if delta < 1 << (self.slot_bits * (level + 1)):
+                index = (deadline_tick >> (self.slot_bits * level)) & self.mask
+                break
+        else:
+            # beyond the wheel's range: park in the slot cascaded last and
+            # place it again from there
+            level = self.levels - 1
+            shift = self.slot_bits * level
+            index = ((self.current_tick >> shift) - 1) & self.mask
+        slot = self.slots[level][index]
+        slot[key] = deadline_tick
+        self.locations[key] = slot
+
+    def _cascade(self) -> None:
+        # at the start of each rotation, move the next slot of every higher
+        # level down to the levels below it
+        for level in range(1, self.levels):
+            shift = self.slot_bits * level
+            if self.current_tick & ((1 << shift) - 1):
+                break
+            slot = self.slots[level][(self.current_tick >> shift) & self.mask]
+            if slot:
+                entries = list(slot.items())
+                slot.clear()
+                for key, deadline_tick in entries:
+                    self._place(key, deadline_tick)
+
+
+class TimerScheduler:
+    """
+    Drives a timing wheel from the wall clock and passes expired keys to the
+    subscribed handlers
+    """
+
+    def __init__(
+        self,
+        tick_seconds: float = TICK_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.tick_seconds = tick_seconds
+        self.clock = clock
+        self.wheel = TimingWheel(self.current_tick())
+        self.handlers: list[Handler] = []
+        self._task: asyncio.Task | None = None
+        self._dispatches: set[asyncio.Task] = set()
+
+    def current_tick(self) -> int:
+        return math.floor(self.clock() / self.tick_seconds)
+
+    def to_tick(self, when: datetime) -> int:
+        # rounded up so a deadline never fires early
+        return math.ceil(when.timestamp() / self.tick_seconds)
+
+    def subscribe(self, handler: Handler) -> None:
+        """
+        Registers a coroutine called with every expired key
+        :param handler: Async callable taking the key
+        """
+        self.handlers.append(handler)
+
+    def schedule(self, key: Hashable, deadline: datetime) -> None:
+        self.wheel.schedule(key, self.to_tick(deadline))
+
+    def cancel(self, key: Hashable) -> bool:
+        return self.wheel.cancel(key)
+
+    async def run_once(self) -> list[Hashable]:
+        """
+        Advances the wheel to the current time and dispatches expired keys
+        without waiting for the handlers
+        :return: list of expired keys
+        """
+        expired = self.wheel.advance(self.current_tick())
+        if expired and self.handlers:
+            task = asyncio.create_task(self._dispatch(expired))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+        return expired
+
+    async def _dispatch(self, keys: list[Hashable]) -> None:
+        for key in keys:
+            for handler in self.handlers:
+                try:
+                    await handler(key)
+                except Exception:
+                    logger.exception("Timer handler failed for %s", key)
+
+    async def _run(self, loader: Callable[[], Awaitable[None]] | None) -> None:
+        if loader is not None:
+            try:
+                await loader()
+            except Exception:
+                logger.exception("Failed to load scheduled timers")
+        while True:
+            await self.run_once()
+            next_tick = (self.current_tick() + 1) * self.tick_seconds
+            await asyncio.sleep(max(0.0, next_tick - self.clock()))
+
+    def start(self, loader: Callable[[], Awaitable[None]] | None = None) -> None:
+        """
+        Starts ticking in a background task
+        :param loader: Coroutine run first to reschedule pending deadlines
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(loader))
+
+    async def stop(self) -> None:
+        """
+        Stops ticking and waits for running dispatches to finish
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._dispatches:
+            await asyncio.gather(*self._dispatches, return_exceptions=True)
@@ -2,11 +2,12 @@
 Global Pydantic schemas used throughout the application
 """
 
-import uuid
 from uuid import UUID
 
 from pydantic import BaseModel, ConfigDict, Field
 
+from backend.ids import uuid7
+
 
 class CreateUserIn(BaseModel):
     timezone: str = Field(
@@ -22,8 +23,8 @@ class CreateUserIn(BaseModel):
 class CreateUserOut(BaseModel):
     user_id: UUID = Field(
         title="UUID",
-        description="The created user ID in UUID4 format",
-        example=uuid.uuid4(),
+        description="The created user ID in UUID7 format",
+        example=uuid7(),
     )
     timezone: str = Field(
         title="IANA Timezone",
@@ -36,7 +37,9 @@ class CreateUserOut(BaseModel):
 
 class GetUserOut(BaseModel):
     user_id: UUID = Field(
-        title="UUID", description="The user's ID in UUID4 format", example=uuid.uuid4()
+        title="UUID",
+        description="The user's ID in UUID format, v7 or v4 for older users",
+        example=uuid7(),
     )
     timezone: str = Field(
         title="IANA Timezone",
@@ -45,3 +48,14 @@ class GetUserOut(BaseModel):
         description="The timezone associated with the user's browser",
     )
     model_config = ConfigDict(from_attributes=True)
+
+
+class ServerTimeOut(BaseModel):
+    server_time: str = Field(
+        title="Server time ISO",
+        description="Server time in ISO 8601 format with microseconds",
+    )
+    epoch_ms: float = Field(
+        title="Server time epoch",
+        description="Server time as Unix epoch milliseconds",
+    )
@@ -0,0 +1,247 @@
+"""
+Maintenance jobs for the user shards listed in `DB_SHARDS`, see
+`backend.db.ShardMap`.
+
+Adding a shard:
+    1. create its database with the primary's schema (`pg_dump --schema-only`)
+       and run `alembic -x shard=<name> stamp head`
+    2. append it to DB_SHARDS, set DB_SHARDS_PREVIOUS to the old names
+    3. python -m backend.shards prepare, which also copies the timezones
+    4. deploy, then python -m backend.shards rebalance
+    5. unset DB_SHARDS_PREVIOUS and deploy again
+
+Users keep their ids when they move, and so do their timers and webhooks.
+`prepare` makes the id sequences of every shard step by `MAX_SHARDS` from a
+different offset, so rows created on different shards never share an id.
+"""
+
+import argparse
+import asyncio
+import logging
+import uuid
+from collections import Counter
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db import ShardMap, dispose_engine, get_shard_map
+
+logger = logging.getLogger(__name__)
+
+MAX_SHARDS: int = 64  # id sequences step by this, so at most this many shards
+ID_HEADROOM: int = 100_000  # ids the app may take while `prepare` runs
+LIST_BATCH: int = 1_000  # user ids read per query while rebalancing
+SEQUENCES: tuple[str, ...] = (
+    "standard_timer_id_seq",
+    "webhook_subscriptions_id_seq",
+    "webhook_deliveries_id_seq",
+)
+# everything a user owns, parents first, with the condition selecting it
+USER_TABLES: tuple[tuple[str, str], ...] = (
+    ("users", "user_id = :user_id"),
+    ("standard_timer", "user_id = :user_id"),
+    ("standard_timer_archive", "user_id = :user_id"),
+    ("webhook_subscriptions", "user_id = :user_id"),
+    (
+        "webhook_deliveries",
+        "subscription_id IN "
+        "(SELECT id FROM webhook_subscriptions WHERE user_id = :user_id)",
+    ),
+)
+
+
+async def prepare_sequences(shard_map: ShardMap) -> dict[str, int]:
+    """
+    Restarts the id sequences of every shard above the highest id any shard
+    has handed out, stepping by `MAX_SHARDS` from the shard's position in
+    the map
+    :param shard_map: Shards
+    :return: dict of sequence name to the first id of the primary
+    """
+    starts: dict[str, int] = {}
+    for sequence in SEQUENCES:
+        highest = 0
+        for shard in shard_map.names:
+            async with shard_map.session_generator(shard)() as db:
+                if await db.scalar(text(f"SELECT to_regclass('{sequence}')")) is None:
+                    continue
+                last = await db.scalar(text(f"SELECT last_value FROM {sequence}"))
+                highest = max(highest, last)
+        base = (highest + ID_HEADROOM) // MAX_SHARDS * MAX_SHARDS + MAX_SHARDS
+        for position, shard in enumerate(shard_map.names):
+            async with shard_map.session_generator(shard)() as db:
+                if await db.scalar(text(f"SELECT to_regclass('{sequence}')")) is None:
+                    continue
+                await db.execute(
+                    text(
+                        f"ALTER SEQUENCE {sequence} INCREMENT BY {MAX_SHARDS} "
+                        f"RESTART WITH {base + position}"
+                    )
+                )
+                await db.commit()
+        starts[sequence] = base
+    return starts
+
+
+async def copy_timezones(shard_map: ShardMap) -> int:
+    """
+    Copies the primary's `timezones` rows to the other shards, so a timezone
+    id means the same zone everywhere
+    :param shard_map: Shards
+    :return: int: Rows inserted
+    """
+    async with shard_map.session_generator()() as primary:
+        ids, names = zip(*await primary.execute(text("SELECT id, name FROM timezones")))
+    inserted = 0
+    for shard in shard_map.names[1:]:
+        async with shard_map.session_generator(shard)() as db:
+            result = await db.execute(
+                text(
+                    "INSERT INTO timezones (id, name) SELECT * FROM "
+                    "unnest(CAST(:ids AS integer[]), CAST(:names AS text[])) "
+                    "ON CONFLICT DO NOTHING"
+                ),
+                {"ids": list(ids), "names": list(names)},
+            )
+            inserted += result.rowcount
+            await db.commit()
+    return inserted
+
+
+async def get_user_tables(db: AsyncSession) -> list[tuple[str, str]]:
+    # the archive exists once `backend.partitions` created it
+    return [
+        (table, condition)
+        for table, condition in USER_TABLES
+        if await db.scalar(text(f"SELECT to_regclass('{table}')")) is not None
+    ]
+
+
+async def move_user(
+    shard_map: ShardMap, user_id: uuid.UUID, source: str, target: str
+) -> bool:
+    """
+    Moves a user and everything they own to another shard. The source rows
+    stay locked until they are deleted, so a request writing to them waits
+    and then finds them gone instead of writing to the copy left behind
+    :param shard_map: Shards
+    :param user_id: User's UUID
+    :param source: Shard holding the user
+    :param target: Shard the user moves to
+    :return: bool: False if the user wasn't on the source shard
+    """
+    params = {"user_id": user_id}
+    async with (
+        shard_map.session_generator(source)() as source_db,
+        shard_map.session_generator(target)() as target_db,
+    ):
+        found = await source_db.scalar(
+            text("SELECT 1 FROM users WHERE user_id = :user_id FOR UPDATE"), params
+        )
+        if found is None:
+            return False
+        tables = await get_user_tables(source_db)
+        # a run stopped after committing the copy, which requests use since
+        copied = await target_db.scalar(
+            text("SELECT EXISTS (SELECT 1 FROM users WHERE user_id = :user_id)"),
+            params,
+        )
+        if not copied:
+            for table, condition in tables:
+                rows = await source_db.scalar(
+                    text(
+                        f"SELECT coalesce(json_agg(locked), '[]')::text FROM ("
+                        f"SELECT * FROM {table} WHERE {condition} FOR UPDATE"
+                        f") AS locked"
+                    ),
+                    params,
+                )
+                # matched by column name, so column order may differ per shard
+                await target_db.execute(
+                    text(
+                        f"INSERT INTO {table} SELECT * FROM json_populate_recordset("
+                        f"NULL::{table}, CAST(:rows AS json))"
+                    ),
+                    {"rows": rows},
+                )
+            await target_db.commit()
+        for table, condition in reversed(tables):
+            await source_db.execute(
+                text(f"DELETE FROM {table} WHERE {condition}"), params
+            )
+        await source_db.commit()
+    return True
+
+
+async def rebalance(shard_map: ShardMap, dry_run: bool = False) -> Counter[str]:
+    """
+    Moves every user not on the shard the ring assigns them to
+    :param shard_map: Shards
+    :param dry_run: Only count the users to move
+    :return: Counter of "source -> target" moves
+    """
+    moves: Counter[str] = Counter()
+    for source in shard_map.names:
+        after = uuid.UUID(int=0)
+        while True:
+            async with shard_map.session_generator(source)() as db:
+                user_ids = list(
+                    await db.scalars(
+                        text(
+                            "SELECT user_id FROM users WHERE user_id > :after "
+                            "ORDER BY user_id LIMIT :limit"
+                        ),
+                        {"after": after, "limit": LIST_BATCH},
+                    )
+                )
+            if not user_ids:
+                break
+            after = user_ids[-1]
+            for user_id in user_ids:
+                target = shard_map.home(user_id)
+                if target == source:
+                    continue
+                if dry_run or await move_user(shard_map, user_id, source, target):
+                    moves[f"{source} -> {target}"] += 1
+            if moves:
+                logger.info("%s: %s", source, dict(moves))
+    return moves
+
+
+async def count_users(shard_map: ShardMap) -> dict[str, int]:
+    counts = {}
+    for shard in shard_map.names:
+        async with shard_map.session_generator(shard)() as db:
+            counts[shard] = await db.scalar(text("SELECT count(*) FROM users"))
+    return counts
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("prepare", help="make id sequences unique across shards")
+    move = commands.add_parser("rebalance", help="move users to their shard")
+    move.add_argument("--dry-run", action="store_true", help="only count moves")
+    commands.add_parser("status", help="count users per shard")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    shard_map = get_shard_map()
+    if args.command == "prepare":
+        for sequence, start in (await prepare_sequences(shard_map)).items():
+            print(f"{sequence}: restarted from {start}, step {MAX_SHARDS}")
+        print(f"timezones: {await copy_timezones(shard_map)} rows copied")
+    elif args.command == "rebalance":
+        moves = await rebalance(shard_map, args.dry_run)
+        for move_name, count in sorted(moves.items()):
+            print(f"{move_name}: {count} users{' to move' if args.dry_run else ''}")
+        if not moves:
+            print("every user is on its shard")
+    else:
+        for shard, count in (await count_users(shard_map)).items():
+            print(f"{shard}: {count} users")
+    await dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
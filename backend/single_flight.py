@@ -0,0 +1,112 @@
+"""
+Single-flight coalescing of identical reads.
+
+Several tabs of the same user, or a frontend re-initializing, send identical
+reads within milliseconds of each other. A function decorated with
+`single_flight` runs once per set of arguments at a time: callers arriving
+while a call is in flight wait for it and get its result or its exception
+instead of checking out their own connection.
+
+The `db` argument is left out of the key, so the call runs on the session of
+the caller that started it. Only decorate reads returning immutable values,
+such as the row dataclasses of the query modules, never ORM objects, which
+belong to that session. A caller joining a call sees data read by another
+transaction, so don't use them to read back the caller's own uncommitted
+writes.
+"""
+
+import asyncio
+import functools
+import inspect
+from typing import Any, Awaitable, Callable, Hashable, ParamSpec, TypeVar
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+SESSION_PARAMETER = "db"  # left out of the key
+
+
+class Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0  # callers awaiting the task
+
+
+class SingleFlight:
+    """
+    Calls in flight for one function, keyed by their arguments
+    """
+
+    def __init__(self, func: Callable[..., Awaitable[Any]]) -> None:
+        self.func = func
+        self.signature = inspect.signature(func)
+        self.calls: dict[Hashable, Call] = {}
+        self.counters: dict[str, int] = {"calls": 0, "joined": 0}
+
+    def key(self, *args: Any, **kwargs: Any) -> Hashable:
+        bound = self.signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return tuple(
+            (name, value)
+            for name, value in bound.arguments.items()
+            if name != SESSION_PARAMETER
+        )
+
+    async def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        key = self.key(*args, **kwargs)
+        call = self.calls.get(key)
+        is_leader = call is None
+        if call is None:
+            call = Call(asyncio.ensure_future(self.func(*args, **kwargs)))
+            self.calls[key] = call
+            call.task.add_done_callback(lambda task: self._forget(key, call))
+            self.counters["calls"] += 1
+        else:
+            self.counters["joined"] += 1
+        call.waiters += 1
+        try:
+            # shielded: one caller giving up doesn't cancel the others
+            result = await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            call.waiters -= 1
+            if not call.task.done():
+                if call.waiters == 0:
+                    # nobody is left waiting, later callers start a new call
+                    self._forget(key, call)
+                    call.task.cancel()
+                if is_leader:
+                    # the call runs on this caller's session, which must not
+                    # be closed under it: hold the cancellation until it ends
+                    await asyncio.wait([call.task])
+            raise
+        except BaseException:
+            call.waiters -= 1
+            raise
+        call.waiters -= 1
+        return result
+
+    def _forget(self, key: Hashable, call: Call) -> None:
+        if self.calls.get(key) is call:
+            del self.calls[key]
+        # retrieved so a call nobody awaits anymore doesn't log a warning
+        if call.task.done() and not call.task.cancelled():
+            call.task.exception()
+
+
+def single_flight(func: Callable[P, Awaitable[T]]) -> Callable[P, Awaitable[T]]:
+    """
+    Coalesces concurrent calls with the same arguments into one.
+    The `SingleFlight` state is exposed as the wrapper's `flight` attribute
+    :param func: async function reading the database
+    :return: wrapped function
+    """
+    flight = SingleFlight(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+        return await flight(*args, **kwargs)
+
+    wrapper.flight = flight  # type: ignore[attr-defined]
+    return wrapper
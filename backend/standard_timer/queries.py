@@ -1,4 +1,247 @@
 """
 Queries for the `standard-timer` operations
 """
-# TODO: Implement this file to run queries for `standard-timer` operations
+
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Sequence
+
+from sqlalchemy import Row, bindparam, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models import StandardTimer
+from backend.single_flight import single_flight
+
+EXPORT_WINDOW: int = 1000  # rows fetched from the server-side cursor at a time
+ACTIVE_WINDOW: int = 10_000  # running timers fetched at a time when rescheduling
+EXPORT_COLUMNS = (
+    StandardTimer.id,
+    StandardTimer.minutes,
+    StandardTimer.hours,
+    StandardTimer.start_time,
+    StandardTimer.end_time,
+    StandardTimer.elapsed_seconds,
+    StandardTimer.total_paused_seconds,
+    StandardTimer.total_pause_count,
+    StandardTimer.last_pause_time,
+    StandardTimer.is_started,
+    StandardTimer.is_paused,
+    StandardTimer.is_completed,
+    StandardTimer.created_at,
+    StandardTimer.updated_at,
+)
+
+
+@dataclass(slots=True, frozen=True)
+class StandardTimerRow:
+    # read-only copy of a standard timer, not tracked by the session
+    id: int
+    user_id: uuid.UUID
+    minutes: int
+    hours: int
+    start_time: datetime | None
+    end_time: datetime | None
+    elapsed_seconds: int
+    total_paused_seconds: int
+    total_pause_count: int
+    last_pause_time: datetime | None
+    is_started: bool
+    is_paused: bool
+    is_completed: bool
+    created_at: datetime
+    updated_at: datetime
+    version: int
+
+
+STANDARD_TIMERS = StandardTimer.__table__
+# built once, see `backend.queries.SELECT_USER`
+SELECT_TIMER = select(
+    *(STANDARD_TIMERS.c[name] for name in StandardTimerRow.__slots__)
+).where(
+    STANDARD_TIMERS.c.id == bindparam("timer_id"),
+    STANDARD_TIMERS.c.user_id == bindparam("user_id"),
+)
+
+
+async def get_timer_by_id(
+    timer_id: int, user_id: str, db: AsyncSession
+) -> StandardTimer | None:
+    """
+    Gets a standard timer belonging to the given user from the database
+    :param timer_id: Timer's ID
+    :param user_id: Owner's UUID
+    :param db: Database session
+    :return: StandardTimer or None
+    """
+    result = await db.scalars(
+        select(StandardTimer).where(
+            StandardTimer.id == timer_id, StandardTimer.user_id == user_id
+        )
+    )
+    return result.one_or_none()
+
+
+@single_flight
+async def fetch_timer(
+    timer_id: int, user_id: str, db: AsyncSession
+) -> StandardTimerRow | None:
+    """
+    Gets a read-only standard timer belonging to the given user. Runs on the
+    session's connection without the ORM, so use `get_timer_by_id` to change it.
+    Concurrent calls for the same timer share one query
+    :param timer_id: Timer's ID
+    :param user_id: Owner's UUID
+    :param db: Database session
+    :return: StandardTimerRow or None
+    """
+    connection = await db.connection()
+    result = await connection.execute(
+        SELECT_TIMER, {"timer_id": timer_id, "user_id": user_id}
+    )
+    row = result.first()
+    return StandardTimerRow(*row) if row is not None else None
+
+
+async def get_timers_by_user(user_id: str, db: AsyncSession) -> list[StandardTimer]:
+    """
+    Gets every standard timer belonging to the given user, oldest first
+    :param user_id: Owner's UUID
+    :param db: Database session
+    :return: list of StandardTimer
+    """
+    result = await db.scalars(
+        select(StandardTimer)
+        .where(StandardTimer.user_id == user_id)
+        .order_by(StandardTimer.id)
+    )
+    return list(result.all())
+
+
+async def stream_timers_by_user(
+    user_id: str, db: AsyncSession, window: int = EXPORT_WINDOW
+) -> AsyncIterator[Sequence[Row]]:
+    """
+    Streams every standard timer belonging to the given user through a
+    server-side cursor, so memory stays bounded by `window` rows
+    :param user_id: Owner's UUID
+    :param db: Database session
+    :param window: Rows fetched per round trip
+    :return: async iterator of row batches, oldest first
+    """
+    result = await db.stream(
+        select(*EXPORT_COLUMNS)
+        .where(StandardTimer.user_id == user_id)
+        .order_by(StandardTimer.id)
+        .execution_options(yield_per=window)
+    )
+    async for rows in result.partitions():
+        yield rows
+
+
+IMPORT_COLUMNS: tuple[str, ...] = (
+    "user_id",
+    "minutes",
+    "hours",
+    "start_time",
+    "end_time",
+    "elapsed_seconds",
+    "total_paused_seconds",
+    "total_pause_count",
+    "last_pause_time",
+    "is_started",
+    "is_paused",
+    "is_completed",
+    "created_at",
+    "updated_at",
+)
+
+
+async def copy_standard_timers(records: list[tuple], db: AsyncSession) -> None:
+    """
+    Bulk loads standard timers with COPY through the session's asyncpg connection.
+    The caller commits
+    :param records: tuples of values in `IMPORT_COLUMNS` order
+    :param db: Database session
+    """
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(  # type: ignore[union-attr]
+        StandardTimer.__tablename__, records=records, columns=IMPORT_COLUMNS
+    )
+
+
+# when a running timer finishes, in SQL
+DEADLINE = StandardTimer.start_time + func.make_interval(
+    0,
+    0,
+    0,
+    0,
+    StandardTimer.hours,
+    StandardTimer.minutes,
+    StandardTimer.total_paused_seconds,
+)
+
+
+async def stream_running_deadlines(
+    db: AsyncSession, window: int = ACTIVE_WINDOW
+) -> AsyncIterator[Sequence[Row]]:
+    """
+    Streams the deadline of every started, unpaused and unfinished timer
+    :param db: Database session
+    :param window: Rows fetched per round trip
+    :return: async iterator of (id, deadline) row batches
+    """
+    result = await db.stream(
+        select(StandardTimer.id, DEADLINE)
+        .where(
+            StandardTimer.is_started,
+            StandardTimer.start_time.is_not(None),
+            StandardTimer.is_paused.is_(False),
+            StandardTimer.is_completed.is_(False),
+        )
+        .execution_options(yield_per=window)
+    )
+    async for rows in result.partitions():
+        yield rows
+
+
+async def complete_expired_timer(timer_id: int, db: AsyncSession) -> Row | None:
+    """
+    Ends a running timer whose deadline has passed. The conditions are checked
+    in the update itself, so a timer paused or ended concurrently is left alone
+    and only one worker completes it. The caller commits
+    :param timer_id: Timer's ID
+    :param db: Database session
+    :return: Row with the completed timer's state, or None if nothing was completed
+    """
+    result = await db.execute(
+        update(StandardTimer)
+        .where(
+            StandardTimer.id == timer_id,
+            StandardTimer.is_started,
+            StandardTimer.is_paused.is_(False),
+            StandardTimer.is_completed.is_(False),
+            DEADLINE <= func.now(),
+        )
+        .values(
+            is_completed=True,
+            end_time=DEADLINE,
+            elapsed_seconds=StandardTimer.hours * 3600 + StandardTimer.minutes * 60,
+            # a transition that loaded the timer before this fails its version check
+            version=StandardTimer.version + 1,
+        )
+        .returning(
+            StandardTimer.id,
+            StandardTimer.user_id,
+            StandardTimer.minutes,
+            StandardTimer.hours,
+            StandardTimer.start_time,
+            StandardTimer.end_time,
+            StandardTimer.elapsed_seconds,
+            StandardTimer.total_paused_seconds,
+            StandardTimer.total_pause_count,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.one_or_none()
@@ -5,92 +5,437 @@ Routing file for standard timer package
 # TODO: Implement this file to route requests for `standard-timer` operations, all paths will be prefixed with /standard
 
 import uuid
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Header, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 
+import backend.clock as clock
+import backend.etag as etag
+import backend.idempotency as idempotency
+import backend.usage as usage
 from backend.db import get_db
-from backend.models import StandardTimer, User
-from backend.queries import get_user_by_uuid
-from backend.standard_timer import services
+from backend.load_shedding import shed_load
+from backend.models import MAX_INTEGER_ID, StandardTimer
+from backend.queries import UserRow, fetch_user
+from backend.rate_limit import rate_limit
+from backend.repository import Repository, get_repository
+from backend.standard_timer import queries, services
 from backend.standard_timer.schemas import (
     CreateStandardTimerIn,
     CreateStandardTimerOut,
     EndStandardTimerOut,
+    GetStandardTimerOut,
+    ImportRowError,
+    ImportStandardTimersOut,
     PauseStandardTimerOut,
     ResumeStandardTimerOut,
     StartStandardTimerOut,
 )
+from backend.timezones import registry as timezone_registry
+from backend.webhooks.services import dispatcher as webhook_dispatcher
 
 router = APIRouter(prefix="/standard", tags=["standard-timer"])
 
+IMPORT_CHUNK_SIZE: int = 5000  # rows sent per COPY
+MAX_REPORTED_ERRORS: int = 100
 
-@router.post("", response_model=CreateStandardTimerOut)
+
+@router.post(
+    "",
+    response_model=CreateStandardTimerOut,
+    dependencies=[Depends(shed_load), Depends(rate_limit("standard"))],
+)
 async def create_standard_timer(
     data: CreateStandardTimerIn,
     db: AsyncSession = Depends(get_db),
     user_id: str = Depends(services.get_user_header_id),
+    idempotency_key: str | None = Depends(idempotency.get_idempotency_key),
 ) -> JSONResponse | CreateStandardTimerOut:
+    # replay retried requests
+    request = idempotency.for_request(
+        "create_standard_timer", idempotency_key, data, user_id
+    )
+    if request:
+        stored = await idempotency.get_stored_response(request, db)
+        if stored:
+            return stored
     # validate UUID
     try:
         valid_id = uuid.UUID(user_id)
     except ValueError:
         return JSONResponse(status_code=400, content={"message": "Invalid UUID"})
     # validate matching user
-    user: User | None = await get_user_by_uuid(user_id, db)
+    user: UserRow | None = await fetch_user(user_id, db)
     if not user:
         return JSONResponse(status_code=400, content={"message": "User not found"})
+    usage.recorder.record_user(str(user.user_id))
     # create timer
     try:
         timer = StandardTimer(user_id=valid_id, minutes=data.minutes, hours=data.hours)
         # save timer and send response
         db.add(timer)
-        await db.commit()
-        await db.refresh(timer)
-        return CreateStandardTimerOut(
+        await db.flush()
+        response = CreateStandardTimerOut(
             timer_id=str(timer.id), minutes=timer.minutes, hours=timer.hours
         )
+        if request:
+            idempotency.save_response(request, response, db)
+        replay = await idempotency.commit_or_replay(request, db)
+        if replay:
+            return replay
+        return response
     except ValueError as e:
         # value error thrown from @validates function in `db.py`
         return JSONResponse(status_code=400, content={"message": f"{e.args[0]}"})
 
 
-@router.post("/start/{timer_id}", response_model=StartStandardTimerOut)
+@router.get(
+    "/export", dependencies=[Depends(shed_load), Depends(rate_limit("standard"))]
+)
+async def export_standard_timers(
+    export_format: Literal["csv", "ndjson"] = Query("ndjson", alias="format"),
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(services.get_user_header_id),
+) -> Response:
+    # validate UUID
+    try:
+        uuid.UUID(user_id)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"message": "Invalid UUID"})
+    # validate matching user
+    user: UserRow | None = await fetch_user(user_id, db)
+    if not user:
+        return JSONResponse(status_code=400, content={"message": "User not found"})
+    usage.recorder.record_user(str(user.user_id))
+    # rows are fetched lazily while the response is sent
+    batches = queries.stream_timers_by_user(user_id, db)
+    zone = timezone_registry.zone(user.timezone_id)
+    if export_format == "csv":
+        body, media_type = services.export_csv(batches, zone), "text/csv"
+    else:
+        body, media_type = services.export_ndjson(batches, zone), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="standard-timers.{export_format}"'
+            )
+        },
+    )
+
+
+@router.post(
+    "/import",
+    response_model=ImportStandardTimersOut,
+    dependencies=[Depends(shed_load), Depends(rate_limit("standard"))],
+)
+async def import_standard_timers(
+    request: Request,
+    import_format: Literal["csv", "ndjson"] = Query("ndjson", alias="format"),
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(services.get_user_header_id),
+) -> JSONResponse | ImportStandardTimersOut:
+    # validate UUID
+    try:
+        valid_id = uuid.UUID(user_id)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"message": "Invalid UUID"})
+    # validate matching user
+    user: UserRow | None = await fetch_user(user_id, db)
+    if not user:
+        return JSONResponse(status_code=400, content={"message": "User not found"})
+    usage.recorder.record_user(str(user.user_id))
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > services.MAX_IMPORT_BYTES:
+        return JSONResponse(
+            status_code=413,
+            content={
+                "message": f"Upload exceeds {services.MAX_IMPORT_BYTES} bytes",
+                "accepted": 0,
+            },
+        )
+    zone = timezone_registry.zone(user.timezone_id)
+    # release the connection while the upload is read
+    await db.commit()
+    accepted, rejected = 0, 0
+    errors: list[ImportRowError] = []
+    records: list[tuple] = []
+    lines = services.iter_lines(request.stream())
+    try:
+        async for line, fields, error in services.iter_import_rows(
+            lines, import_format
+        ):
+            if fields is not None:
+                try:
+                    records.append(services.parse_import_row(fields, valid_id, zone))
+                except ValueError as e:
+                    error = f"{e.args[0]}"
+            if error is not None:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(ImportRowError(line=line, message=error))
+            if len(records) >= IMPORT_CHUNK_SIZE:
+                await queries.copy_standard_timers(records, db)
+                await db.commit()
+                accepted += len(records)
+                records = []
+    except services.ImportTooLarge as e:
+        # chunks copied before the limit was hit stay imported
+        return JSONResponse(
+            status_code=413, content={"message": f"{e.args[0]}", "accepted": accepted}
+        )
+    if records:
+        await queries.copy_standard_timers(records, db)
+        await db.commit()
+        accepted += len(records)
+    return ImportStandardTimersOut(accepted=accepted, rejected=rejected, errors=errors)
+
+
+@router.get(
+    "/{timer_id}",
+    response_model=GetStandardTimerOut,
+    dependencies=[Depends(shed_load), Depends(rate_limit("standard"))],
+)
+async def get_standard_timer(
+    timer_id: str,
+    response: Response,
+    repository: Repository = Depends(get_repository),
+    user_id: str = Depends(services.get_user_header_id),
+    if_none_match: Optional[str] = Header(None),
+) -> Response | GetStandardTimerOut:
+    # validate IDs
+    try:
+        valid_user_id = uuid.UUID(user_id)
+        valid_timer_id = int(timer_id)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"message": "Invalid ID"})
+    # no row has an id outside the column's range, the driver would reject it
+    if not 1 <= valid_timer_id <= MAX_INTEGER_ID:
+        return JSONResponse(status_code=404, content={"message": "Timer not found"})
+    # answer revalidations from the version map without loading the timer
+    version_key = etag.standard_timer_key(valid_user_id, valid_timer_id)
+    known_tag = etag.versions.get(version_key)
+    if known_tag and etag.matches(if_none_match, known_tag):
+        # only cached after the owner read the timer
+        usage.recorder.record_user(str(valid_user_id))
+        return etag.not_modified(known_tag)
+    timer = await repository.get_standard_timer(valid_timer_id, user_id)
+    if not timer:
+        return JSONResponse(status_code=404, content={"message": "Timer not found"})
+    usage.recorder.record_user(str(valid_user_id))
+    tag = etag.make_etag(timer.updated_at)
+    etag.versions.set(version_key, tag)
+    if etag.matches(if_none_match, tag):
+        return etag.not_modified(tag)
+    etag.set_headers(response, tag)
+    return services.build_timer_state(timer)
+
+
+async def get_owned_timer(
+    timer_id: str, user_id: str, db: AsyncSession
+) -> tuple[StandardTimer, UserRow] | JSONResponse:
+    """
+    Loads a timer for a state transition along with its owner
+    :param timer_id: Timer's ID from the path
+    :param user_id: X-User-ID header
+    :param db: Database session
+    :return: tuple of (timer, user), or an error response
+    """
+    # validate IDs
+    try:
+        uuid.UUID(user_id)
+        valid_timer_id = int(timer_id)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"message": "Invalid ID"})
+    # no row has an id outside the column's range, the driver would reject it
+    if not 1 <= valid_timer_id <= MAX_INTEGER_ID:
+        return JSONResponse(status_code=404, content={"message": "Timer not found"})
+    # validate matching user
+    user: UserRow | None = await fetch_user(user_id, db)
+    if not user:
+        return JSONResponse(status_code=400, content={"message": "User not found"})
+    usage.recorder.record_user(str(user.user_id))
+    timer = await queries.get_timer_by_id(valid_timer_id, user_id, db)
+    if not timer:
+        return JSONResponse(status_code=404, content={"message": "Timer not found"})
+    return timer, user
+
+
+async def commit_transition(
+    timer: StandardTimer, db: AsyncSession
+) -> JSONResponse | None:
+    """
+    Commits a state transition. The update only applies if the timer still has
+    the version it was loaded with, so of two racing transitions one wins and
+    the other gets the state it lost to, without holding a row lock
+    :param timer: Timer changed by the transition
+    :param db: Database session
+    :return: None once committed, or a 409 response carrying the current state
+    """
+    timer_id, user_id = timer.id, str(timer.user_id)
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        # a fresh ORM load, a coalesced read could predate the winning change
+        current = await queries.get_timer_by_id(timer_id, user_id, db)
+        if not current:
+            return JSONResponse(status_code=404, content={"message": "Timer not found"})
+        return JSONResponse(
+            status_code=409,
+            content={
+                "message": "Timer was changed by another request",
+                "timer": services.build_timer_state(current).model_dump(),
+            },
+        )
+    return None
+
+
+@router.post(
+    "/start/{timer_id}",
+    response_model=StartStandardTimerOut,
+    dependencies=[Depends(rate_limit("standard_transitions"))],
+)
 async def start_timer(
     timer_id: str,
     db: AsyncSession = Depends(get_db),
     user_id: str = Depends(services.get_user_header_id),
-):
-    # TODO: Implement this
-    pass
+) -> JSONResponse | StartStandardTimerOut:
+    result = await get_owned_timer(timer_id, user_id, db)
+    if isinstance(result, JSONResponse):
+        return result
+    timer, user = result
+    now = clock.now()
+    try:
+        services.mark_started(timer, now)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": f"{e.args[0]}"})
+    conflict = await commit_transition(timer, db)
+    if conflict:
+        return conflict
+    services.schedule_completion(timer)
+    usage.recorder.record_event("started")
+    zone = timezone_registry.zone(user.timezone_id)
+    deadline = services.get_deadline(timer)
+    assert timer.start_time is not None and deadline is not None
+    return StartStandardTimerOut(
+        timer_id=str(timer.id),
+        minutes=timer.minutes,
+        hours=timer.hours,
+        elapsed_seconds=timer.elapsed_seconds,
+        total_paused_seconds=timer.total_paused_seconds,
+        is_paused=timer.is_paused,
+        total_pause_count=timer.total_pause_count,
+        start_time=timer.start_time.isoformat(),
+        last_pause_time=services.to_iso(timer.last_pause_time),
+        start_time_string=services.format_display_time(timer.start_time, zone),
+        end_time_string=services.format_display_time(deadline, zone),
+        server_time=now.isoformat(),
+    )
 
 
-@router.post("/pause/{timer_id}", response_model=PauseStandardTimerOut)
+@router.post(
+    "/pause/{timer_id}",
+    response_model=PauseStandardTimerOut,
+    dependencies=[Depends(rate_limit("standard_transitions"))],
+)
 async def pause_timer(
     timer_id: str,
     db: AsyncSession = Depends(get_db),
     user_id: str = Depends(services.get_user_header_id),
-):
-    # TODO: Implement this
-    pass
+) -> JSONResponse | PauseStandardTimerOut:
+    result = await get_owned_timer(timer_id, user_id, db)
+    if isinstance(result, JSONResponse):
+        return result
+    timer, _ = result
+    now = clock.now()
+    try:
+        services.mark_paused(timer, now)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": f"{e.args[0]}"})
+    conflict = await commit_transition(timer, db)
+    if conflict:
+        return conflict
+    services.schedule_completion(timer)
+    usage.recorder.record_event("paused")
+    return PauseStandardTimerOut(
+        timer_id=str(timer.id),
+        last_pause_time=services.to_iso(timer.last_pause_time),
+        total_pause_count=timer.total_pause_count,
+        is_paused=timer.is_paused,
+        server_time=now.isoformat(),
+    )
 
 
-@router.post("/resume/{timer_id}", response_model=ResumeStandardTimerOut)
+@router.post(
+    "/resume/{timer_id}",
+    response_model=ResumeStandardTimerOut,
+    dependencies=[Depends(rate_limit("standard_transitions"))],
+)
 async def resume_timer(
     timer_id: str,
     db: AsyncSession = Depends(get_db),
     user_id: str = Depends(services.get_user_header_id),
-):
-    # TODO: Implement this
-    pass
+) -> JSONResponse | ResumeStandardTimerOut:
+    result = await get_owned_timer(timer_id, user_id, db)
+    if isinstance(result, JSONResponse):
+        return result
+    timer, _ = result
+    now = clock.now()
+    try:
+        services.mark_resumed(timer, now)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": f"{e.args[0]}"})
+    conflict = await commit_transition(timer, db)
+    if conflict:
+        return conflict
+    services.schedule_completion(timer)
+    usage.recorder.record_event("resumed")
+    return ResumeStandardTimerOut(
+        timer_id=str(timer.id),
+        total_paused_seconds=timer.total_paused_seconds,
+        server_time=now.isoformat(),
+    )
 
 
-@router.post("/end/{timer_id}", response_model=EndStandardTimerOut)
+@router.post(
+    "/end/{timer_id}",
+    response_model=EndStandardTimerOut,
+    dependencies=[Depends(rate_limit("standard_transitions"))],
+)
 async def end_timer(
     timer_id: str,
     db: AsyncSession = Depends(get_db),
     user_id: str = Depends(services.get_user_header_id),
-):
-    # TODO: Implement this
-    pass
+) -> JSONResponse | EndStandardTimerOut:
+    result = await get_owned_timer(timer_id, user_id, db)
+    if isinstance(result, JSONResponse):
+        return result
+    timer, user = result
+    now = clock.now()
+    try:
+        services.mark_ended(timer, now)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": f"{e.args[0]}"})
+    # deliveries are queued with the change and sent in the background
+    queued = await services.queue_completed_event(timer, "user", db)
+    conflict = await commit_transition(timer, db)
+    if conflict:
+        return conflict
+    services.schedule_completion(timer)
+    usage.recorder.record_event("ended")
+    if queued:
+        webhook_dispatcher.wake()
+    assert timer.end_time is not None
+    return EndStandardTimerOut(
+        timer_id=str(timer.id),
+        end_time_string=services.format_display_time(
+            timer.end_time, timezone_registry.zone(user.timezone_id)
+        ),
+        total_pause_count=timer.total_pause_count,
+        server_time=now.isoformat(),
+    )
@@ -70,6 +70,11 @@ class StartStandardTimerOut(BaseModel):
     end_time_string: str = Field(
         title="End time display", description="Formatted end time for display"
     )
+    # server clock
+    server_time: str = Field(
+        title="Server time ISO",
+        description="Server time the response was computed at, in ISO 8601 format",
+    )
 
 
 class PauseStandardTimerOut(BaseModel):
@@ -86,6 +91,11 @@ class PauseStandardTimerOut(BaseModel):
     is_paused: bool = Field(
         title="Is paused", description="Whether the timer is currently paused"
     )
+    # server clock
+    server_time: str = Field(
+        title="Server time ISO",
+        description="Server time the response was computed at, in ISO 8601 format",
+    )
 
 
 class ResumeStandardTimerOut(BaseModel):
@@ -97,6 +107,11 @@ class ResumeStandardTimerOut(BaseModel):
         description="Total paused seconds for the timer",
         ge=0,
     )
+    # server clock
+    server_time: str = Field(
+        title="Server time ISO",
+        description="Server time the response was computed at, in ISO 8601 format",
+    )
 
 
 class EndStandardTimerOut(BaseModel):
@@ -109,3 +124,80 @@ class EndStandardTimerOut(BaseModel):
     total_pause_count: int = Field(
         title="Pause count", description="Pause count for the timer", ge=0
     )
+    # server clock
+    server_time: str = Field(
+        title="Server time ISO",
+        description="Server time the response was computed at, in ISO 8601 format",
+    )
+
+
+class GetStandardTimerOut(BaseModel):
+    # timer identification
+    timer_id: str = Field(title="Timer ID", description="ID for the timer")
+    # timer duration
+    minutes: int = Field(
+        title="Minutes", description="Minute duration for the timer", ge=0, le=59
+    )
+    hours: int = Field(
+        title="Hours", description="Hour duration for the timer", ge=0, le=24
+    )
+    # timer state
+    elapsed_seconds: int = Field(
+        title="Elapsed seconds", description="Elapsed seconds for the timer", ge=0
+    )
+    total_paused_seconds: int = Field(
+        title="Total paused seconds",
+        description="Total paused seconds for the timer",
+        ge=0,
+    )
+    total_pause_count: int = Field(
+        title="Pause count", description="Pause count for the timer", ge=0
+    )
+    is_started: bool = Field(
+        title="Is started", description="Whether the timer has been started"
+    )
+    is_paused: bool = Field(
+        title="Is paused", description="Whether the timer is currently paused"
+    )
+    is_completed: bool = Field(
+        title="Is completed", description="Whether the timer has ended"
+    )
+    # timer timestamps
+    start_time: str | None = Field(
+        title="Start time ISO",
+        description="Start time in ISO 8601 format, null if not started",
+    )
+    last_pause_time: str | None = Field(
+        title="Last pause time ISO",
+        description="Last pause time in ISO 8601 format, null if not paused",
+    )
+    end_time: str | None = Field(
+        title="End time ISO",
+        description="End time in ISO 8601 format, null if not ended",
+    )
+    # concurrency
+    version: int = Field(
+        title="Version",
+        description="Incremented by every change to the timer",
+        ge=1,
+    )
+    # server clock
+    server_time: str = Field(
+        title="Server time ISO",
+        description="Server time the response was computed at, in ISO 8601 format",
+    )
+
+
+class ImportRowError(BaseModel):
+    line: int = Field(title="Line", description="Line number in the upload")
+    message: str = Field(title="Message", description="Why the row was rejected")
+
+
+class ImportStandardTimersOut(BaseModel):
+    accepted: int = Field(
+        title="Accepted", description="Number of imported timers", ge=0
+    )
+    rejected: int = Field(title="Rejected", description="Number of rejected rows", ge=0)
+    errors: list[ImportRowError] = Field(
+        title="Errors", description="First rejected rows and their reasons"
+    )
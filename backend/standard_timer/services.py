@@ -2,10 +2,45 @@
 Services and utility functions for the `standard-timer` operations
 """
 
-from typing import Optional
+import codecs
+import csv
+import io
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import AsyncIterator, Hashable, Optional, Sequence
 
 # TODO: Implement this file to run services for `standard-timer` operations
 from fastapi import Header, HTTPException
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import backend.clock as clock
+import backend.etag as etag
+import backend.pause_intervals as pause_intervals
+import backend.usage as usage
+from backend.db import general_db, get_shard_map
+from backend.models import (
+    StandardTimer,
+    validate_duration_field,
+    validate_total_duration,
+)
+from backend.scheduler import TimerScheduler
+from backend.standard_timer import queries
+from backend.standard_timer.queries import StandardTimerRow
+from backend.standard_timer.schemas import GetStandardTimerOut
+from backend.webhooks import queries as webhook_queries
+from backend.webhooks import services as webhook_services
+
+logger = logging.getLogger("standard")
+
+DISPLAY_TIME_FORMAT: str = "%H:%M:%S"
+MAX_IMPORT_BYTES: int = 64 * 1024 * 1024  # per upload
+MAX_IMPORT_LINE_LENGTH: int = 64 * 1024  # characters per line or CSV record
+
+# completion deadlines of running timers handled by this worker, keyed by timer ID
+scheduler = TimerScheduler()
 
 
 async def get_user_header_id(x_user_id: Optional[str] = Header(None)) -> str:
@@ -17,3 +52,505 @@ async def get_user_header_id(x_user_id: Optional[str] = Header(None)) -> str:
     if x_user_id is None:
         raise HTTPException(status_code=400, detail="X-User-ID header required")
     return x_user_id
+
+
+def to_iso(value: datetime | None) -> str | None:
+    """
+    Formats an optional timestamp in ISO 8601
+    :param value: timestamp
+    :return: ISO 8601 string, or None if value is None
+    """
+    return value.isoformat() if value else None
+
+
+def build_timer_state(
+    timer: StandardTimer | StandardTimerRow,
+) -> GetStandardTimerOut:
+    """
+    Builds the full state response for a standard timer
+    :param timer: standard timer
+    :return: GetStandardTimerOut
+    """
+    return GetStandardTimerOut(
+        timer_id=str(timer.id),
+        minutes=timer.minutes,
+        hours=timer.hours,
+        elapsed_seconds=timer.elapsed_seconds,
+        total_paused_seconds=timer.total_paused_seconds,
+        total_pause_count=timer.total_pause_count,
+        is_started=timer.is_started,
+        is_paused=timer.is_paused,
+        is_completed=timer.is_completed,
+        start_time=to_iso(timer.start_time),
+        last_pause_time=to_iso(timer.last_pause_time),
+        end_time=to_iso(timer.end_time),
+        version=timer.version,
+        server_time=clock.now().isoformat(),
+    )
+
+
+def format_display_time(value: datetime, zone: tzinfo) -> str:
+    """
+    Formats a timestamp for display in the user's timezone
+    :param value: timestamp
+    :param zone: user's timezone
+    :return: HH:MM:SS string
+    """
+    return value.astimezone(zone).strftime(DISPLAY_TIME_FORMAT)
+
+
+def get_duration_seconds(timer: StandardTimer) -> int:
+    return timer.hours * 3600 + timer.minutes * 60
+
+
+def get_deadline(timer: StandardTimer) -> datetime | None:
+    """
+    Gets the time a running timer finishes, pauses included
+    :param timer: standard timer
+    :return: datetime, or None if the timer is not running
+    """
+    if (
+        not timer.is_started
+        or timer.is_paused
+        or timer.is_completed
+        or timer.start_time is None
+    ):
+        return None
+    return timer.start_time + timedelta(
+        seconds=get_duration_seconds(timer) + timer.total_paused_seconds
+    )
+
+
+def get_elapsed_seconds(timer: StandardTimer, now: datetime) -> int:
+    """
+    Gets the seconds a started timer has been running, pauses excluded
+    :param timer: started standard timer
+    :param now: current time
+    :return: elapsed seconds, capped at the timer's duration
+    """
+    assert timer.start_time is not None
+    until = timer.last_pause_time if timer.is_paused and timer.last_pause_time else now
+    running = int((until - timer.start_time).total_seconds())
+    return min(
+        get_duration_seconds(timer), max(0, running - timer.total_paused_seconds)
+    )
+
+
+def mark_started(timer: StandardTimer, now: datetime) -> None:
+    """
+    Starts a timer
+    :param timer: standard timer
+    :param now: current time
+    :raises ValueError: if the timer was already started
+    """
+    if timer.is_completed:
+        raise ValueError("Timer has already ended")
+    if timer.is_started:
+        raise ValueError("Timer has already started")
+    timer.start_time = now
+    timer.is_started = True
+
+
+def mark_paused(timer: StandardTimer, now: datetime) -> None:
+    """
+    Pauses a running timer
+    :param timer: standard timer
+    :param now: current time
+    :raises ValueError: if the timer is not running
+    """
+    if not timer.is_started:
+        raise ValueError("Timer has not started")
+    if timer.is_completed:
+        raise ValueError("Timer has already ended")
+    if timer.is_paused:
+        raise ValueError("Timer is already paused")
+    deadline = get_deadline(timer)
+    if deadline is not None and deadline <= now:
+        raise ValueError("Timer has already finished")
+    timer.elapsed_seconds = get_elapsed_seconds(timer, now)
+    timer.last_pause_time = now
+    timer.is_paused = True
+    timer.total_pause_count += 1
+
+
+def mark_resumed(timer: StandardTimer, now: datetime) -> None:
+    """
+    Resumes a paused timer, adding the pause to its paused seconds
+    :param timer: standard timer
+    :param now: current time
+    :raises ValueError: if the timer is not paused
+    """
+    if timer.is_completed:
+        raise ValueError("Timer has already ended")
+    if not timer.is_paused or timer.last_pause_time is None:
+        raise ValueError("Timer is not paused")
+    paused = int((now - timer.last_pause_time).total_seconds())
+    timer.total_paused_seconds += max(0, paused)
+    assert timer.start_time is not None  # paused timers were started
+    timer.pause_intervals = pause_intervals.append_interval(
+        timer.pause_intervals, timer.start_time, timer.last_pause_time, now
+    )
+    timer.last_pause_time = None
+    timer.is_paused = False
+
+
+def mark_ended(timer: StandardTimer, now: datetime) -> None:
+    """
+    Ends a started timer. A timer that ran past its deadline ends at the deadline
+    :param timer: standard timer
+    :param now: current time
+    :raises ValueError: if the timer is not started or already ended
+    """
+    if not timer.is_started:
+        raise ValueError("Timer has not started")
+    if timer.is_completed:
+        raise ValueError("Timer has already ended")
+    if timer.is_paused:
+        mark_resumed(timer, now)
+    deadline = get_deadline(timer)
+    end_time = min(now, deadline) if deadline is not None else now
+    timer.elapsed_seconds = get_elapsed_seconds(timer, end_time)
+    timer.end_time = end_time
+    timer.is_completed = True
+
+
+def build_completed_event(timer: StandardTimer | Row, completed_by: str) -> dict:
+    """
+    Builds the webhook payload sent when a timer ends
+    :param timer: completed timer, or a row with the same attributes
+    :param completed_by: "user" when ended by request, "deadline" when it ran out
+    :return: dict: event data
+    """
+    return {
+        "timer_type": "standard",
+        "timer_id": str(timer.id),
+        "user_id": str(timer.user_id),
+        "minutes": timer.minutes,
+        "hours": timer.hours,
+        "start_time": to_iso(timer.start_time),
+        "end_time": to_iso(timer.end_time),
+        "elapsed_seconds": timer.elapsed_seconds,
+        "total_paused_seconds": timer.total_paused_seconds,
+        "total_pause_count": timer.total_pause_count,
+        "completed_by": completed_by,
+    }
+
+
+async def queue_completed_event(
+    timer: StandardTimer | Row, completed_by: str, db: AsyncSession
+) -> int:
+    """
+    Queues the owner's webhooks for a completed timer. The caller commits, then
+    calls `webhook_services.dispatcher.wake()` if anything was queued
+    :param timer: completed timer, or a row with the same attributes
+    :param completed_by: "user" or "deadline"
+    :param db: Database session
+    :return: number of queued deliveries
+    """
+    return await webhook_queries.enqueue_event(
+        str(timer.user_id),
+        webhook_services.EVENT_TIMER_COMPLETED,
+        build_completed_event(timer, completed_by),
+        db,
+    )
+
+
+def schedule_completion(timer: StandardTimer) -> None:
+    """
+    Schedules or cancels a timer's completion event to match its state
+    :param timer: standard timer after a transition
+    """
+    deadline = get_deadline(timer)
+    if deadline is None:
+        scheduler.cancel(timer.id)
+    else:
+        scheduler.schedule(timer.id, deadline)
+
+
+async def complete_timer(timer_id: Hashable) -> None:
+    """
+    Scheduler handler ending a timer whose deadline passed
+    :param timer_id: Timer's ID
+    """
+    row = None
+    queued = 0
+    # ids are unique across shards, only the one holding the timer updates it
+    for shard in get_shard_map().names:
+        async with general_db(shard) as db:
+            row = await queries.complete_expired_timer(int(timer_id), db)  # type: ignore[call-overload]
+            queued = await queue_completed_event(row, "deadline", db) if row else 0
+            await db.commit()
+        if row is not None:
+            break
+    if row is not None:
+        etag.versions.invalidate(etag.standard_timer_key(row.user_id, timer_id))
+        logger.info("Standard timer %s completed", timer_id)
+        usage.recorder.record_event("completed")
+    if queued:
+        webhook_services.dispatcher.wake()
+
+
+async def load_running_timers(db: AsyncSession) -> int:
+    """
+    Schedules every running timer, so deadlines survive a restart. Timers that
+    finished while no worker was running fire on the next tick
+    :param db: Database session
+    :return: number of scheduled timers
+    """
+    count = 0
+    async for rows in queries.stream_running_deadlines(db):
+        for timer_id, deadline in rows:
+            scheduler.schedule(timer_id, deadline)
+        count += len(rows)
+    return count
+
+
+async def start_scheduler() -> None:
+    """
+    Starts completing timers in the background, loading running timers first
+    """
+
+    async def load() -> None:
+        count = 0
+        for shard in get_shard_map().names:
+            async with general_db(shard) as db:
+                count += await load_running_timers(db)
+        logger.info("Scheduled %s running standard timers", count)
+
+    if complete_timer not in scheduler.handlers:
+        scheduler.subscribe(complete_timer)
+    scheduler.start(load)
+
+
+EXPORT_FIELDS: tuple[str, ...] = (
+    "timer_id",
+    "minutes",
+    "hours",
+    "start_time",
+    "end_time",
+    "elapsed_seconds",
+    "total_paused_seconds",
+    "total_pause_count",
+    "last_pause_time",
+    "is_started",
+    "is_paused",
+    "is_completed",
+    "created_at",
+    "updated_at",
+)
+
+
+def format_export_row(row: Row, zone: tzinfo) -> list:
+    """
+    Converts an exported row's timestamps to the user's timezone
+    :param row: row selected with `queries.EXPORT_COLUMNS`
+    :param zone: user's timezone
+    :return: list of values in `EXPORT_FIELDS` order
+    """
+    return [
+        value.astimezone(zone).isoformat() if isinstance(value, datetime) else value
+        for value in row
+    ]
+
+
+async def export_csv(
+    batches: AsyncIterator[Sequence[Row]], zone: tzinfo
+) -> AsyncIterator[str]:
+    """
+    Streams exported rows as CSV, one chunk per fetched batch
+    :param batches: row batches from `queries.stream_timers_by_user`
+    :param zone: user's timezone
+    :return: async iterator of CSV text chunks
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    async for rows in batches:
+        writer.writerows(format_export_row(row, zone) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+async def export_ndjson(
+    batches: AsyncIterator[Sequence[Row]], zone: tzinfo
+) -> AsyncIterator[str]:
+    """
+    Streams exported rows as newline delimited JSON, one chunk per fetched batch
+    :param batches: row batches from `queries.stream_timers_by_user`
+    :param zone: user's timezone
+    :return: async iterator of NDJSON text chunks
+    """
+    async for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_FIELDS, format_export_row(row, zone)))) + "\n"
+            for row in rows
+        )
+
+
+class ImportTooLarge(ValueError):
+    """
+    Raised when an upload or one of its lines exceeds its limit
+    """
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes],
+    max_bytes: int = MAX_IMPORT_BYTES,
+    max_line_length: int = MAX_IMPORT_LINE_LENGTH,
+) -> AsyncIterator[str]:
+    """
+    Splits a streamed UTF-8 body into lines without buffering the whole body
+    :param chunks: raw body chunks, e.g. `Request.stream()`
+    :param max_bytes: Largest body read
+    :param max_line_length: Longest line read
+    :return: async iterator of lines, with their line endings
+    :raises ImportTooLarge: once either limit is exceeded
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > max_bytes:
+            raise ImportTooLarge(f"Upload exceeds {max_bytes} bytes")
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+        if len(pending) > max_line_length:
+            raise ImportTooLarge(f"A line exceeds {max_line_length} characters")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def _parse_int(fields: dict, key: str, default: int | None = None) -> int:
+    value = fields.get(key)
+    if value is None or value == "":
+        if default is None:
+            raise ValueError(f"{key} is required")
+        return default
+    if isinstance(value, bool):
+        raise ValueError(f"{key} must be an integer")
+    try:
+        parsed = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be an integer") from None
+    if parsed < 0:
+        raise ValueError(f"{key} must not be negative")
+    return parsed
+
+
+def _parse_time(fields: dict, key: str, zone: tzinfo) -> datetime | None:
+    value = fields.get(key)
+    if value is None or value == "":
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f"{key} must be an ISO 8601 timestamp") from None
+    # timestamps without an offset are in the user's timezone
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=zone)
+
+
+def parse_import_row(fields: dict, user_id: uuid.UUID, zone: tzinfo) -> tuple:
+    """
+    Validates an imported timer with the same rules as
+    `StandardTimer.validate_duration` and converts it into a COPY record
+    :param fields: imported values keyed by column name
+    :param user_id: owner's UUID
+    :param zone: owner's timezone
+    :return: tuple of values in `queries.IMPORT_COLUMNS` order
+    :raises ValueError: if the row is invalid
+    """
+    minutes = _parse_int(fields, "minutes")
+    hours = _parse_int(fields, "hours")
+    validate_duration_field("minutes", minutes)
+    validate_duration_field("hours", hours)
+    validate_total_duration(minutes, hours)
+    start_time = _parse_time(fields, "start_time", zone)
+    end_time = _parse_time(fields, "end_time", zone)
+    if start_time and end_time and end_time < start_time:
+        raise ValueError("end_time must not be before start_time")
+    if end_time and not start_time:
+        raise ValueError("end_time requires a start_time")
+    # a running timer would be completed by the scheduler, sending webhooks
+    # for history
+    if start_time and not end_time:
+        raise ValueError("start_time requires an end_time")
+    created_at = start_time or datetime.now(timezone.utc)
+    return (
+        user_id,
+        minutes,
+        hours,
+        start_time,
+        end_time,
+        _parse_int(fields, "elapsed_seconds", 0),
+        _parse_int(fields, "total_paused_seconds", 0),
+        _parse_int(fields, "total_pause_count", 0),
+        None,  # imported timers are never paused
+        start_time is not None,
+        False,
+        end_time is not None,
+        created_at,
+        end_time or created_at,
+    )
+
+
+async def iter_import_rows(
+    lines: AsyncIterator[str], import_format: str
+) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """
+    Parses imported lines into dictionaries keyed by column name. CSV
+    records may span lines inside quoted fields
+    :param lines: lines from `iter_lines`
+    :param import_format: "csv" (with a header line) or "ndjson"
+    :return: async iterator of (line number, fields or None, error or None),
+    numbered by the line a record starts on
+    :raises ImportTooLarge: for a CSV record longer than `MAX_IMPORT_LINE_LENGTH`
+    """
+    header: list[str] | None = None
+    line_number = 0
+    record: list[str] = []
+    record_start = 0
+    quotes = 0
+    async for line in lines:
+        line_number += 1
+        if not record and not line.strip():
+            continue
+        if import_format == "csv":
+            if not record:
+                record_start = line_number
+            record.append(line)
+            # quotes inside quoted fields are doubled, an odd count means the
+            # record goes on past this newline
+            quotes += line.count('"')
+            if quotes % 2:
+                if sum(len(part) for part in record) > MAX_IMPORT_LINE_LENGTH:
+                    raise ImportTooLarge(
+                        f"A record exceeds {MAX_IMPORT_LINE_LENGTH} characters"
+                    )
+                continue
+            values = next(csv.reader(record))
+            record, quotes = [], 0
+            if header is None:
+                header = [value.strip() for value in values]
+                continue
+            if len(values) != len(header):
+                yield record_start, None, "Wrong number of columns"
+                continue
+            yield record_start, dict(zip(header, values)), None
+        else:
+            try:
+                fields = json.loads(line)
+            except json.JSONDecodeError:
+                yield line_number, None, "Invalid JSON"
+                continue
+            if not isinstance(fields, dict):
+                yield line_number, None, "Each line must be a JSON object"
+                continue
+            yield line_number, fields, None
+    if record:
+        yield record_start, None, "Unterminated quoted field"
@@ -0,0 +1,152 @@
+"""
+Timezone dictionary.
+
+Users reference the `timezones` table by a small integer instead of storing
+the IANA name, which keeps rows and indexes small and lets rollups group on
+an integer. The table is loaded once into `registry`, so translating between
+ids, names and `ZoneInfo` objects never touches the database. Zones added to
+the IANA database after the table was seeded are inserted on first use.
+Another worker's registry learns about such a zone when it loads a user in
+it, see `TimezoneRegistry.ensure_loaded`.
+"""
+
+from typing import Iterable
+from zoneinfo import ZoneInfo, available_timezones
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from backend.db import general_db, get_shard_map
+
+MAX_INSERT_ATTEMPTS: int = 3
+
+
+def iana_rows() -> list[tuple[int, str]]:
+    """
+    Numbers the installed IANA zones alphabetically, the ids a freshly
+    migrated database starts with
+    :return: list of (id, name)
+    """
+    return list(enumerate(sorted(available_timezones()), start=1))
+
+
+class TimezoneRegistry:
+    """
+    In-memory id <-> name <-> ZoneInfo mapping of the `timezones` table
+    """
+
+    def __init__(self) -> None:
+        self.names: dict[int, str] = {}
+        self.ids: dict[str, int] = {}
+        self.zones: dict[int, ZoneInfo] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.names)
+
+    def load_rows(self, rows: Iterable[tuple[int, str]]) -> None:
+        for timezone_id, name in rows:
+            self.names[timezone_id] = name
+            self.ids[name] = timezone_id
+
+    async def load(self, db: AsyncSession) -> None:
+        """
+        Loads every row of the `timezones` table
+        :param db: Database session
+        """
+        result = await db.execute(text("SELECT id, name FROM timezones"))
+        self.load_rows(result.tuples())
+
+    async def ensure_loaded(
+        self, timezone_id: int, db: AsyncSession | AsyncConnection
+    ) -> None:
+        """
+        Reads a zone missing from the registry, inserted by another worker
+        after this one loaded the table. Called wherever users are loaded, so
+        `name` and `zone` can look their zone up
+        :param timezone_id: id from the `timezones` table
+        :param db: Database session or connection
+        """
+        if timezone_id in self.names:
+            return
+        name = await db.scalar(
+            text("SELECT name FROM timezones WHERE id = :id"), {"id": timezone_id}
+        )
+        if name is not None:
+            self.load_rows([(timezone_id, name)])
+
+    def get_id(self, name: str) -> int | None:
+        return self.ids.get(name)
+
+    def name(self, timezone_id: int) -> str:
+        return self.names[timezone_id]
+
+    def zone(self, timezone_id: int) -> ZoneInfo:
+        """
+        Gets the ZoneInfo for a timezone id, created on first use
+        :param timezone_id: id from the `timezones` table
+        :return: ZoneInfo
+        """
+        zone = self.zones.get(timezone_id)
+        if zone is None:
+            zone = self.zones[timezone_id] = ZoneInfo(self.names[timezone_id])
+        return zone
+
+    async def add(self, name: str, db: AsyncSession) -> int:
+        """
+        Adds a zone missing from the table, e.g. after a tzdata update.
+        Commits, so the id outlives the caller's transaction. The caller
+        validates the name. With several shards the primary numbers the zone
+        and the other shards copy its row, so an id means the same zone on
+        every shard
+        :param name: IANA name
+        :param db: Database session
+        :return: int: the zone's id
+        """
+        shard_map = get_shard_map()
+        if len(shard_map.names) == 1:
+            return await self._insert(name, db)
+        async with general_db() as primary:
+            timezone_id = await self._insert(name, primary)
+        for shard in shard_map.names[1:]:
+            async with general_db(shard) as other:
+                await other.execute(
+                    text(
+                        "INSERT INTO timezones (id, name) VALUES (:id, :name) "
+                        "ON CONFLICT DO NOTHING"
+                    ),
+                    {"id": timezone_id, "name": name},
+                )
+                await other.commit()
+        return timezone_id
+
+    async def _insert(self, name: str, db: AsyncSession) -> int:
+        for _ in range(MAX_INSERT_ATTEMPTS):
+            # another worker may take the same id or name, then read theirs
+            await db.execute(
+                text(
+                    "INSERT INTO timezones (id, name) "
+                    "SELECT COALESCE(MAX(id), 0) + 1, :name FROM timezones "
+                    "ON CONFLICT DO NOTHING"
+                ),
+                {"name": name},
+            )
+            timezone_id = await db.scalar(
+                text("SELECT id FROM timezones WHERE name = :name"), {"name": name}
+            )
+            await db.commit()
+            if timezone_id is not None:
+                self.load_rows([(timezone_id, name)])
+                return timezone_id
+        raise RuntimeError(f"Could not add timezone {name}")
+
+
+async def load_registry() -> None:
+    """
+    Loads the registry, called from the application lifespan
+    """
+    async with general_db() as db:
+        await registry.load(db)
+
+
+registry = TimezoneRegistry()
@@ -0,0 +1,345 @@
+"""
+Approximate live usage figures: daily active users and timer transitions
+per minute.
+
+Each worker counts on the request path in O(1) and keeps its own shard: a
+HyperLogLog of the `X-User-ID`s seen per UTC day and a ring of per-minute
+event counters. A background task writes the shard to Postgres every
+`FLUSH_INTERVAL_SECONDS`, one row per worker, replacing its previous values
+so a failed flush loses nothing. Readers merge the workers' rows: counters
+are summed and HyperLogLogs are combined register by register, which is the
+same as having counted every request in one place.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+import uuid
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Iterable
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db import general_db
+from backend.models import UsageDailyUsers, UsageMinuteCount
+
+logger = logging.getLogger(__name__)
+
+HLL_PRECISION: int = 14  # 16 KiB of registers, about 0.8% standard error
+COUNTER_MINUTES: int = 60  # minutes kept in memory, older minutes are flushed
+FLUSH_INTERVAL_SECONDS: float = 10.0
+COUNTER_RETENTION = timedelta(days=7)
+DAILY_USERS_RETENTION = timedelta(days=35)
+TRANSITION_EVENTS: tuple[str, ...] = (
+    "started",
+    "paused",
+    "resumed",
+    "ended",
+    "completed",
+)
+
+
+class HyperLogLog:
+    """
+    Cardinality estimator using 2**precision one-byte registers
+    """
+
+    __slots__ = ("precision", "registers")
+
+    def __init__(
+        self, precision: int = HLL_PRECISION, registers: bytes | None = None
+    ) -> None:
+        self.precision = precision
+        size = 1 << precision
+        if registers is not None and len(registers) != size:
+            raise ValueError(f"Expected {size} registers, got {len(registers)}")
+        self.registers = (
+            bytearray(registers) if registers is not None else bytearray(size)
+        )
+
+    def add(self, value: str) -> bool:
+        """
+        Adds a value
+        :param value: Value to count
+        :return: bool: True if a register changed
+        """
+        hashed = int.from_bytes(
+            hashlib.blake2b(value.encode(), digest_size=8).digest(), "big"
+        )
+        index = hashed >> (64 - self.precision)
+        remaining_bits = 64 - self.precision
+        rest = hashed & ((1 << remaining_bits) - 1)
+        rank = remaining_bits - rest.bit_length() + 1  # position of the first 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """
+        Combines another estimator into this one, as if it had seen its values
+        :param other: Estimator with the same precision
+        """
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLogs of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        """
+        Estimates the number of distinct values added
+        :return: int: Estimated count
+        """
+        size = len(self.registers)
+        histogram = Counter(self.registers)
+        harmonic = sum(count * 2.0**-rank for rank, count in histogram.items())
+        estimate = 0.7213 / (1 + 1.079 / size) * size * size / harmonic
+        zeros = histogram.get(0, 0)
+        if estimate <= 2.5 * size and zeros:
+            # linear counting is more accurate while registers are still empty
+            estimate = size * math.log(size / zeros)
+        return round(estimate)
+
+
+class MinuteCounters:
+    """
+    Ring buffer of per-minute event counts covering the last `minutes` minutes
+    """
+
+    def __init__(self, minutes: int = COUNTER_MINUTES) -> None:
+        self.minutes: list[int] = [-1] * minutes  # minute held by each slot
+        self.counts: list[Counter[str]] = [Counter() for _ in range(minutes)]
+
+    def increment(self, event: str, minute: int) -> None:
+        """
+        Counts one event
+        :param event: Event name
+        :param minute: Minutes since the epoch
+        """
+        slot = minute % len(self.minutes)
+        if self.minutes[slot] != minute:
+            self.minutes[slot] = minute
+            self.counts[slot] = Counter()
+        self.counts[slot][event] += 1
+
+    def get(self, minute: int) -> Counter[str]:
+        slot = minute % len(self.minutes)
+        return self.counts[slot] if self.minutes[slot] == minute else Counter()
+
+
+class UsageRecorder:
+    """
+    This worker's shard of the usage figures, flushed in the background
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.worker_id = uuid.uuid4().hex
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.daily_users: dict[date, HyperLogLog] = {}
+        self.counters = MinuteCounters()
+        self.dirty_days: set[date] = set()
+        self.dirty_minutes: set[int] = set()
+        self._task: asyncio.Task | None = None
+
+    def clear(self) -> None:
+        self.daily_users.clear()
+        self.counters = MinuteCounters()
+        self.dirty_days.clear()
+        self.dirty_minutes.clear()
+
+    def record_user(self, user_id: str) -> None:
+        """
+        Counts a user as active today
+        :param user_id: X-User-ID header
+        """
+        today = datetime.fromtimestamp(self.clock(), timezone.utc).date()
+        estimator = self.daily_users.get(today)
+        if estimator is None:
+            estimator = self.daily_users[today] = HyperLogLog()
+            # yesterday's shard stays until it has been flushed
+            for day in [
+                day for day in self.daily_users if day < today - timedelta(days=1)
+            ]:
+                del self.daily_users[day]
+        if estimator.add(user_id):
+            self.dirty_days.add(today)
+
+    def record_event(self, event: str) -> None:
+        """
+        Counts a timer transition in the current minute
+        :param event: One of `TRANSITION_EVENTS`
+        """
+        minute = int(self.clock() // 60)
+        self.counters.increment(event, minute)
+        self.dirty_minutes.add(minute)
+
+    async def flush(self, db: AsyncSession) -> None:
+        """
+        Writes the changed parts of this worker's shard and commits
+        :param db: Database session
+        """
+        days, minutes = self.dirty_days, self.dirty_minutes
+        self.dirty_days, self.dirty_minutes = set(), set()
+        try:
+            await upsert_daily_users(
+                self.worker_id,
+                [
+                    (day, bytes(self.daily_users[day].registers))
+                    for day in days
+                    if day in self.daily_users
+                ],
+                db,
+            )
+            await upsert_minute_counts(
+                self.worker_id,
+                [
+                    (minute_start(minute), event, count)
+                    for minute in minutes
+                    for event, count in self.counters.get(minute).items()
+                ],
+                db,
+            )
+            now = datetime.fromtimestamp(self.clock(), timezone.utc)
+            await delete_expired(now, db)
+            await db.commit()
+        except Exception:
+            # written again by the next flush
+            self.dirty_days |= days
+            self.dirty_minutes |= minutes
+            raise
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                async with general_db() as db:
+                    await self.flush(db)
+            except Exception:
+                logger.exception("Usage flush failed")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stops flushing after writing out what was counted since the last flush
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            async with general_db() as db:
+                await self.flush(db)
+        except Exception:
+            logger.exception("Final usage flush failed")
+
+
+def minute_start(minute: int) -> datetime:
+    return datetime.fromtimestamp(minute * 60, timezone.utc)
+
+
+async def upsert_daily_users(
+    worker_id: str, rows: Iterable[tuple[date, bytes]], db: AsyncSession
+) -> None:
+    values = [
+        {"day": day, "worker_id": worker_id, "registers": registers}
+        for day, registers in rows
+    ]
+    if not values:
+        return
+    stmt = insert(UsageDailyUsers).values(values)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["day", "worker_id"],
+            set_={"registers": stmt.excluded.registers},
+        )
+    )
+
+
+async def upsert_minute_counts(
+    worker_id: str, rows: Iterable[tuple[datetime, str, int]], db: AsyncSession
+) -> None:
+    values = [
+        {"minute": minute, "event": event, "worker_id": worker_id, "count": count}
+        for minute, event, count in rows
+    ]
+    if not values:
+        return
+    stmt = insert(UsageMinuteCount).values(values)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["minute", "event", "worker_id"],
+            set_={"count": stmt.excluded.count},
+        )
+    )
+
+
+async def delete_expired(now: datetime, db: AsyncSession) -> None:
+    await db.execute(
+        delete(UsageMinuteCount).where(
+            UsageMinuteCount.minute < now - COUNTER_RETENTION
+        )
+    )
+    await db.execute(
+        delete(UsageDailyUsers).where(
+            UsageDailyUsers.day < (now - DAILY_USERS_RETENTION).date()
+        )
+    )
+
+
+async def get_active_users(day: date, db: AsyncSession) -> int:
+    """
+    Estimates the users active on a day across every worker
+    :param day: UTC day
+    :param db: Database session
+    :return: int: Estimated distinct users
+    """
+    merged = HyperLogLog()
+    for registers in await db.scalars(
+        select(UsageDailyUsers.registers).where(UsageDailyUsers.day == day)
+    ):
+        merged.merge(HyperLogLog(registers=registers))
+    return merged.count()
+
+
+async def get_events_per_minute(
+    since: datetime, db: AsyncSession
+) -> dict[datetime, dict[str, int]]:
+    """
+    Sums every worker's transition counts per minute
+    :param since: First minute included
+    :param db: Database session
+    :return: dict of minute to event counts, oldest first
+    """
+    result = await db.execute(
+        select(
+            UsageMinuteCount.minute,
+            UsageMinuteCount.event,
+            func.sum(UsageMinuteCount.count),
+        )
+        .where(UsageMinuteCount.minute >= since)
+        .group_by(UsageMinuteCount.minute, UsageMinuteCount.event)
+        .order_by(UsageMinuteCount.minute)
+    )
+    minutes: dict[datetime, dict[str, int]] = {}
+    for minute, event, count in result:
+        minutes.setdefault(minute, {})[event] = int(count)
+    return minutes
+
+
+recorder = UsageRecorder()
@@ -0,0 +1 @@
+# Package for handling webhook subscriptions and deliveries
@@ -0,0 +1,159 @@
+"""
+Queries for the webhook operations
+"""
+
+from typing import Sequence
+
+from sqlalchemy import Row, delete, func, insert, literal, select, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models import WebhookDelivery, WebhookSubscription
+
+
+async def count_subscriptions(user_id: str, db: AsyncSession) -> int:
+    result = await db.scalar(
+        select(func.count())
+        .select_from(WebhookSubscription)
+        .where(WebhookSubscription.user_id == user_id)
+    )
+    return result or 0
+
+
+async def get_subscriptions_by_user(
+    user_id: str, db: AsyncSession
+) -> list[WebhookSubscription]:
+    """
+    Gets every webhook subscription belonging to the given user, oldest first
+    :param user_id: Owner's UUID
+    :param db: Database session
+    :return: list of WebhookSubscription
+    """
+    result = await db.scalars(
+        select(WebhookSubscription)
+        .where(WebhookSubscription.user_id == user_id)
+        .order_by(WebhookSubscription.id)
+    )
+    return list(result.all())
+
+
+async def get_subscription(
+    webhook_id: int, user_id: str, db: AsyncSession
+) -> WebhookSubscription | None:
+    """
+    Gets a webhook subscription belonging to the given user
+    :param webhook_id: Subscription's ID
+    :param user_id: Owner's UUID
+    :param db: Database session
+    :return: WebhookSubscription or None
+    """
+    result = await db.scalars(
+        select(WebhookSubscription).where(
+            WebhookSubscription.id == webhook_id,
+            WebhookSubscription.user_id == user_id,
+        )
+    )
+    return result.one_or_none()
+
+
+async def enqueue_event(
+    user_id: str, event: str, payload: dict, db: AsyncSession
+) -> int:
+    """
+    Queues one delivery of an event per subscription of the given user, in the
+    caller's transaction so the event is only sent if the change commits
+    :param user_id: Owner's UUID
+    :param event: Event name
+    :param payload: Event data
+    :param db: Database session
+    :return: number of queued deliveries
+    """
+    result = await db.execute(
+        insert(WebhookDelivery).from_select(
+            ["subscription_id", "event", "payload"],
+            select(
+                WebhookSubscription.id, literal(event), literal(payload, JSONB)
+            ).where(WebhookSubscription.user_id == user_id),
+        )
+    )
+    return result.rowcount  # type: ignore[attr-defined]
+
+
+async def claim_due_deliveries(
+    limit: int, lease_seconds: int, db: AsyncSession
+) -> Sequence[Row]:
+    """
+    Claims deliveries whose next attempt is due. Claimed rows count an attempt
+    and are hidden from other workers for `lease_seconds`, so a worker that
+    dies mid-send only delays them. The caller commits
+    :param limit: Maximum deliveries to claim
+    :param lease_seconds: Seconds before an unfinished claim is retried
+    :param db: Database session
+    :return: rows of (id, event, payload, attempts, created_at, url, secret)
+    """
+    due = (
+        select(WebhookDelivery.id)
+        .where(
+            WebhookDelivery.is_failed.is_(False),
+            WebhookDelivery.next_attempt_at <= func.now(),
+        )
+        .order_by(WebhookDelivery.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(WebhookDelivery)
+        .where(
+            WebhookDelivery.id.in_(due),
+            WebhookDelivery.subscription_id == WebhookSubscription.id,
+        )
+        .values(
+            attempts=WebhookDelivery.attempts + 1,
+            next_attempt_at=func.now()
+            + func.make_interval(0, 0, 0, 0, 0, 0, lease_seconds),
+        )
+        .returning(
+            WebhookDelivery.id,
+            WebhookDelivery.event,
+            WebhookDelivery.payload,
+            WebhookDelivery.attempts,
+            WebhookDelivery.created_at,
+            WebhookSubscription.url,
+            WebhookSubscription.secret,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.all()
+
+
+async def delete_deliveries(delivery_ids: list[int], db: AsyncSession) -> None:
+    await db.execute(
+        delete(WebhookDelivery)
+        .where(WebhookDelivery.id.in_(delivery_ids))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def record_failed_attempt(
+    delivery_id: int, error: str, retry_in: float | None, db: AsyncSession
+) -> None:
+    """
+    Records a failed delivery attempt
+    :param delivery_id: Delivery's ID
+    :param error: Why the attempt failed
+    :param retry_in: Seconds until the next attempt, None to give up
+    :param db: Database session
+    """
+    values: dict = {"last_error": error}
+    if retry_in is None:
+        values["is_failed"] = True
+    else:
+        values["next_attempt_at"] = func.now() + func.make_interval(
+            0, 0, 0, 0, 0, 0, retry_in
+        )
+    await db.execute(
+        update(WebhookDelivery)
+        .where(WebhookDelivery.id == delivery_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,105 @@
+"""
+Routing file for webhook subscriptions, all paths will be prefixed with /webhooks
+"""
+
+import uuid
+
+from fastapi import APIRouter, Depends, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import backend.usage as usage
+from backend.db import get_db
+from backend.load_shedding import shed_load
+from backend.models import MAX_INTEGER_ID, WebhookSubscription
+from backend.queries import UserRow, fetch_user
+from backend.rate_limit import rate_limit
+from backend.standard_timer.services import get_user_header_id
+from backend.webhooks import queries, services
+from backend.webhooks.schemas import CreateWebhookIn, CreateWebhookOut, GetWebhookOut
+
+router = APIRouter(
+    prefix="/webhooks",
+    tags=["webhooks"],
+    dependencies=[Depends(shed_load), Depends(rate_limit("webhooks"))],
+)
+
+
+@router.post("", response_model=CreateWebhookOut)
+async def create_webhook(
+    data: CreateWebhookIn,
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(get_user_header_id),
+) -> JSONResponse | CreateWebhookOut:
+    # validate UUID
+    try:
+        valid_id = uuid.UUID(user_id)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"message": "Invalid UUID"})
+    # validate matching user
+    user: UserRow | None = await fetch_user(user_id, db)
+    if not user:
+        return JSONResponse(status_code=400, content={"message": "User not found"})
+    usage.recorder.record_user(str(user.user_id))
+    if await queries.count_subscriptions(user_id, db) >= services.MAX_SUBSCRIPTIONS:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "message": f"A user can have at most {services.MAX_SUBSCRIPTIONS} webhooks"
+            },
+        )
+    try:
+        await services.check_url(str(data.url))
+    except services.UnsafeWebhookURL as e:
+        return JSONResponse(status_code=400, content={"message": f"{e.args[0]}"})
+    subscription = WebhookSubscription(
+        user_id=valid_id, url=str(data.url), secret=services.generate_secret()
+    )
+    db.add(subscription)
+    await db.commit()
+    return CreateWebhookOut(
+        webhook_id=str(subscription.id),
+        url=subscription.url,
+        secret=subscription.secret,
+    )
+
+
+@router.get("", response_model=list[GetWebhookOut])
+async def get_webhooks(
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(get_user_header_id),
+) -> JSONResponse | list[GetWebhookOut]:
+    # validate UUID
+    try:
+        uuid.UUID(user_id)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"message": "Invalid UUID"})
+    subscriptions = await queries.get_subscriptions_by_user(user_id, db)
+    return [
+        GetWebhookOut(webhook_id=str(subscription.id), url=subscription.url)
+        for subscription in subscriptions
+    ]
+
+
+@router.delete("/{webhook_id}", status_code=204)
+async def delete_webhook(
+    webhook_id: str,
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(get_user_header_id),
+) -> Response:
+    # validate IDs
+    try:
+        uuid.UUID(user_id)
+        valid_webhook_id = int(webhook_id)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"message": "Invalid ID"})
+    # no row has an id outside the column's range, the driver would reject it
+    if not 1 <= valid_webhook_id <= MAX_INTEGER_ID:
+        return JSONResponse(status_code=404, content={"message": "Webhook not found"})
+    subscription = await queries.get_subscription(valid_webhook_id, user_id, db)
+    if not subscription:
+        return JSONResponse(status_code=404, content={"message": "Webhook not found"})
+    # pending deliveries are removed with it
+    await db.delete(subscription)
+    await db.commit()
+    return Response(status_code=204)
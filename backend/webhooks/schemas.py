@@ -0,0 +1,27 @@
+"""
+Schemas for webhook processes
+"""
+
+from pydantic import BaseModel, Field, HttpUrl
+
+
+class CreateWebhookIn(BaseModel):
+    url: HttpUrl = Field(
+        title="URL",
+        description="Endpoint receiving a POST request for every event",
+        examples=["https://example.com/hooks/true-timer"],
+    )
+
+
+class CreateWebhookOut(BaseModel):
+    webhook_id: str = Field(title="Webhook ID", description="ID for the webhook")
+    url: str = Field(title="URL", description="Endpoint receiving events")
+    secret: str = Field(
+        title="Secret",
+        description="Key signing every request body, only returned on creation",
+    )
+
+
+class GetWebhookOut(BaseModel):
+    webhook_id: str = Field(title="Webhook ID", description="ID for the webhook")
+    url: str = Field(title="URL", description="Endpoint receiving events")
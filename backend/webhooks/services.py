@@ -0,0 +1,325 @@
+"""
+Services and utility functions for webhook operations
+
+Events are queued as rows of `webhook_deliveries` in the same transaction as
+the change that caused them. A background dispatcher claims due rows, sends
+them through one shared connection-pooled HTTP client with bounded
+concurrency, and reschedules failures with exponential backoff. Requests
+only pay for the insert, never for the receiver.
+
+Receivers must be public https endpoints. The host is resolved when the
+webhook is created and again before every delivery, and any loopback,
+private, link-local, reserved or multicast address is refused. Deliveries
+connect to the address that was checked, so a DNS answer changed in between
+can't point them into the network.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import random
+import secrets
+import socket
+from datetime import datetime
+from typing import Callable, Sequence
+
+import httpx
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db import general_db, get_shard_map
+from backend.webhooks import queries
+
+logger = logging.getLogger(__name__)
+
+EVENT_TIMER_COMPLETED: str = "timer.completed"
+MAX_SUBSCRIPTIONS: int = 10  # per user
+SIGNATURE_HEADER: str = "X-Webhook-Signature"
+
+# delivery settings
+REQUEST_TIMEOUT_SECONDS: float = 5.0
+MAX_CONCURRENCY: int = 50  # requests in flight per worker
+MAX_CONNECTIONS: int = 100  # shared by every receiver
+# kept open between batches, at least MAX_CONCURRENCY to avoid reconnecting
+MAX_KEEPALIVE_CONNECTIONS: int = 50
+BATCH_SIZE: int = 200  # deliveries claimed at a time
+LEASE_SECONDS: int = 60  # must outlast a batch: BATCH_SIZE / MAX_CONCURRENCY timeouts
+POLL_INTERVAL_SECONDS: float = 5.0  # picks up retries and other workers' events
+MAX_ATTEMPTS: int = 8
+BACKOFF_BASE_SECONDS: float = 10.0
+BACKOFF_CAP_SECONDS: float = 3600.0
+
+# receivers inside the deployment, e.g. "10.1.0.0/16", may use any address
+ALLOWED_NETWORKS: list[ipaddress.IPv4Network | ipaddress.IPv6Network] = [
+    ipaddress.ip_network(network.strip())
+    for network in os.getenv("WEBHOOK_ALLOWED_NETWORKS", "").split(",")
+    if network.strip()
+]
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Gets the HTTP client shared by every delivery, creating it on first use
+    """
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            follow_redirects=False,
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class UnsafeWebhookURL(ValueError):
+    """
+    Raised for a webhook URL that isn't a public https endpoint
+    """
+
+
+async def resolve(host: str, port: int) -> list[str]:
+    """
+    Resolves a host name to its addresses
+    :param host: Host name or IP literal
+    :param port: Port
+    :return: list of IP addresses
+    """
+    infos = await asyncio.get_running_loop().getaddrinfo(
+        host, port, type=socket.SOCK_STREAM
+    )
+    return list(dict.fromkeys(info[4][0] for info in infos))
+
+
+def is_public(address: ipaddress.IPv4Address | ipaddress.IPv6Address) -> bool:
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return address.is_global and not (
+        address.is_loopback
+        or address.is_private
+        or address.is_link_local
+        or address.is_reserved
+        or address.is_multicast
+        or address.is_unspecified
+    )
+
+
+async def check_url(url: str) -> tuple[httpx.URL, str]:
+    """
+    Resolves a webhook URL and checks every address it resolves to
+    :param url: Webhook URL
+    :return: tuple of the URL pinned to a checked address, and its host name
+    :raises UnsafeWebhookURL: for plain http or a non-public address, unless
+    the address is in `ALLOWED_NETWORKS`
+    """
+    parsed = httpx.URL(url)
+    if parsed.scheme not in ("http", "https") or not parsed.host:
+        raise UnsafeWebhookURL("Webhook URL must be an https URL")
+    host = parsed.raw_host.decode("ascii")
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        addresses = await resolve(host, port)
+    except (socket.gaierror, UnicodeError):
+        raise UnsafeWebhookURL("Webhook host could not be resolved") from None
+    if not addresses:
+        raise UnsafeWebhookURL("Webhook host could not be resolved")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if any(ip in network for network in ALLOWED_NETWORKS):
+            continue
+        if parsed.scheme != "https":
+            raise UnsafeWebhookURL("Webhook URL must be an https URL")
+        if not is_public(ip):
+            raise UnsafeWebhookURL("Webhook host must resolve to a public address")
+    return parsed.copy_with(host=addresses[0]), host
+
+
+def generate_secret() -> str:
+    return secrets.token_hex(32)
+
+
+def sign(secret: str, body: bytes) -> str:
+    """
+    Signs a request body so receivers can verify it came from this server
+    :param secret: Subscription's secret
+    :param body: Request body
+    :return: str: Signature header value
+    """
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def backoff_seconds(attempts: int, rng: Callable[[], float] = random.random) -> float:
+    """
+    Gets the delay before retrying a delivery, doubling with every attempt.
+    Jitter spreads out retries of deliveries that failed together
+    :param attempts: Attempts made so far
+    :param rng: Random number generator in [0, 1)
+    :return: float: Seconds to wait
+    """
+    delay = min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * (0.5 + rng() / 2)
+
+
+def build_body(delivery: Row) -> bytes:
+    """
+    Builds the JSON body sent for a delivery
+    :param delivery: row from `queries.claim_due_deliveries`
+    :return: bytes: Request body
+    """
+    created_at: datetime = delivery.created_at
+    return json.dumps(
+        {
+            "delivery_id": str(delivery.id),
+            "event": delivery.event,
+            "created_at": created_at.isoformat(),
+            "data": delivery.payload,
+        }
+    ).encode()
+
+
+class WebhookDispatcher:
+    """
+    Sends queued deliveries in the background
+    """
+
+    def __init__(
+        self,
+        concurrency: int = MAX_CONCURRENCY,
+        batch_size: int = BATCH_SIZE,
+        poll_interval: float = POLL_INTERVAL_SECONDS,
+    ) -> None:
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.counters: dict[str, int] = {"delivered": 0, "retried": 0, "failed": 0}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def wake(self) -> None:
+        """
+        Sends newly queued deliveries without waiting for the next poll
+        """
+        self._wakeup.set()
+
+    async def send(self, delivery: Row) -> str | None:
+        """
+        Sends one delivery
+        :param delivery: row from `queries.claim_due_deliveries`
+        :return: None if the receiver accepted it, else the error
+        """
+        body = build_body(delivery)
+        headers = {
+            "Content-Type": "application/json",
+            "X-Webhook-Event": delivery.event,
+            "X-Webhook-Delivery": str(delivery.id),
+            SIGNATURE_HEADER: sign(delivery.secret, body),
+        }
+        async with self.semaphore:
+            try:
+                # checked again, its DNS may have changed since it was created
+                pinned, host = await check_url(delivery.url)
+            except UnsafeWebhookURL as e:
+                return f"{type(e).__name__}: {e}"
+            headers["Host"] = httpx.URL(delivery.url).netloc.decode("ascii")
+            try:
+                response = await get_client().post(
+                    pinned,
+                    content=body,
+                    headers=headers,
+                    # the certificate is verified against the host name
+                    extensions={"sni_hostname": host},
+                )
+            except httpx.HTTPError as e:
+                return f"{type(e).__name__}: {e}"[:500]
+        if response.is_success:
+            return None
+        return f"HTTP {response.status_code}"
+
+    async def send_all(self, deliveries: Sequence[Row]) -> list[str | None]:
+        return await asyncio.gather(*(self.send(delivery) for delivery in deliveries))
+
+    async def run_once(self, db: AsyncSession) -> int:
+        """
+        Claims a batch of due deliveries, sends them and records the outcome
+        :param db: Database session
+        :return: number of claimed deliveries
+        """
+        deliveries = await queries.claim_due_deliveries(
+            self.batch_size, LEASE_SECONDS, db
+        )
+        # release the connection while waiting on receivers
+        await db.commit()
+        if not deliveries:
+            return 0
+        errors = await self.send_all(deliveries)
+        delivered = [
+            delivery.id for delivery, error in zip(deliveries, errors) if error is None
+        ]
+        if delivered:
+            await queries.delete_deliveries(delivered, db)
+        for delivery, error in zip(deliveries, errors):
+            if error is None:
+                continue
+            if delivery.attempts >= MAX_ATTEMPTS:
+                logger.warning("Webhook delivery %s failed: %s", delivery.id, error)
+                await queries.record_failed_attempt(delivery.id, error, None, db)
+                self.counters["failed"] += 1
+            else:
+                retry_in = backoff_seconds(delivery.attempts)
+                await queries.record_failed_attempt(delivery.id, error, retry_in, db)
+                self.counters["retried"] += 1
+        await db.commit()
+        self.counters["delivered"] += len(delivered)
+        return len(deliveries)
+
+    async def _run(self) -> None:
+        while True:
+            # cleared first so a wake during the batch triggers another pass
+            self._wakeup.clear()
+            try:
+                for shard in get_shard_map().names:
+                    async with general_db(shard) as db:
+                        while await self.run_once(db) == self.batch_size:
+                            pass
+            except Exception:
+                logger.exception("Webhook dispatch failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stops dispatching. Claimed deliveries that were not recorded are
+        retried by the next worker once their lease expires
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await close_client()
+
+
+dispatcher = WebhookDispatcher()
@@ -0,0 +1 @@
+# Benchmarks for the backend, run each one with `python -m benchmarks.<name>`
@@ -0,0 +1,67 @@
+"""
+App-layer overhead benchmark: serves user and timer reads in-process from the
+in-memory repository, so routing, dependencies, validation and serialization
+are measured without database noise
+
+Usage: python -m benchmarks.app_overhead [--requests 5000]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from httpx import ASGITransport, AsyncClient
+
+from backend.main import app
+from backend.models import StandardTimer, User
+from backend.rate_limit import limiters
+from backend.repository import MemoryRepository, Repository, get_repository
+
+
+async def run(requests: int) -> None:
+    repository = MemoryRepository()
+    user = await repository.add_user(User(user_id=uuid.uuid4(), timezone="UTC"))
+    timer = await repository.add_standard_timer(
+        StandardTimer(user_id=user.user_id, minutes=25, hours=0)
+    )
+
+    async def override_get_repository() -> Repository:
+        return repository
+
+    app.dependency_overrides[get_repository] = override_get_repository
+    for limiter in limiters.values():
+        # admission control would reject a single user's burst
+        limiter.capacity = limiter.refill_per_second = float("inf")
+
+    headers = {"X-User-ID": str(user.user_id)}
+    cases = {
+        "GET /users/{uuid}": (f"/users/{user.user_id}", {}),
+        "GET /standard/{id}": (f"/api/standard/{timer.id}", headers),
+    }
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'endpoint':<22}{'req/s':>10}{'us/req':>10}")
+        for name, (path, case_headers) in cases.items():
+            for _ in range(100):  # warm up
+                await client.get(path, headers=case_headers)
+            start = time.perf_counter()
+            for _ in range(requests):
+                await client.get(path, headers=case_headers)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{name:<22}{requests / elapsed:>10.0f}"
+                f"{elapsed / requests * 1_000_000:>10.1f}"
+            )
+    app.dependency_overrides.pop(get_repository)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
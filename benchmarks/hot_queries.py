@@ -0,0 +1,96 @@
+"""
+Hot query benchmark: loads one user and one timer many times through the
+ORM queries and through the Core fast path, on one session as a request
+would. Reports wall time and Python CPU time per call, and the peak memory
+allocated while a call runs. The ORM path expunges after every call, as
+closing a request's session would
+
+Needs the database from the DB_* environment variables, rows are rolled back
+
+Usage: python -m benchmarks.hot_queries [--calls 5000]
+"""
+
+import argparse
+import asyncio
+import asyncio.selector_events
+import time
+import tracemalloc
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db import dispose_engine, get_session_generator
+from backend.ids import uuid7
+from backend.models import StandardTimer, User
+from backend.queries import fetch_user, get_user_by_uuid
+from backend.standard_timer.queries import fetch_timer, get_timer_by_id
+from backend.timezones import registry as timezone_registry
+
+Call = Callable[[], Awaitable[object]]
+
+
+async def measure(
+    db: AsyncSession, call: Call, calls: int
+) -> tuple[float, float, float]:
+    """
+    :return: wall µs, CPU µs and peak bytes per call
+    """
+    for _ in range(min(calls, 200)):  # warm the compiled and prepared caches
+        await call()
+        db.expunge_all()
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(calls):
+        await call()
+        db.expunge_all()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+    tracemalloc.start()
+    peak = 0
+    for _ in range(min(calls, 500)):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        await call()
+        db.expunge_all()
+        peak += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return wall / calls * 1e6, cpu / calls * 1e6, peak / min(calls, 500)
+
+
+async def run(calls: int) -> None:
+    async with get_session_generator()() as db:
+        await timezone_registry.load(db)
+        user = User(user_id=uuid7(), timezone="UTC")
+        db.add(user)
+        await db.flush()
+        timer = StandardTimer(user_id=user.user_id, minutes=25, hours=0)
+        db.add(timer)
+        await db.flush()
+        user_id, timer_id = str(user.user_id), timer.id
+        db.expunge_all()
+
+        cases: dict[str, Call] = {
+            "user, ORM": lambda: get_user_by_uuid(user_id, db),
+            "user, Core": lambda: fetch_user(user_id, db),
+            "timer, ORM": lambda: get_timer_by_id(timer_id, user_id, db),
+            "timer, Core": lambda: fetch_timer(timer_id, user_id, db),
+        }
+        print(f"{'query':<14}{'wall µs':>10}{'CPU µs':>10}{'peak KiB':>10}")
+        for name, call in cases.items():
+            wall, cpu, peak = await measure(db, call, calls)
+            print(f"{name:<14}{wall:>10.1f}{cpu:>10.1f}{peak / 1024:>10.1f}")
+        await db.rollback()
+    await dispose_engine()
+
+
+def main() -> None:
+    # every socket read allocates a max_size buffer, 256 KiB by default, which
+    # would hide the allocations made by the query itself
+    asyncio.selector_events._SelectorSocketTransport.max_size = 4096
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(run(args.calls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Micro-benchmark harness for the CPU-bound helpers.
+
+Run with `python -m pytest benchmarks/micro -q`. Every call to the `bench`
+fixture times a function in several samples, each immediately followed by a
+fixed pure-Python reference workload, and measures the memory a call
+allocates at its peak. The cost is expressed relative to the reference as
+the median ratio over the samples, so the stored baseline carries over
+between machines of different speeds and a sample disturbed by the machine
+doesn't decide the result.
+
+Timings still vary by tens of percent between runs, allocations hardly at
+all, so they are gated separately: a benchmark fails when its relative cost
+grows past `MICRO_BENCH_TIME_TOLERANCE` (env, default 0.5) or its
+allocation past `MICRO_BENCH_ALLOC_TOLERANCE` (env, default 0.1) over
+`baseline.json`. Pass `--save-baseline` to rewrite the baseline after an
+intended change.
+"""
+
+import gc
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+import pytest
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+TIME_TOLERANCE: float = float(os.getenv("MICRO_BENCH_TIME_TOLERANCE", "0.5"))
+ALLOC_TOLERANCE: float = float(os.getenv("MICRO_BENCH_ALLOC_TOLERANCE", "0.1"))
+ROUND_SECONDS: float = 0.01  # each round runs the function at least this long
+ROUNDS: int = 3  # a sample is the best of this many rounds
+SAMPLES: int = 9  # benchmark and reference samples, alternating
+SLACK_BYTES: int = 256  # allocation differences this small are noise
+
+REFERENCE_DATA = [str(n) for n in range(200)]
+
+
+def reference_workload() -> None:
+    # a bit of everything the benchmarked code does: dicts, strings, sorting
+    mapping = {value: len(value) for value in REFERENCE_DATA}
+    "".join(sorted(mapping, reverse=True))
+
+
+@dataclass(slots=True)
+class Result:
+    ns_per_op: float
+    ops_per_sec: float
+    relative_cost: float  # ns per op over the reference workload's
+    peak_bytes: int  # allocated at the peak of one call
+
+
+def calibrate(func: Callable[..., Any], *args: Any) -> int:
+    """
+    Finds how many calls make a round last at least `ROUND_SECONDS`
+    :return: int: Calls per round
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func(*args)
+        if time.perf_counter() - start >= ROUND_SECONDS:
+            return loops
+        loops *= 2
+
+
+def time_per_op(func: Callable[..., Any], loops: int, *args: Any) -> float:
+    """
+    Times a function over `ROUNDS` rounds of `loops` calls
+    :return: float: Best seconds per call
+    """
+    best = float("inf")
+    gc_enabled = gc.isenabled()
+    gc.disable()  # collections would land in random rounds
+    try:
+        for _ in range(ROUNDS):
+            start = time.perf_counter()
+            for _ in range(loops):
+                func(*args)
+            best = min(best, (time.perf_counter() - start) / loops)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return best
+
+
+def peak_bytes(func: Callable[..., Any], *args: Any) -> int:
+    func(*args)  # warm caches that only fill once
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+class Bench:
+    """
+    Measures benchmarks and checks them against the stored baseline
+    """
+
+    def __init__(self, save_baseline: bool) -> None:
+        self.save_baseline = save_baseline
+        self.baseline: dict[str, dict[str, float]] = (
+            json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        )
+        self.results: dict[str, Result] = {}
+        self.reference_loops = calibrate(reference_workload)
+        self.reference_ns = float("inf")
+
+    def __call__(self, name: str, func: Callable[..., Any], *args: Any) -> Result:
+        """
+        Measures one benchmark, failing the test on a regression
+        :param name: Unique benchmark name
+        :param func: Function to measure
+        :param args: Arguments passed to every call
+        :return: Result
+        """
+        assert name not in self.results, f"duplicate benchmark {name}"
+        # each sample is paired with a reference timing right after it, so
+        # the machine slowing down or speeding up affects both alike
+        loops = calibrate(func, *args)
+        ns_per_op = float("inf")
+        ratios = []
+        for _ in range(SAMPLES):
+            sample_ns = time_per_op(func, loops, *args) * 1e9
+            reference_ns = time_per_op(reference_workload, self.reference_loops) * 1e9
+            ns_per_op = min(ns_per_op, sample_ns)
+            self.reference_ns = min(self.reference_ns, reference_ns)
+            ratios.append(sample_ns / reference_ns)
+        result = Result(
+            ns_per_op=ns_per_op,
+            ops_per_sec=1e9 / ns_per_op,
+            relative_cost=statistics.median(ratios),
+            peak_bytes=peak_bytes(func, *args),
+        )
+        self.results[name] = result
+        stored = self.baseline.get(name)
+        if self.save_baseline or stored is None:
+            return result
+        if result.relative_cost > stored["relative_cost"] * (1 + TIME_TOLERANCE):
+            pytest.fail(
+                f"{name} regressed: relative cost {result.relative_cost:.2f}, "
+                f"baseline {stored['relative_cost']:.2f}"
+            )
+        if (
+            result.peak_bytes
+            > stored["peak_bytes"] * (1 + ALLOC_TOLERANCE) + SLACK_BYTES
+        ):
+            pytest.fail(
+                f"{name} allocates {result.peak_bytes} B per call, "
+                f"baseline {stored['peak_bytes']:.0f} B"
+            )
+        return result
+
+    def write_baseline(self) -> None:
+        baseline = {
+            **self.baseline,
+            **{
+                name: {
+                    "relative_cost": round(result.relative_cost, 3),
+                    "peak_bytes": result.peak_bytes,
+                }
+                for name, result in self.results.items()
+            },
+        }
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+
+BENCH_KEY = pytest.StashKey[Bench]()
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--save-baseline",
+        action="store_true",
+        help="rewrite benchmarks/micro/baseline.json instead of checking it",
+    )
+
+
+@pytest.fixture(scope="session")
+def bench(request: pytest.FixtureRequest) -> Bench:
+    harness = Bench(request.config.getoption("--save-baseline"))
+    request.config.stash[BENCH_KEY] = harness
+    return harness
+
+
+def pytest_sessionfinish(session: pytest.Session) -> None:
+    harness = session.config.stash.get(BENCH_KEY, None)
+    if harness is not None and harness.save_baseline:
+        harness.write_baseline()
+
+
+def pytest_terminal_summary(terminalreporter: Any, config: pytest.Config) -> None:
+    harness = config.stash.get(BENCH_KEY, None)
+    if harness is None or not harness.results:
+        return
+    terminalreporter.section("micro-benchmarks")
+    terminalreporter.write_line(
+        f"{'benchmark':<46}{'ops/s':>12}{'ns/op':>10}{'rel':>8}{'B/call':>9}"
+        f"{'vs base':>9}"
+    )
+    for name, result in sorted(harness.results.items()):
+        stored = harness.baseline.get(name)
+        change = (
+            f"{result.relative_cost / stored['relative_cost'] - 1:>+9.0%}"
+            if stored
+            else f"{'new':>9}"
+        )
+        terminalreporter.write_line(
+            f"{name:<46}{result.ops_per_sec:>12,.0f}{result.ns_per_op:>10.0f}"
+            f"{result.relative_cost:>8.2f}{result.peak_bytes:>9}{change}"
+        )
+    terminalreporter.write_line(
+        f"reference workload: {harness.reference_ns:.0f} ns, "
+        f"tolerance {TIME_TOLERANCE:.0%} time, {ALLOC_TOLERANCE:.0%} allocations"
+        + (", baseline saved" if harness.save_baseline else "")
+    )
@@ -0,0 +1,45 @@
+"""
+Micro-benchmarks for the ISO and display time formatting in timer responses
+"""
+
+from datetime import datetime, timezone
+from typing import Any
+from zoneinfo import ZoneInfo
+
+from backend.models import StandardTimer
+from backend.standard_timer import services
+
+START = datetime(2026, 1, 1, 9, 0, 0, 123456, tzinfo=timezone.utc)
+ZONE = ZoneInfo("America/New_York")
+
+
+def running_timer() -> StandardTimer:
+    timer = StandardTimer(minutes=25, hours=1)
+    timer.start_time = START
+    timer.total_paused_seconds = 90
+    timer.is_started = True
+    timer.is_paused = timer.is_completed = False
+    return timer
+
+
+def test_iso(bench: Any) -> None:
+    bench("to_iso", services.to_iso, START)
+
+
+def test_display_time(bench: Any) -> None:
+    bench("format_display_time", services.format_display_time, START, ZONE)
+
+
+def test_start_response_strings(bench: Any) -> None:
+    timer = running_timer()
+
+    def strings() -> tuple[str, str]:
+        # start_time_string and end_time_string of StartStandardTimerOut
+        deadline = services.get_deadline(timer)
+        assert timer.start_time is not None and deadline is not None
+        return (
+            services.format_display_time(timer.start_time, ZONE),
+            services.format_display_time(deadline, ZONE),
+        )
+
+    bench("start response display strings", strings)
@@ -0,0 +1,105 @@
+"""
+Micro-benchmarks for building and serializing every response and request schema
+"""
+
+import inspect
+from types import ModuleType
+from typing import Any
+
+import pytest
+from pydantic import BaseModel
+
+import backend.schemas as schemas
+import backend.standard_timer.schemas as standard_schemas
+from backend.ids import uuid7
+
+ISO = "2026-01-01T09:00:00.123456+00:00"
+TIMER_STATE: dict[str, Any] = {
+    "timer_id": "42",
+    "minutes": 25,
+    "hours": 1,
+    "elapsed_seconds": 600,
+    "total_paused_seconds": 90,
+    "total_pause_count": 3,
+    "is_paused": False,
+    "server_time": ISO,
+}
+SAMPLES: dict[type[BaseModel], dict[str, Any]] = {
+    schemas.CreateUserIn: {"timezone": "America/New_York"},
+    schemas.CreateUserOut: {"user_id": uuid7(), "timezone": "America/New_York"},
+    schemas.GetUserOut: {"user_id": uuid7(), "timezone": "America/New_York"},
+    schemas.ServerTimeOut: {"server_time": ISO, "epoch_ms": 1767258000123.456},
+    standard_schemas.CreateStandardTimerIn: {"minutes": 25, "hours": 1},
+    standard_schemas.CreateStandardTimerOut: {
+        "timer_id": "42",
+        "minutes": 25,
+        "hours": 1,
+    },
+    standard_schemas.StartStandardTimerOut: {
+        **TIMER_STATE,
+        "start_time": ISO,
+        "last_pause_time": None,
+        "start_time_string": "09:00:00",
+        "end_time_string": "10:26:30",
+    },
+    standard_schemas.PauseStandardTimerOut: {
+        "timer_id": "42",
+        "last_pause_time": ISO,
+        "total_pause_count": 3,
+        "is_paused": True,
+        "server_time": ISO,
+    },
+    standard_schemas.ResumeStandardTimerOut: {
+        "timer_id": "42",
+        "total_paused_seconds": 90,
+        "server_time": ISO,
+    },
+    standard_schemas.EndStandardTimerOut: {
+        "timer_id": "42",
+        "end_time_string": "10:26:30",
+        "total_pause_count": 3,
+        "server_time": ISO,
+    },
+    standard_schemas.GetStandardTimerOut: {
+        **TIMER_STATE,
+        "is_started": True,
+        "is_completed": False,
+        "start_time": ISO,
+        "last_pause_time": None,
+        "end_time": None,
+        "version": 7,
+    },
+    standard_schemas.ImportRowError: {"line": 12, "message": "Invalid duration"},
+    standard_schemas.ImportStandardTimersOut: {
+        "accepted": 4998,
+        "rejected": 2,
+        "errors": [{"line": 12, "message": "Invalid duration"}] * 2,
+    },
+}
+
+
+def defined_schemas(module: ModuleType) -> list[type[BaseModel]]:
+    return [
+        value
+        for value in vars(module).values()
+        if inspect.isclass(value)
+        and issubclass(value, BaseModel)
+        and value.__module__ == module.__name__
+    ]
+
+
+def test_every_schema_is_covered() -> None:
+    missing = {
+        schema.__name__
+        for module in (schemas, standard_schemas)
+        for schema in defined_schemas(module)
+    } - {schema.__name__ for schema in SAMPLES}
+    assert not missing, f"add samples for {sorted(missing)}"
+
+
+@pytest.mark.parametrize("schema", list(SAMPLES), ids=lambda schema: schema.__name__)
+def test_schema(bench: Any, schema: type[BaseModel]) -> None:
+    sample = SAMPLES[schema]
+    bench(f"{schema.__name__}.validate", schema.model_validate, sample)
+    instance = schema.model_validate(sample)
+    bench(f"{schema.__name__}.dump_json", instance.model_dump_json)
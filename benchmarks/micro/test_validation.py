@@ -0,0 +1,26 @@
+"""
+Micro-benchmarks for the validators run on every request
+"""
+
+from typing import Any
+
+from backend.ids import uuid7
+from backend.main import is_valid_timezone, is_valid_uuid
+from backend.models import StandardTimer
+
+
+def test_validate_duration(bench: Any) -> None:
+    timer = StandardTimer(minutes=25, hours=1)
+    bench("StandardTimer.validate_duration", timer.validate_duration, "minutes", 30)
+    # the same path the ORM runs on assignment
+    bench("StandardTimer.minutes assignment", setattr, timer, "minutes", 30)
+
+
+def test_is_valid_uuid(bench: Any) -> None:
+    bench("is_valid_uuid valid", is_valid_uuid, str(uuid7()))
+    bench("is_valid_uuid invalid", is_valid_uuid, "not-a-uuid")
+
+
+def test_is_valid_timezone(bench: Any) -> None:
+    bench("is_valid_timezone valid", is_valid_timezone, "America/New_York")
+    bench("is_valid_timezone invalid", is_valid_timezone, "Mars/Olympus_Mons")
@@ -0,0 +1,217 @@
+"""
+Online migration demo: seeds a scratch copy of `standard_timer`, partitioned
+by month like the real one, then runs the same schema change two ways while
+writer threads keep pausing and resuming random timers:
+
+- blocking: in one transaction, as the recreate-style revisions do. Adding
+  the column locks the table until the whole backfill and index build commit
+- online: with `backend.online_migrations`, expand steps committed one by one
+
+The change adds `planned_seconds`, backfilled from the duration, sets it
+NOT NULL and indexes it with the owner. Each revision body is written as it
+would be in `alembic/versions`. The writers' latencies during the migration
+show whether it blocked them
+
+Needs the database from the DB_* environment variables, the scratch table
+is dropped afterwards
+
+Usage: python -m benchmarks.online_migration [--rows 2000000] [--writers 8]
+"""
+
+import argparse
+import logging
+import random
+import statistics
+import threading
+import time
+
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import Engine, create_engine, text
+
+from alembic import op
+from backend import online_migrations
+from backend.db import get_alembic_connection_url
+from backend.online_migrations import (
+    add_not_null,
+    backfill,
+    create_index_concurrently,
+    run_guarded,
+)
+
+TABLE = "migration_demo"
+INDEX = "ix_migration_demo_planned"
+MONTHS = 12
+WRITE_INTERVAL: float = 0.005  # seconds each writer waits between writes
+
+
+def upgrade_blocking() -> None:
+    op.add_column(TABLE, sa.Column("planned_seconds", sa.Integer(), nullable=True))
+    op.execute(f"UPDATE {TABLE} SET planned_seconds = hours * 3600 + minutes * 60")
+    op.alter_column(TABLE, "planned_seconds", nullable=False)
+    op.create_index(INDEX, TABLE, ["user_id", "planned_seconds"])
+
+
+def upgrade_online() -> None:
+    with op.get_context().autocommit_block():
+        # nullable without a default, so no rewrite. The app writes it from here on
+        run_guarded(f"ALTER TABLE {TABLE} ADD COLUMN planned_seconds integer")
+        backfill(
+            TABLE,
+            "planned_seconds = hours * 3600 + minutes * 60",
+            "planned_seconds IS NULL",
+            name=TABLE,
+        )
+        add_not_null(TABLE, "planned_seconds")
+        create_index_concurrently(INDEX, TABLE, "user_id, planned_seconds")
+
+
+def seed(engine: Engine, rows: int) -> None:
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        connection.execute(
+            text(
+                f"CREATE TABLE {TABLE} (LIKE standard_timer INCLUDING DEFAULTS) "
+                "PARTITION BY RANGE (created_at)"
+            )
+        )
+        connection.execute(
+            text(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)")
+        )
+        for month in range(MONTHS):
+            connection.execute(
+                text(
+                    f"CREATE TABLE {TABLE}_m{month:02d} PARTITION OF {TABLE} FOR VALUES "
+                    f"FROM ('2025-01-01'::timestamptz + interval '{month} months') "
+                    f"TO ('2025-01-01'::timestamptz + interval '{month + 1} months')"
+                )
+            )
+        # ids grow with created_at, as they do in the real table
+        connection.execute(
+            text(
+                f"INSERT INTO {TABLE} (id, user_id, minutes, hours, elapsed_seconds, "
+                "total_paused_seconds, total_pause_count, is_started, is_paused, "
+                "is_completed, created_at, updated_at) "
+                "SELECT n, md5((n % 50000)::text)::uuid, n % 60, n % 3 + 1, 0, 0, 0, "
+                "true, false, n % 4 > 0, ts, ts "
+                "FROM generate_series(1, :rows) n, LATERAL (SELECT "
+                "'2025-01-01'::timestamptz + (n - 1) * interval '1 second' "
+                "* (:seconds / :rows) AS ts) t"
+            ),
+            {"rows": rows, "seconds": (MONTHS * 30 - 1) * 86400},
+        )
+        connection.execute(text(f"CREATE INDEX ON {TABLE} (user_id)"))
+    with engine.connect() as connection:
+        connection.execution_options(isolation_level="AUTOCOMMIT").execute(
+            text(f"VACUUM ANALYZE {TABLE}")
+        )
+
+
+def write(engine: Engine, rows: int, stop: threading.Event, samples: list) -> None:
+    """
+    Pauses or resumes random timers until stopped, recording (start, seconds)
+    per write
+    """
+    rng = random.Random()
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        while not stop.is_set():
+            started = time.perf_counter()
+            connection.execute(
+                text(
+                    f"UPDATE {TABLE} SET is_paused = NOT is_paused, "
+                    "version = version + 1, updated_at = now() WHERE id = :id"
+                ),
+                {"id": rng.randint(1, rows)},
+            )
+            samples.append((started, time.perf_counter() - started))
+            time.sleep(WRITE_INTERVAL)
+
+
+def run(engine: Engine, upgrade, rows: int, writers: int) -> tuple:
+    seed(engine, rows)
+    stop = threading.Event()
+    samples: list[tuple[float, float]] = []
+    threads = [
+        threading.Thread(target=write, args=(engine, rows, stop, samples))
+        for _ in range(writers)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(1)
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection)
+        with Operations.context(context), context.begin_transaction():
+            upgrade()
+    finished = time.perf_counter()
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    with engine.connect() as connection:
+        missing = connection.scalar(
+            text(
+                f"SELECT count(*) FROM {TABLE} WHERE planned_seconds IS DISTINCT FROM hours * 3600 + minutes * 60"
+            )
+        )
+        valid = connection.scalar(
+            text(
+                "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"
+            ),
+            {"name": INDEX},
+        )
+    assert missing == 0 and valid, "migration left rows or the index unfinished"
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE {TABLE}"))
+        connection.execute(
+            text(f"DROP TABLE IF EXISTS {online_migrations.PROGRESS_TABLE}")
+        )
+
+    during = sorted(
+        seconds
+        for start, seconds in samples
+        # writes that started while the migration ran, or waited through it
+        if start < finished and start + seconds > started
+    )
+    return (
+        finished - started,
+        len(during),
+        statistics.median(during),
+        during[int(len(during) * 0.99)],
+        during[-1],
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument(
+        "--mode", choices=("both", "blocking", "online"), default="both"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    engine = create_engine(get_alembic_connection_url(), pool_size=args.writers + 2)
+    modes = {"blocking": upgrade_blocking, "online": upgrade_online}
+    results = {
+        name: run(engine, upgrade, args.rows, args.writers)
+        for name, upgrade in modes.items()
+        if args.mode in ("both", name)
+    }
+    engine.dispose()
+    print(f"{args.rows} rows, {args.writers} writers")
+    print(
+        f"{'migration':<10}{'seconds':>9}{'writes':>8}{'p50 ms':>9}{'p99 ms':>9}"
+        f"{'max ms':>10}"
+    )
+    for name, (seconds, writes, p50, p99, longest) in results.items():
+        print(
+            f"{name:<10}{seconds:>9.1f}{writes:>8}{p50 * 1000:>9.1f}"
+            f"{p99 * 1000:>9.1f}{longest * 1000:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
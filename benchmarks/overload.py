@@ -0,0 +1,209 @@
+"""
+Overload test: runs the app under uvicorn in a separate process and sends
+GET /users/{uuid} at a fixed arrival rate above what the worker can serve,
+with a client timeout, once with load shedding and once without. Reports
+goodput (answers within the timeout per second), how many requests were
+shed with 503 and how many timed out
+
+Shedding pays off when the pool is the bottleneck. When the client shares
+the server's CPU, the CPU saturates first and every 503 still costs an
+accept and a parse, while requests abandoned without shedding die unread in
+the socket buffers, so compare latencies rather than goodput on such hosts
+
+Needs the database from the DB_* environment variables, the users it
+creates are deleted afterwards
+
+Usage: python -m benchmarks.overload [--rate 800] [--seconds 10] [--timeout 1]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import httpx
+from sqlalchemy import text
+
+from backend.db import dispose_engine, get_engine
+from backend.ids import uuid7
+
+PORT = 8765
+USERS = 2000  # spreads requests over enough rate limit buckets
+
+
+async def create_users() -> list[str]:
+    user_ids = [str(uuid7()) for _ in range(USERS)]
+    async with get_engine().begin() as conn:
+        await conn.execute(
+            text(
+                "INSERT INTO users (user_id, timezone_id) "
+                "SELECT unnest(CAST(:ids AS uuid[])), "
+                "(SELECT id FROM timezones WHERE name = 'UTC')"
+            ),
+            {"ids": user_ids},
+        )
+    return user_ids
+
+
+async def delete_users(user_ids: list[str]) -> None:
+    async with get_engine().begin() as conn:
+        await conn.execute(
+            text("DELETE FROM users WHERE user_id = ANY(CAST(:ids AS uuid[]))"),
+            {"ids": user_ids},
+        )
+    await dispose_engine()
+
+
+def start_server(shedding: bool) -> subprocess.Popen:
+    env = dict(os.environ)
+    if not shedding:
+        env["LOAD_SHED_MAX_IN_FLIGHT"] = str(10**9)
+        env["LOAD_SHED_MAX_POOL_WAIT_MS"] = str(10**9)
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "backend.main:app",
+            "--port",
+            str(PORT),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        env=env,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{PORT}/test", timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("Server did not start")
+
+
+class RawClient:
+    """
+    Minimal keep-alive HTTP/1.1 client. httpx costs about a millisecond of
+    CPU per request, which on a small machine would starve the server being
+    measured
+    """
+
+    def __init__(self, port: int) -> None:
+        self.port = port
+        self.idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def get(self, path: str) -> int:
+        if self.idle:
+            reader, writer = self.idle.pop()
+        else:
+            reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        try:
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: test\r\n\r\n".encode())
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                name, _, value = line.partition(b":")
+                if name.lower() == b"content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+        except BaseException:
+            # includes timeouts: the connection is dropped as a client would
+            writer.close()
+            raise
+        self.idle.append((reader, writer))
+        return status
+
+    def close(self) -> None:
+        for _, writer in self.idle:
+            writer.close()
+
+
+async def send_load(
+    user_ids: list[str], rate: float, seconds: float, timeout: float
+) -> tuple[Counter[str], list[float]]:
+    outcomes: Counter[str] = Counter()
+    latencies: list[float] = []
+    client = RawClient(PORT)
+
+    async def one(user_id: str) -> None:
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(timeout):
+                status = await client.get(f"/users/{user_id}")
+        except TimeoutError:
+            outcomes["timed out"] += 1
+            return
+        except (OSError, IndexError, ValueError, asyncio.IncompleteReadError):
+            outcomes["failed"] += 1
+            return
+        if status == 200:
+            outcomes["ok"] += 1
+            latencies.append(time.perf_counter() - start)
+        elif status == 503:
+            outcomes["shed"] += 1
+        else:
+            outcomes[str(status)] += 1
+
+    tasks = []
+    start = time.perf_counter()
+    for n in range(int(rate * seconds)):
+        # open loop: arrivals don't wait for earlier answers
+        delay = start + n / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(user_ids[n % len(user_ids)])))
+    await asyncio.gather(*tasks)
+    client.close()
+    return outcomes, latencies
+
+
+async def run(rate: float, seconds: float, timeout: float) -> None:
+    user_ids = await create_users()
+    try:
+        print(
+            f"{'shedding':<10}{'goodput/s':>10}{'ok':>8}{'shed':>8}{'timed out':>11}"
+            f"{'p50 ms':>9}{'p99 ms':>9}"
+        )
+        for shedding in (False, True):
+            server = start_server(shedding)
+            try:
+                outcomes, latencies = await send_load(user_ids, rate, seconds, timeout)
+            finally:
+                server.terminate()
+                server.wait()
+            latencies.sort()
+            p50 = statistics.median(latencies) * 1000 if latencies else 0
+            p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+            print(
+                f"{'on' if shedding else 'off':<10}{outcomes['ok'] / seconds:>10.0f}"
+                f"{outcomes['ok']:>8}{outcomes['shed']:>8}{outcomes['timed out']:>11}"
+                f"{p50:>9.0f}{p99:>9.0f}"
+            )
+            other = {
+                k: v
+                for k, v in outcomes.items()
+                if k not in ("ok", "shed", "timed out")
+            }
+            if other:
+                print(f"          other outcomes: {other}")
+    finally:
+        await delete_users(user_ids)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=float, default=800, help="requests per second")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--timeout", type=float, default=1.0, help="client timeout")
+    args = parser.parse_args()
+    asyncio.run(run(args.rate, args.seconds, args.timeout))
+
+
+if __name__ == "__main__":
+    main()
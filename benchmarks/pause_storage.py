@@ -0,0 +1,240 @@
+"""
+Pause storage benchmark: records the same pauses packed in
+`standard_timer.pause_intervals` and in a row-per-pause table (timer id,
+start time and length, indexed by timer), then compares their size, the
+time to compute the median pause and the length histogram over every
+timer, and the time to load one timer's pauses
+
+Needs the database from the DB_* environment variables, everything is
+rolled back
+
+Usage: python -m benchmarks.pause_storage [--timers 20000] [--pauses 10]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from backend.db import dispose_engine, get_engine
+from backend.ids import uuid7
+from backend.models import StandardTimer
+from backend.pause_intervals import HISTOGRAM_EDGES, append_interval, get_pause_stats
+
+COPY_COLUMNS = (
+    "user_id",
+    "minutes",
+    "hours",
+    "start_time",
+    "elapsed_seconds",
+    "total_paused_seconds",
+    "total_pause_count",
+    "is_started",
+    "is_paused",
+    "is_completed",
+    "pause_intervals",
+)
+ROW_TABLE_SQL = """
+CREATE TEMP TABLE pause_rows (
+    id bigserial PRIMARY KEY,
+    timer_id bigint NOT NULL,
+    started_at timestamptz NOT NULL,
+    seconds integer NOT NULL
+) ON COMMIT DROP
+"""
+
+
+def row_stats_sql(edges: tuple[int, ...]) -> str:
+    # the same single pass as `get_pause_stats`
+    bounds = (0, *edges)
+    buckets = ", ".join(
+        f"count(*) FILTER (WHERE p.seconds >= {bound}"
+        + (f" AND p.seconds < {upper})" if upper is not None else ")")
+        for bound, upper in zip(bounds, (*edges, None))
+    )
+    return (
+        "SELECT count(*), percentile_cont(0.5) WITHIN GROUP (ORDER BY p.seconds), "
+        f"{buckets} FROM pause_rows p JOIN standard_timer t ON t.id = p.timer_id "
+        "WHERE t.user_id = :user_id"
+    )
+
+
+def generate(
+    timers: int, pauses: int, rng: random.Random
+) -> list[list[tuple[datetime, int]]]:
+    """
+    :return: for every timer, its pauses as (start, length) sorted by start
+    """
+    start = datetime.now(timezone.utc) - timedelta(days=1)
+    result = []
+    for _ in range(timers):
+        moment = start
+        timer_pauses = []
+        for _ in range(rng.randint(0, 2 * pauses)):
+            moment += timedelta(seconds=int(rng.expovariate(1 / 300)))
+            length = int(rng.lognormvariate(4, 1.2))
+            timer_pauses.append((moment, length))
+            moment += timedelta(seconds=length)
+        result.append(timer_pauses)
+    return result
+
+
+async def best_of(runs: int, call: Callable[[], Awaitable[object]]) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        await call()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+async def load(
+    conn: AsyncConnection, user_id: str, pauses: list[list[tuple[datetime, int]]]
+) -> list[int]:
+    start = datetime.now(timezone.utc) - timedelta(days=1)
+    raw = (await conn.get_raw_connection()).driver_connection
+    assert raw is not None
+    records = []
+    for timer_pauses in pauses:
+        packed: list[int] = []
+        for paused_at, length in timer_pauses:
+            packed = append_interval(
+                packed, start, paused_at, paused_at + timedelta(seconds=length)
+            )
+        paused = sum(length for _, length in timer_pauses)
+        records.append(
+            (user_id, 0, 3, start, 0, paused, len(timer_pauses), True, False, False)
+            + (packed,)
+        )
+    await raw.copy_records_to_table(
+        StandardTimer.__tablename__,
+        records=records,
+        columns=COPY_COLUMNS,
+    )
+    timer_ids = list(
+        (
+            await conn.execute(
+                text("SELECT id FROM standard_timer WHERE user_id = :u ORDER BY id"),
+                {"u": user_id},
+            )
+        ).scalars()
+    )
+    await conn.execute(text(ROW_TABLE_SQL))
+    await raw.copy_records_to_table(
+        "pause_rows",
+        records=[
+            (timer_id, paused_at, length)
+            for timer_id, timer_pauses in zip(timer_ids, pauses)
+            for paused_at, length in timer_pauses
+        ],
+        columns=("timer_id", "started_at", "seconds"),
+    )
+    await conn.execute(text("CREATE INDEX ON pause_rows (timer_id)"))
+    await conn.execute(text("ANALYZE pause_rows"))
+    await conn.execute(text("ANALYZE standard_timer"))
+    return timer_ids
+
+
+async def run(timers: int, pauses: int, runs: int) -> None:
+    rng = random.Random(0)
+    generated = generate(timers, pauses, rng)
+    total = sum(len(timer_pauses) for timer_pauses in generated)
+    async with get_engine().connect() as conn:
+        transaction = await conn.begin()
+        try:
+            user_id = str(uuid7())
+            await conn.execute(
+                text(
+                    "INSERT INTO users (user_id, timezone_id) "
+                    "VALUES (:u, (SELECT id FROM timezones WHERE name = 'UTC'))"
+                ),
+                {"u": user_id},
+            )
+            timer_ids = await load(conn, user_id, generated)
+            db = AsyncSession(bind=conn)
+
+            packed_bytes = (
+                await conn.execute(
+                    text(
+                        "SELECT sum(pg_column_size(pause_intervals)) "
+                        "FROM standard_timer WHERE user_id = :u"
+                    ),
+                    {"u": user_id},
+                )
+            ).scalar_one()
+            row_bytes = (
+                await conn.execute(text("SELECT pg_total_relation_size('pause_rows')"))
+            ).scalar_one()
+
+            packed_stats = await get_pause_stats(db, StandardTimer.user_id == user_id)
+            row_stats = text(row_stats_sql(HISTOGRAM_EDGES))
+            row_summary = (await conn.execute(row_stats, {"user_id": user_id})).one()
+            assert packed_stats["pauses"] == row_summary[0] == total
+            assert packed_stats["median_seconds"] == row_summary[1]
+            assert [bucket["count"] for bucket in packed_stats["histogram"]] == list(
+                row_summary[2:]
+            )
+
+            async def packed_analytics() -> None:
+                await get_pause_stats(db, StandardTimer.user_id == user_id)
+
+            async def row_analytics() -> None:
+                await conn.execute(row_stats, {"user_id": user_id})
+
+            sample = rng.sample(timer_ids, min(1000, len(timer_ids)))
+
+            async def packed_lookups() -> None:
+                for timer_id in sample:
+                    await conn.execute(
+                        text(
+                            "SELECT pause_intervals FROM standard_timer WHERE id = :id"
+                        ),
+                        {"id": timer_id},
+                    )
+
+            async def row_lookups() -> None:
+                for timer_id in sample:
+                    await conn.execute(
+                        text(
+                            "SELECT started_at, seconds FROM pause_rows "
+                            "WHERE timer_id = :id ORDER BY started_at"
+                        ),
+                        {"id": timer_id},
+                    )
+
+            print(f"{timers} timers, {total} pauses")
+            print(
+                f"{'storage':<16}{'MiB':>8}{'B/pause':>9}{'stats ms':>10}{'lookup µs':>11}"
+            )
+            for name, size, analytics, lookups in (
+                ("packed array", packed_bytes, packed_analytics, packed_lookups),
+                ("row per pause", row_bytes, row_analytics, row_lookups),
+            ):
+                stats_seconds = await best_of(runs, analytics)
+                lookup_seconds = await best_of(runs, lookups)
+                print(
+                    f"{name:<16}{size / 2**20:>8.1f}{size / max(total, 1):>9.1f}"
+                    f"{stats_seconds * 1000:>10.1f}"
+                    f"{lookup_seconds / len(sample) * 1e6:>11.0f}"
+                )
+        finally:
+            await transaction.rollback()
+    await dispose_engine()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--timers", type=int, default=20_000)
+    parser.add_argument("--pauses", type=int, default=10, help="average per timer")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.timers, args.pauses, args.runs))
+
+
+if __name__ == "__main__":
+    main()
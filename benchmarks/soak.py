@@ -0,0 +1,328 @@
+"""
+Soak test: drives the app in-process, lifespan and background jobs included,
+through the whole user and timer lifecycle for hours, and fails if the
+memory retained between requests keeps growing
+
+Every cycle creates a user (with an Idempotency-Key), reads it with and
+without If-None-Match, creates a timer, starts, pauses, resumes and ends it,
+reads and exports it, and hits the JSONResponse error paths (invalid UUID,
+unknown timer, invalid transition). Cycles run concurrently in batches, and
+after every `--sample-every` requests, with no request in flight, it records:
+
+- memory traced by `tracemalloc` after a full collection, and RSS
+- sessions left open (in a transaction or holding objects) and the largest
+  identity map a session closed with, which shows relationships such as
+  `User.standard_timers` being loaded
+- connections still checked out of each shard's pool
+
+The bounded caches (ETag versions, idempotency responses, rate limit
+buckets) are shrunk so they fill up during the warm-up, any growth after it
+is retained by something unbounded. Tracing starts before the warm-up, so
+evicting entries cached before the baseline is counted as freeing them. The
+growth rate is the least-squares slope of the traced memory over the
+samples. The report lists the allocation sites that grew most since the end
+of the warm-up
+
+Needs the database from the DB_* environment variables, the users it
+creates are deleted afterwards
+
+Usage: python -m benchmarks.soak [--hours 2] [--concurrency 4]
+       [--sample-every 5000] [--max-growth-kb 64]
+"""
+
+import argparse
+import asyncio
+import gc
+import linecache
+import os
+import resource
+import sys
+import time
+import tracemalloc
+import uuid
+import weakref
+from datetime import datetime, timezone
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session, SessionTransaction
+
+import backend.etag as etag
+import backend.idempotency as idempotency
+from backend.db import dispose_engine, general_db, get_shard_map
+from backend.load_shedding import shedder
+from backend.logging import LOGGING_CONFIG
+from backend.main import app
+from backend.models import MAX_INTEGER_ID
+from backend.rate_limit import limiters
+
+SOAK_TIMEZONE = "Antarctica/Troll"  # marks the users to delete afterwards
+CACHE_ENTRIES: int = 200  # bounded caches are shrunk to this many entries
+WARMUP_REQUESTS: int = 10_000  # about 600 users, enough to fill them
+FRAMES: int = 4  # traceback depth kept by tracemalloc
+TOP_SITES: int = 15
+UNKNOWN_TIMER_ID: int = MAX_INTEGER_ID
+# background jobs may hold a session while a sample is taken, a leak shows
+# in this many consecutive samples
+LEAK_SAMPLES: int = 3
+GROWTH_PER: int = 10_000  # requests the growth limit applies to
+
+sessions: "weakref.WeakSet[Session]" = weakref.WeakSet()
+largest_identity_map = 0
+
+
+@event.listens_for(Session, "after_begin")
+def track_session(session: Session, transaction, connection) -> None:
+    sessions.add(session)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def measure_identity_map(session: Session, transaction: SessionTransaction) -> None:
+    global largest_identity_map
+    if transaction.parent is None:
+        largest_identity_map = max(largest_identity_map, len(session.identity_map))
+
+
+def expect(response, status_code: int) -> None:
+    assert response.status_code == status_code, (
+        f"{response.request.method} {response.request.url.path}: "
+        f"{response.status_code} {response.text[:200]}"
+    )
+
+
+async def cycle(client: AsyncClient) -> int:
+    """
+    One user's lifecycle
+    :return: int: requests sent
+    """
+    response = await client.post(
+        "/users",
+        json={"timezone": SOAK_TIMEZONE},
+        headers={"Idempotency-Key": uuid.uuid4().hex},
+    )
+    expect(response, 200)
+    user_id = response.json()["user_id"]
+    response = await client.get(f"/users/{user_id}")
+    expect(response, 200)
+    response = await client.get(
+        f"/users/{user_id}", headers={"If-None-Match": response.headers["ETag"]}
+    )
+    expect(response, 304)
+    expect(await client.get("/users/not-a-uuid"), 400)
+
+    headers = {"X-User-ID": user_id}
+    response = await client.post(
+        "/standard", json={"minutes": 25, "hours": 0}, headers=headers
+    )
+    expect(response, 200)
+    timer = f"/standard/{{}}/{response.json()['timer_id']}"
+    for action in ("start", "pause", "resume", "pause", "resume"):
+        expect(await client.post(timer.format(action), headers=headers), 200)
+    # already running
+    expect(await client.post(timer.format("resume"), headers=headers), 400)
+    path = timer.replace("{}/", "")
+    response = await client.get(path, headers=headers)
+    expect(response, 200)
+    response = await client.get(
+        path, headers={**headers, "If-None-Match": response.headers["ETag"]}
+    )
+    expect(response, 304)
+    expect(await client.get(f"/standard/{UNKNOWN_TIMER_ID}", headers=headers), 404)
+    expect(await client.post(timer.format("end"), headers=headers), 200)
+    response = await client.get("/standard/export", headers=headers)
+    expect(response, 200)
+    return 16
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # peak instead of current outside Linux, in KiB
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def open_sessions() -> int:
+    # a closed session may linger in a local variable, it holds nothing
+    return sum(
+        1 for session in sessions if session.in_transaction() or session.identity_map
+    )
+
+
+def checked_out() -> int:
+    return sum(
+        engine.pool.checkedout()  # type: ignore[attr-defined]
+        for engine in get_shard_map().engines.values()
+    )
+
+
+def slope(points: list[tuple[int, int]]) -> float:
+    """
+    Least-squares slope of (requests, bytes) points
+    :return: float: bytes per request
+    """
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if not spread:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+def snapshot() -> tracemalloc.Snapshot:
+    gc.collect()
+    return tracemalloc.take_snapshot().filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, linecache.__file__),
+            tracemalloc.Filter(False, __file__),
+        )
+    )
+
+
+def print_top_sites(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> None:
+    print(f"\ntop {TOP_SITES} allocation sites by growth since the warm-up")
+    stats = sorted(
+        after.compare_to(before, "traceback"),
+        key=lambda stat: stat.size_diff,
+        reverse=True,
+    )
+    for stat in stats[:TOP_SITES]:
+        print(f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8} blocks")
+        # innermost frames of the app or a library, not the event loop
+        for line in stat.traceback.format(limit=3, most_recent_first=True):
+            print(f"    {line}")
+
+
+async def cleanup(started: datetime) -> int:
+    deleted = 0
+    for shard in get_shard_map().names:
+        async with general_db(shard) as db:
+            user_ids = (
+                "SELECT user_id FROM users WHERE created_at >= :started "
+                "AND timezone_id = (SELECT id FROM timezones WHERE name = :name)"
+            )
+            params = {"started": started, "name": SOAK_TIMEZONE}
+            await db.execute(
+                text(
+                    "DELETE FROM idempotency_keys WHERE created_at >= :started "
+                    "AND response_body->>'timezone' = :name"
+                ),
+                params,
+            )
+            await db.execute(
+                text(f"DELETE FROM standard_timer WHERE user_id IN ({user_ids})"),
+                params,
+            )
+            result = await db.execute(
+                text(f"DELETE FROM users WHERE user_id IN ({user_ids})"), params
+            )
+            deleted += result.rowcount
+            await db.commit()
+    return deleted
+
+
+async def run(args: argparse.Namespace) -> bool:
+    # request logs still go through the queues to the files, the console only
+    # shows warnings such as slow requests
+    LOGGING_CONFIG["handlers"]["console"]["level"] = "WARNING"
+    for cache in (etag.versions, idempotency.response_cache):
+        cache.max_entries = CACHE_ENTRIES
+    # admission control would reject the soak's own traffic, slowed by tracing
+    shedder.max_pool_wait = shedder.max_in_flight = float("inf")
+    for limiter in limiters.values():
+        limiter.capacity = limiter.refill_per_second = float("inf")
+        limiter.max_buckets = CACHE_ENTRIES
+    started_at = datetime.now(timezone.utc)
+    transport = ASGITransport(app=app)
+    samples: list[tuple[int, int]] = []
+    requests = leaked = 0
+    try:
+        async with (
+            app.router.lifespan_context(app),
+            AsyncClient(transport=transport, base_url="http://soak") as client,
+        ):
+
+            async def batch() -> int:
+                return sum(
+                    await asyncio.gather(
+                        *(cycle(client) for _ in range(args.concurrency))
+                    )
+                )
+
+            tracemalloc.start(FRAMES)
+            while requests < WARMUP_REQUESTS:
+                requests += await batch()
+            baseline = snapshot()
+            samples.append((0, tracemalloc.get_traced_memory()[0]))
+            deadline = time.monotonic() + args.hours * 3600
+            requests, next_sample = 0, args.sample_every
+            print(
+                f"{'requests':>10}{'req/s':>8}{'traced MiB':>12}{'RSS MiB':>9}"
+                f"{'sessions':>10}{'max identity map':>18}{'checked out':>13}"
+            )
+            window, window_requests = time.monotonic(), 0
+            while True:
+                requests += await batch()
+                if requests < next_sample:
+                    continue
+                next_sample += args.sample_every
+                gc.collect()
+                traced = tracemalloc.get_traced_memory()[0]
+                samples.append((requests, traced))
+                now = time.monotonic()
+                print(
+                    f"{requests:>10}{(requests - window_requests) / (now - window):>8.0f}"
+                    f"{traced / 2**20:>12.2f}{rss_bytes() / 2**20:>9.1f}"
+                    f"{open_sessions():>10}{largest_identity_map:>18}"
+                    f"{checked_out():>13}",
+                    flush=True,
+                )
+                window, window_requests = now, requests
+                leaked = leaked + 1 if open_sessions() or checked_out() else 0
+                if leaked >= LEAK_SAMPLES or now >= deadline:
+                    break
+            print_top_sites(baseline, snapshot())
+            tracemalloc.stop()
+    finally:
+        print(f"\ndeleted {await cleanup(started_at)} users")
+        await dispose_engine()
+
+    growth = slope(samples) * GROWTH_PER / 1024 if len(samples) > 1 else 0.0
+    print(
+        f"retained growth: {growth:+.1f} KiB per {GROWTH_PER} requests "
+        f"(limit {args.max_growth_kb} KiB)"
+    )
+    failures = []
+    if growth > args.max_growth_kb:
+        failures.append("retained memory keeps growing")
+    if leaked >= LEAK_SAMPLES:
+        failures.append("sessions or connections outlived their requests")
+    if len(samples) < 3:
+        failures.append("too few samples to tell, run longer")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return not failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hours", type=float, default=2.0)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--sample-every", type=int, default=5_000, help="requests between samples"
+    )
+    parser.add_argument(
+        "--max-growth-kb",
+        type=float,
+        default=64.0,
+        help=f"retained growth allowed per {GROWTH_PER} requests",
+    )
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
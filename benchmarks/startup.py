@@ -0,0 +1,60 @@
+"""
+Cold start benchmark: imports the app, runs its lifespan startup and serves
+the first request in a fresh interpreter, as a newly scaled worker would
+
+Usage: python -m benchmarks.startup [--runs 10] [--path /test]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+CHILD = """
+import sys, time
+t0 = time.perf_counter()
+import backend.main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+t2 = time.perf_counter()
+with TestClient(backend.main.app) as client:
+    t3 = time.perf_counter()
+    client.get(sys.argv[1])
+    t4 = time.perf_counter()
+print(t1 - t0, t3 - t2, t4 - t3)
+"""
+
+PHASES = ("import", "lifespan startup", "first request")
+
+
+def run_once(path: str) -> list[float]:
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", CHILD, path],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return [float(value) for value in output.split()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--path", default="/test", help="path of the first request")
+    args = parser.parse_args()
+
+    samples = [run_once(args.path) for _ in range(args.runs)]
+    print(f"{'phase':<18}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for index, phase in enumerate(PHASES + ("total",)):
+        if phase == "total":
+            values = [sum(sample) for sample in samples]
+        else:
+            values = [sample[index] for sample in samples]
+        print(
+            f"{phase:<18}{statistics.median(values) * 1000:>12.1f}"
+            f"{min(values) * 1000:>10.1f}{max(values) * 1000:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
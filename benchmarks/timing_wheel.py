@@ -0,0 +1,80 @@
+"""
+Timing wheel benchmark: schedules a million timer deadlines spread over a
+day, cancels and reschedules a share of them as pauses and resumes would,
+then advances through the whole day. Reports the cost per operation, the
+cost per tick and the memory held by the wheel
+
+Usage: python -m benchmarks.timing_wheel [--timers 1000000] [--span 86400]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from backend.scheduler import TimingWheel
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--timers", type=int, default=1_000_000)
+    parser.add_argument("--span", type=int, default=86_400, help="ticks (seconds)")
+    parser.add_argument("--churn", type=float, default=0.1, help="share paused")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    deadlines = [rng.randrange(1, args.span) for _ in range(args.timers)]
+    churned = rng.sample(range(args.timers), int(args.timers * args.churn))
+
+    # memory is measured on a separate wheel, tracing slows every allocation
+    tracemalloc.start()
+    wheel = TimingWheel()
+    for key, deadline in enumerate(deadlines):
+        wheel.schedule(key, deadline)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    wheel = TimingWheel()
+    start = time.perf_counter()
+    for key, deadline in enumerate(deadlines):
+        wheel.schedule(key, deadline)
+    schedule_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for key in churned:
+        wheel.cancel(key)
+    cancel_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for key in churned:
+        wheel.schedule(key, deadlines[key] + rng.randrange(60, 600))
+    reschedule_seconds = time.perf_counter() - start
+
+    fired = 0
+    slowest = 0.0
+    start = time.perf_counter()
+    for tick in range(1, args.span + 600):
+        tick_start = time.perf_counter()
+        fired += len(wheel.advance(tick))
+        slowest = max(slowest, time.perf_counter() - tick_start)
+    advance_seconds = time.perf_counter() - start
+    assert fired == args.timers and len(wheel) == 0
+
+    print(f"{'operation':<14}{'count':>10}{'total ms':>12}{'ns/op':>10}")
+    for name, count, seconds in (
+        ("schedule", args.timers, schedule_seconds),
+        ("cancel", len(churned), cancel_seconds),
+        ("reschedule", len(churned), reschedule_seconds),
+        ("advance tick", args.span + 599, advance_seconds),
+    ):
+        print(
+            f"{name:<14}{count:>10}{seconds * 1000:>12.1f}"
+            f"{seconds / max(count, 1) * 1e9:>10.0f}"
+        )
+    print(f"slowest tick: {slowest * 1000:.2f} ms (includes cascades)")
+    print(
+        f"wheel memory: {memory / 2**20:.1f} MiB ({memory / args.timers:.0f} B/timer)"
+    )
+
+
+if __name__ == "__main__":
+    main()
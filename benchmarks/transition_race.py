@@ -0,0 +1,163 @@
+"""
+Transition race stress test: every timer gets several "tabs" sending pause
+and resume at the same moment, round after round, through the app and the
+real connection pool. Each round's winners and losers are counted, then
+every timer is checked against them: its version moved once per applied
+transition, its pause count matches the applied pauses and its paused flag
+matches the last one. Any lost update or double-applied transition fails
+
+Needs the database from the DB_* environment variables, the users and
+timers it creates are deleted afterwards
+
+Usage: python -m benchmarks.transition_race [--timers 50] [--tabs 4] [--rounds 20]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import delete, select
+
+from backend.db import dispose_engine, get_session_generator
+from backend.ids import uuid7
+from backend.main import app
+from backend.models import StandardTimer, User
+from backend.rate_limit import limiters
+from backend.timezones import registry as timezone_registry
+
+
+async def create_timers(count: int) -> list[tuple[str, int]]:
+    async with get_session_generator()() as db:
+        await timezone_registry.load(db)
+        now = datetime.now(timezone.utc)
+        timers = [
+            StandardTimer(
+                user=User(user_id=uuid7(), timezone="UTC"),
+                minutes=0,
+                hours=23,
+                start_time=now,
+                is_started=True,
+            )
+            for _ in range(count)
+        ]
+        db.add_all(timers)
+        await db.commit()
+        return [(str(timer.user_id), timer.id) for timer in timers]
+
+
+async def delete_timers(timers: list[tuple[str, int]]) -> None:
+    async with get_session_generator()() as db:
+        await db.execute(
+            delete(StandardTimer).where(
+                StandardTimer.id.in_([timer_id for _, timer_id in timers])
+            )
+        )
+        await db.execute(
+            delete(User).where(User.user_id.in_([user_id for user_id, _ in timers]))
+        )
+        await db.commit()
+    await dispose_engine()
+
+
+async def race(
+    client: AsyncClient, user_id: str, timer_id: int, tabs: int, rounds: int
+) -> tuple[Counter[str], Counter[str]]:
+    """
+    :return: status counts, and applied transitions per kind
+    """
+    statuses: Counter[str] = Counter()
+    applied: Counter[str] = Counter()
+    headers = {"X-User-ID": user_id}
+    for _ in range(rounds):
+        # tabs disagree on whether the timer is running
+        kinds = [random.choice(("pause", "resume")) for _ in range(tabs)]
+        responses = await asyncio.gather(
+            *(
+                client.post(f"/api/standard/{kind}/{timer_id}", headers=headers)
+                for kind in kinds
+            )
+        )
+        for kind, response in zip(kinds, responses):
+            statuses[str(response.status_code)] += 1
+            if response.status_code == 200:
+                applied[kind] += 1
+            elif response.status_code == 409:
+                # the conflict carries the state the tab lost to
+                assert response.json()["timer"]["version"] >= 2
+    return statuses, applied
+
+
+async def run(timers_count: int, tabs: int, rounds: int) -> None:
+    for limiter in limiters.values():
+        limiter.capacity = limiter.refill_per_second = float("inf")
+    timers = await create_timers(timers_count)
+    try:
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            results = await asyncio.gather(
+                *(
+                    race(client, user_id, timer_id, tabs, rounds)
+                    for user_id, timer_id in timers
+                )
+            )
+            seconds = time.perf_counter() - start
+
+        statuses: Counter[str] = Counter()
+        async with get_session_generator()() as db:
+            rows = {
+                timer.id: timer
+                for timer in await db.scalars(
+                    select(StandardTimer).where(
+                        StandardTimer.id.in_([timer_id for _, timer_id in timers])
+                    )
+                )
+            }
+        broken = 0
+        for (_, timer_id), (timer_statuses, applied) in zip(timers, results):
+            statuses.update(timer_statuses)
+            timer = rows[timer_id]
+            pauses, resumes = applied["pause"], applied["resume"]
+            if (
+                timer.version != 1 + pauses + resumes
+                or timer.total_pause_count != pauses
+                or timer.is_paused != (pauses > resumes)
+                or pauses - resumes not in (0, 1)
+            ):
+                broken += 1
+        requests = sum(statuses.values())
+        print(
+            f"requests:     {requests} in {seconds:.1f} s ({requests / seconds:.0f}/s)"
+        )
+        print(f"applied:      {statuses['200']}")
+        print(f"conflicts:    {statuses['409']} (409, lost the race)")
+        print(f"invalid:      {statuses['400']} (400, already in that state)")
+        other = {
+            status: count
+            for status, count in statuses.items()
+            if status not in ("200", "409", "400")
+        }
+        if other:
+            print(f"other:        {other}")
+        print(f"inconsistent: {broken} of {len(timers)} timers")
+        if broken or other:
+            raise SystemExit(1)
+    finally:
+        await delete_timers(timers)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--timers", type=int, default=50)
+    parser.add_argument("--tabs", type=int, default=4, help="requests per round")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.timers, args.tabs, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+UUID primary key benchmark: inserts the same number of rows into two
+temporary tables keyed by UUIDv4 and UUIDv7, then reports insert throughput
+and the size of each primary key index. Random v4 keys split pages all over
+the index and leave them half full, v7 keys append at its right edge
+
+Needs the database from the DB_* environment variables, tables are temporary
+
+Usage: python -m benchmarks.uuid_keys [--rows 500000] [--batch 1000]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from backend.db import dispose_engine, get_engine
+from backend.ids import uuid7
+
+
+async def insert_rows(
+    conn: AsyncConnection,
+    table: str,
+    generate: Callable[[], uuid.UUID],
+    rows: int,
+    batch: int,
+) -> tuple[float, float]:
+    """
+    :return: rows per second overall and over the last tenth of the rows
+    """
+    await conn.execute(
+        text(
+            f"CREATE TEMPORARY TABLE {table} "
+            "(id uuid PRIMARY KEY, created_at timestamptz NOT NULL DEFAULT now())"
+        )
+    )
+    statement = text(f"INSERT INTO {table} (id) SELECT unnest(CAST(:ids AS uuid[]))")
+    batches = [[generate() for _ in range(batch)] for _ in range(rows // batch)]
+    tail_start = len(batches) - max(1, len(batches) // 10)
+    start = tail = time.perf_counter()
+    for index, ids in enumerate(batches):
+        if index == tail_start:
+            tail = time.perf_counter()
+        await conn.execute(statement, {"ids": ids})
+    end = time.perf_counter()
+    tail_rows = (len(batches) - tail_start) * batch
+    return len(batches) * batch / (end - start), tail_rows / (end - tail)
+
+
+async def run(rows: int, batch: int) -> None:
+    async with get_engine().connect() as conn:
+        results = {}
+        for table, generate in (
+            ("bench_uuid_v4", uuid.uuid4),
+            ("bench_uuid_v7", uuid7),
+        ):
+            throughput, tail = await insert_rows(conn, table, generate, rows, batch)
+            size = await conn.scalar(text(f"SELECT pg_relation_size('{table}_pkey')"))
+            results[table] = (throughput, tail, size)
+        await conn.rollback()
+    print(f"{'keys':<16}{'rows/s':>12}{'last 10% rows/s':>18}{'index MiB':>12}")
+    for table, (throughput, tail, size) in results.items():
+        print(f"{table:<16}{throughput:>12.0f}{tail:>18.0f}{size / 2**20:>12.1f}")
+    await dispose_engine()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.batch))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Webhook throughput benchmark: sends 10k deliveries through the dispatcher's
+shared HTTP client to a local receiver that answers after a fixed latency,
+at several concurrency limits. Measures the send path only, queue reads and
+writes are a few indexed statements per batch
+
+Usage: python -m benchmarks.webhooks [--deliveries 10000] [--latency-ms 20]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from backend.webhooks import services
+from backend.webhooks.services import WebhookDispatcher
+
+
+class Receiver:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while await reader.readline():
+                length = 0
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+                await asyncio.sleep(self.latency)
+                writer.write(b"HTTP/1.1 204 No Content\r\n\r\n")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def serve(latency: float, ports: multiprocessing.Queue) -> None:
+    # runs in its own process so the receiver doesn't compete with the sender
+    async def run_server() -> None:
+        receiver = Receiver(latency)
+        server = await asyncio.start_server(receiver.handle, "127.0.0.1", 0)
+        ports.put(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    asyncio.run(run_server())
+
+
+async def run(deliveries: int, latency: float, concurrencies: list[int]) -> None:
+    ports: multiprocessing.Queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=(latency, ports), daemon=True)
+    process.start()
+    port = ports.get()
+    now = datetime.now(timezone.utc)
+    rows = [
+        SimpleNamespace(
+            id=index,
+            event=services.EVENT_TIMER_COMPLETED,
+            payload={"timer_id": str(index), "completed_by": "deadline"},
+            created_at=now,
+            url=f"http://127.0.0.1:{port}/hook",
+            secret="benchmark",
+        )
+        for index in range(deliveries)
+    ]
+    print(f"{'concurrency':<13}{'deliveries/s':>14}{'total s':>10}")
+    for concurrency in concurrencies:
+        dispatcher = WebhookDispatcher(concurrency=concurrency)
+        start = time.perf_counter()
+        for offset in range(0, deliveries, dispatcher.batch_size):
+            errors = await dispatcher.send_all(
+                rows[offset : offset + dispatcher.batch_size]  # type: ignore[arg-type]
+            )
+            assert not any(errors), errors
+        elapsed = time.perf_counter() - start
+        print(f"{concurrency:<13}{deliveries / elapsed:>14.0f}{elapsed:>10.2f}")
+        await services.close_client()
+    process.terminate()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--deliveries", type=int, default=10_000)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[10, 50, services.MAX_CONNECTIONS]
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.deliveries, args.latency_ms / 1000, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
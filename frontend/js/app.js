@@ -20,6 +20,7 @@ async function main() {
     }
     const user_uuid = localStorage.getItem("user_uuid");
     // user has a valid uuid by this point
+    await utils.syncClock();
     utils.setPage(userTimezone);
     utils.showNotificationDynamic("All set! Let's start your first timer.", 3);
     // TODO: Set up the event handling for card timers, start with the standard timer.
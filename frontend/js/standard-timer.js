@@ -229,7 +229,7 @@ export class StandardTimer {
      * Updates the timer display and remaining time display
      */
     async update() {
-        const now = new Date();
+        const now = utils.serverNow();
         this.elapsedSeconds = Math.floor((now - this.startTime - this.totalPausedMs) / 1000);
         this.timerDisplay.textContent = utils.formatDuration(this.elapsedSeconds);
         this.remainingTimeDisplay.textContent = utils.formatRemainingTime(this.elapsedSeconds, this.maxSeconds);
@@ -9,7 +9,7 @@ const BASE_URL = "http://127.0.0.1:8000";
  * @type {Readonly<{BASE_URL: string, USER: string, TEST: {ROOT: string}}>}
  */
 export const ENDPOINTS = Object.freeze({
-    BASE_URL, USER: `${BASE_URL}/users`, STANDARD_TIMER: {
+    BASE_URL, USER: `${BASE_URL}/users`, TIME: `${BASE_URL}/time`, STANDARD_TIMER: {
         ROOT: `${BASE_URL}/api/standard`,
         START: `${BASE_URL}/api/standard/start`,
         PAUSE: `${BASE_URL}/api/standard/pause`,
@@ -35,6 +35,45 @@ export function getUserIANAString() {
     }
 }
 
+// Milliseconds to add to the browser clock to get the server clock
+let serverOffsetMs = 0;
+
+/**
+ * Estimates the offset between the browser and server clocks.
+ * Takes several samples of the `/time` endpoint and keeps the one with the
+ * shortest round trip, as it has the smallest error bound.
+ * @param {number} samples - Number of requests to send
+ * @returns {Promise<number>} - Estimated offset in milliseconds
+ */
+export async function syncClock(samples = 5) {
+    let bestRoundTrip = Infinity;
+    for (let i = 0; i < samples; i++) {
+        try {
+            const sent = performance.now();
+            const sentAt = Date.now();
+            const response = await fetch(ENDPOINTS.TIME, {cache: "no-store"});
+            const received = performance.now();
+            const data = await response.json();
+            const roundTrip = received - sent;
+            if (response.ok && roundTrip < bestRoundTrip) {
+                bestRoundTrip = roundTrip;
+                serverOffsetMs = data.epoch_ms - (sentAt + roundTrip / 2);
+            }
+        } catch (err) {
+            console.log(`Error syncing clock: ${err}`);
+        }
+    }
+    return serverOffsetMs;
+}
+
+/**
+ * Gets the current time according to the server clock
+ * @returns {Date} - Browser time corrected by the last `syncClock` estimate
+ */
+export function serverNow() {
+    return new Date(Date.now() + serverOffsetMs);
+}
+
 /**
  * Enables all timer preset card buttons
  */
@@ -111,7 +150,7 @@ export function setPage(IANATimezone) {
     let currentTimeDisplay = document.getElementById("current-time-display");
 
     function updatePageTime() {
-        const now = new Date();
+        const now = serverNow();
         currentTimeDisplay.textContent = formatClockTime(now, IANATimezone);
     }
 
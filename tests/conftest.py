@@ -1,3 +1,4 @@
+import functools
 import os
 import uuid
 from typing import AsyncGenerator
@@ -5,12 +6,27 @@ from typing import AsyncGenerator
 import pytest_asyncio
 from dotenv import load_dotenv
 from httpx import ASGITransport, AsyncClient
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.pool import NullPool
 
-from backend.db import Base, get_db
+from backend.db import Base, get_db, get_new_user_db
+from backend.etag import versions
+from backend.idempotency import response_cache
+from backend.load_shedding import shedder
 from backend.main import app
-from backend.models import User
+from backend.models import Timezone, User
+from backend.rate_limit import limiters
+from backend.repository import MemoryRepository, Repository, get_repository
+from backend.standard_timer.services import scheduler
+from backend.timezones import iana_rows
+from backend.timezones import registry as timezone_registry
+from backend.usage import recorder as usage_recorder
 
 # Load test environment variables
 load_dotenv()
@@ -21,21 +37,29 @@ TEST_DATABASE_URL = (
     f"@{os.getenv('DB_TEST_HOST')}:{os.getenv('DB_TEST_PORT')}/{os.getenv('DB_TEST_NAME')}"
 )
 
-# Use NullPool to avoid connection reuse across concurrent async tests
-engine = create_async_engine(
-    TEST_DATABASE_URL, future=True, echo=False, poolclass=NullPool
-)
-AsyncTestingSessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+AsyncTestingSessionLocal = async_sessionmaker(expire_on_commit=False)
+
+
+@functools.cache
+def get_test_engine() -> AsyncEngine:
+    """
+    Creates the test engine on first use so tests that only use in-memory
+    storage can run without database settings.
+    """
+    # Use NullPool to avoid connection reuse across concurrent async tests
+    return create_async_engine(
+        TEST_DATABASE_URL, future=True, echo=False, poolclass=NullPool
+    )
 
 
 # 1. Transactional DB session fixture
 @pytest_asyncio.fixture
-async def db_session() -> AsyncGenerator[AsyncSession, None]:
+async def db_session(setup_test_db: None) -> AsyncGenerator[AsyncSession, None]:
     """
     Provides a database session wrapped in a transaction.
     Transaction is rolled back after each test for full isolation.
     """
-    async with engine.connect() as connection:
+    async with get_test_engine().connect() as connection:
         async with connection.begin() as transaction:
             # Bind a session to this connection
             session = AsyncTestingSessionLocal(bind=connection, expire_on_commit=False)
@@ -63,21 +87,31 @@ async def async_client(override_get_db) -> AsyncGenerator[AsyncClient, None]:
     Injects the transactional DB session into the app.
     """
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_new_user_db] = override_get_db
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as client:
         yield client
     # Clean up dependency override after the test
     app.dependency_overrides.pop(get_db)
+    app.dependency_overrides.pop(get_new_user_db)
 
 
 # 4. Setup and teardown test database (session-scoped)
-@pytest_asyncio.fixture(scope="session", autouse=True)
+@pytest_asyncio.fixture(scope="session")
 async def setup_test_db():
     """
-    Creates all tables before tests run and drops them after tests finish.
+    Creates all tables before the first database test and drops them after
+    tests finish.
     """
+    engine = get_test_engine()
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # seeded as the migration does
+        rows = iana_rows()
+        await conn.execute(
+            insert(Timezone), [{"id": id, "name": name} for id, name in rows]
+        )
+    timezone_registry.load_rows(rows)
     yield
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
@@ -90,3 +124,56 @@ async def create_user_in_db(db_session: AsyncSession) -> User:
     await db_session.commit()
     await db_session.refresh(user)
     return user
+
+
+class FakeClock:
+    """
+    Clock the tests move by hand, for the classes that take a `clock`
+    """
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest_asyncio.fixture
+def fake_clock() -> FakeClock:
+    return FakeClock()
+
+
+# 5. In-memory storage fixtures, no database required
+@pytest_asyncio.fixture
+def memory_repository() -> MemoryRepository:
+    return MemoryRepository()
+
+
+@pytest_asyncio.fixture
+async def memory_client(
+    memory_repository: MemoryRepository,
+) -> AsyncGenerator[AsyncClient, None]:
+    """
+    Provides an AsyncClient whose handlers read from in-memory storage.
+    """
+
+    async def _override_get_repository() -> Repository:
+        return memory_repository
+
+    app.dependency_overrides[get_repository] = _override_get_repository
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.pop(get_repository)
+
+
+@pytest_asyncio.fixture(autouse=True)
+def reset_in_memory_state() -> None:
+    """Empties in-process caches and limiters so state never leaks between tests."""
+    for limiter in limiters.values():
+        limiter.buckets.clear()
+    response_cache.entries.clear()
+    versions.entries.clear()
+    scheduler.wheel.clear()
+    usage_recorder.clear()
+    shedder.reset()
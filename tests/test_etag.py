@@ -0,0 +1,127 @@
+"""
+Testing file for ETag / If-None-Match conditional reads
+"""
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.etag import matches, standard_timer_key, user_key, versions
+from backend.models import StandardTimer, User
+
+
+def test_matches_weak_comparison() -> None:
+    assert matches('W/"abc"', 'W/"abc"')
+    assert matches('"abc"', 'W/"abc"')
+    assert matches('W/"xyz", W/"abc"', 'W/"abc"')
+    assert matches("*", 'W/"abc"')
+    assert not matches('W/"xyz"', 'W/"abc"')
+    assert not matches(None, 'W/"abc"')
+
+
+@pytest.mark.asyncio
+async def test_get_user_not_modified(
+    async_client: AsyncClient, create_user_in_db: User
+) -> None:
+    """
+    Tests that revalidating an unchanged user returns 304 without a body.
+    :param async_client: Async client for testing.
+    :param create_user_in_db: Created User object saved to database
+    """
+    first = await async_client.get(f"/users/{create_user_in_db.user_id}")
+    tag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert tag.startswith("W/")
+
+    second = await async_client.get(
+        f"/users/{create_user_in_db.user_id}", headers={"If-None-Match": tag}
+    )
+    assert second.status_code == 304
+    assert second.headers["ETag"] == tag
+    assert second.content == b""
+
+
+@pytest.mark.asyncio
+async def test_get_user_answered_from_version_map(
+    async_client: AsyncClient, create_user_in_db: User
+) -> None:
+    """
+    Tests that a known version answers 304 before the user is loaded.
+    :param async_client: Async client for testing.
+    :param create_user_in_db: Created User object saved to database
+    """
+    versions.set(user_key(create_user_in_db.user_id), 'W/"cached"')
+    response = await async_client.get(
+        f"/users/{create_user_in_db.user_id}", headers={"If-None-Match": 'W/"cached"'}
+    )
+    assert response.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_get_user_stale_etag(
+    async_client: AsyncClient, create_user_in_db: User
+) -> None:
+    """
+    Tests that an outdated ETag returns the full body.
+    :param async_client: Async client for testing.
+    :param create_user_in_db: Created User object saved to database
+    """
+    response = await async_client.get(
+        f"/users/{create_user_in_db.user_id}", headers={"If-None-Match": 'W/"stale"'}
+    )
+    assert response.status_code == 200
+    assert response.json()["timezone"] == create_user_in_db.timezone
+
+
+@pytest.mark.asyncio
+async def test_get_standard_timer_not_modified(
+    async_client: AsyncClient, db_session: AsyncSession, create_user_in_db: User
+) -> None:
+    """
+    Tests timer reads return an ETag, honour it, and drop it once the timer changes.
+    :param async_client: Async client for testing.
+    :param db_session: Async db connection for testing.
+    :param create_user_in_db: Created User object saved to database
+    """
+    headers = {"X-User-ID": str(create_user_in_db.user_id)}
+    created = await async_client.post(
+        "/api/standard", json={"minutes": 20, "hours": 0}, headers=headers
+    )
+    timer_id = created.json()["timer_id"]
+
+    first = await async_client.get(f"/api/standard/{timer_id}", headers=headers)
+    assert first.status_code == 200
+    assert first.json()["is_started"] is False
+    tag = first.headers["ETag"]
+
+    second = await async_client.get(
+        f"/api/standard/{timer_id}", headers={**headers, "If-None-Match": tag}
+    )
+    assert second.status_code == 304
+
+    timer = await db_session.get(StandardTimer, int(timer_id))
+    assert timer is not None
+    timer.is_started = True
+    await db_session.commit()
+    assert versions.get(standard_timer_key(timer.user_id, timer.id)) is None
+
+
+@pytest.mark.asyncio
+async def test_get_standard_timer_other_user(
+    async_client: AsyncClient, create_user_in_db: User
+) -> None:
+    """
+    Tests that a timer can't be read by a different user.
+    :param async_client: Async client for testing.
+    :param create_user_in_db: Created User object saved to database
+    """
+    created = await async_client.post(
+        "/api/standard",
+        json={"minutes": 20, "hours": 0},
+        headers={"X-User-ID": str(create_user_in_db.user_id)},
+    )
+    response = await async_client.get(
+        f"/api/standard/{created.json()['timer_id']}",
+        headers={"X-User-ID": "00000000-0000-4000-8000-000000000000"},
+    )
+    assert response.status_code == 404
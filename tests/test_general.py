@@ -3,6 +3,7 @@ General Tests for this web application
 """
 
 import uuid
+from datetime import datetime, timezone
 
 import pytest
 from fastapi.testclient import TestClient
@@ -12,7 +13,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.main import app
 from backend.models import User
-from backend.schemas import CreateUserOut, GetUserOut
+from backend.schemas import CreateUserOut, GetUserOut, ServerTimeOut
 
 sync_client = TestClient(app)
 
@@ -60,6 +61,7 @@ async def test_create_user_valid_timezone(
     returned_data = CreateUserOut.model_validate(response.json())
     assert response.status_code == 200
     assert returned_data.user_id is not None
+    assert returned_data.user_id.version == 7
     assert returned_data.timezone == valid_timezone
 
     # Database verification
@@ -125,3 +127,21 @@ async def test_get_user_valid_uuid_valid_user(
     assert get_user_response.status_code == 200
     assert returned_user.user_id == created_user.user_id
     assert returned_user.timezone == valid_timezone
+
+
+@pytest.mark.asyncio
+async def test_get_server_time(async_client: AsyncClient) -> None:
+    """
+    Tests the clock-sync endpoint returns the current server time.
+    :param async_client: Async client for testing.
+    """
+    before = datetime.now(timezone.utc)
+    response: Response = await async_client.get("/time")
+    after = datetime.now(timezone.utc)
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-store"
+    returned_data = ServerTimeOut.model_validate(response.json())
+    server_time = datetime.fromisoformat(returned_data.server_time)
+    assert before <= server_time <= after
+    assert abs(server_time.timestamp() * 1000 - returned_data.epoch_ms) < 1
@@ -0,0 +1,162 @@
+"""
+Testing file for the `idempotency` module
+"""
+
+import uuid
+
+import pytest
+from conftest import FakeClock
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.idempotency import ResponseCache, response_cache
+from backend.main import app
+from backend.models import StandardTimer, User
+
+
+class TestResponseCache:
+    """
+    Tests the LRU and TTL behaviour of the response cache.
+    """
+
+    def test_entries_expire(self, fake_clock: FakeClock) -> None:
+        cache = ResponseCache(max_entries=10, ttl_seconds=60, clock=fake_clock)
+        cache.set("key", "hash", 200, {"ok": True}, ttl=60)
+        assert cache.get("key") is not None
+        fake_clock.now = 60.0
+        assert cache.get("key") is None
+        assert "key" not in cache.entries
+
+    def test_ttl_is_capped(self, fake_clock: FakeClock) -> None:
+        cache = ResponseCache(max_entries=10, ttl_seconds=5, clock=fake_clock)
+        cache.set("key", "hash", 200, {}, ttl=3600)
+        fake_clock.now = 5.0
+        assert cache.get("key") is None
+
+    def test_evicts_least_recently_used(self, fake_clock: FakeClock) -> None:
+        cache = ResponseCache(max_entries=2, ttl_seconds=60, clock=fake_clock)
+        cache.set("a", "hash", 200, {}, ttl=60)
+        cache.set("b", "hash", 200, {}, ttl=60)
+        cache.get("a")  # "b" is now the least recently used
+        cache.set("c", "hash", 200, {}, ttl=60)
+        assert list(cache.entries) == ["a", "c"]
+
+
+@pytest.mark.asyncio
+async def test_create_user_retry_is_replayed(
+    async_client: AsyncClient, db_session: AsyncSession
+) -> None:
+    """
+    Tests that retrying POST /users with the same key creates a single user.
+    :param async_client: Async client for testing.
+    :param db_session: Async db connection for testing.
+    """
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    payload = {"timezone": "America/New_York"}
+    first = await async_client.post("/users", json=payload, headers=headers)
+    second = await async_client.post("/users", json=payload, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+
+    count = await db_session.scalar(
+        select(func.count())
+        .select_from(User)
+        .where(User.user_id == first.json()["user_id"])
+    )
+    assert count == 1
+
+
+@pytest.mark.asyncio
+async def test_first_response_is_cached(
+    async_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Tests that the response is cached when the first request commits, so the
+    first retry doesn't read the database.
+    :param async_client: Async client for testing.
+    :param monkeypatch: Fails any database read of a stored response.
+    """
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    payload = {"timezone": "America/New_York"}
+    first = await async_client.post("/users", json=payload, headers=headers)
+    assert len(response_cache.entries) == 1
+
+    async def no_database(*args, **kwargs) -> None:
+        raise AssertionError("read the stored response from the database")
+
+    monkeypatch.setattr(AsyncSession, "get", no_database)
+    second = await async_client.post("/users", json=payload, headers=headers)
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+
+
+@pytest.mark.asyncio
+async def test_retry_from_another_address_is_replayed(
+    async_client: AsyncClient, db_session: AsyncSession
+) -> None:
+    """
+    Tests that a retry from a new client address, e.g. after switching from
+    Wi-Fi to cellular, still finds the stored response.
+    :param async_client: Async client for testing.
+    :param db_session: Async db connection for testing.
+    """
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    payload = {"timezone": "America/New_York"}
+    first = await async_client.post("/users", json=payload, headers=headers)
+    # the stored response, not the cached one
+    response_cache.entries.clear()
+    transport = ASGITransport(app=app, client=("203.0.113.7", 40000))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        second = await client.post("/users", json=payload, headers=headers)
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+
+
+@pytest.mark.asyncio
+async def test_create_user_key_reused_with_different_body(
+    async_client: AsyncClient,
+) -> None:
+    """
+    Tests that a key can't be replayed for a different request body.
+    :param async_client: Async client for testing.
+    """
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    await async_client.post(
+        "/users", json={"timezone": "America/New_York"}, headers=headers
+    )
+    response = await async_client.post(
+        "/users", json={"timezone": "Europe/London"}, headers=headers
+    )
+    assert response.status_code == 422
+    assert response.json()["message"] is not None
+
+
+@pytest.mark.asyncio
+async def test_create_standard_timer_retry_is_replayed(
+    async_client: AsyncClient, db_session: AsyncSession, create_user_in_db: User
+) -> None:
+    """
+    Tests that retrying POST /standard with the same key creates a single timer.
+    :param async_client: Async client for testing.
+    :param db_session: Async db connection for testing.
+    :param create_user_in_db: Created User object saved to database
+    """
+    headers = {
+        "X-User-ID": str(create_user_in_db.user_id),
+        "Idempotency-Key": str(uuid.uuid4()),
+    }
+    payload = {"minutes": 20, "hours": 1}
+    first = await async_client.post("/api/standard", json=payload, headers=headers)
+    second = await async_client.post("/api/standard", json=payload, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert first.json()["timer_id"] == second.json()["timer_id"]
+
+    count = await db_session.scalar(
+        select(func.count())
+        .select_from(StandardTimer)
+        .where(StandardTimer.user_id == create_user_in_db.user_id)
+    )
+    assert count == 1
@@ -0,0 +1,49 @@
+"""
+Testing file for the `ids` module
+"""
+
+import time
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.ids import uuid7
+from backend.main import is_valid_uuid
+
+
+def test_uuid7_layout() -> None:
+    before = time.time_ns() // 1_000_000
+    generated = uuid7()
+    after = time.time_ns() // 1_000_000
+    assert generated.version == 7
+    assert generated.variant == uuid.RFC_4122
+    assert before <= generated.int >> 80 <= after
+
+
+def test_uuid7_is_ordered_and_unique() -> None:
+    # many IDs per millisecond exercise the counter
+    generated = [uuid7() for _ in range(20000)]
+    assert generated == sorted(generated)
+    assert len(set(generated)) == len(generated)
+
+
+def test_is_valid_uuid_accepts_v4_and_v7() -> None:
+    assert is_valid_uuid(str(uuid.uuid4()))
+    assert is_valid_uuid(str(uuid7()))
+    assert not is_valid_uuid(str(uuid.uuid1()))
+    assert not is_valid_uuid("12345-invalid-uuid-67890")
+
+
+@pytest.mark.asyncio
+async def test_database_default_is_uuid7(db_session: AsyncSession) -> None:
+    """
+    Tests the server default used for users inserted outside the app
+    :param db_session: Async database session for testing
+    """
+    user_id = await db_session.scalar(
+        text("INSERT INTO users (timezone_id) VALUES (1) RETURNING user_id")
+    )
+    assert user_id.version == 7
+    assert abs((user_id.int >> 80) - time.time_ns() // 1_000_000) < 60_000
@@ -0,0 +1,130 @@
+"""
+Testing file for the `load_shedding` module
+"""
+
+import asyncio
+
+import pytest
+from conftest import FakeClock
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from backend.db import TimedQueuePool
+from backend.load_shedding import LoadShedder, shedder
+from backend.models import User
+
+
+class TestLoadShedder:
+    """
+    Tests the overload thresholds.
+    """
+
+    def test_pool_wait_average_decays(self, fake_clock: FakeClock) -> None:
+        tracker = LoadShedder(max_pool_wait=0.05, clock=fake_clock)
+        for _ in range(20):
+            tracker.record_pool_wait(0.2)
+        assert tracker.pool_wait() == pytest.approx(0.2, rel=0.05)
+        assert tracker.is_overloaded()
+        assert tracker.retry_after() == 2
+        # nothing checked out for two half-lives
+        fake_clock.now += 2
+        assert tracker.pool_wait() == pytest.approx(0.05, rel=0.05)
+        fake_clock.now += 1
+        assert not tracker.is_overloaded()
+        assert tracker.retry_after() == 1
+
+    def test_in_flight_limit(self) -> None:
+        tracker = LoadShedder(max_in_flight=2)
+        tracker.in_flight = 2
+        assert not tracker.is_overloaded()
+        tracker.in_flight = 3
+        assert tracker.is_overloaded()
+
+
+@pytest.mark.asyncio
+async def test_pool_reports_checkout_wait(
+    db_session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Tests that waiting for a pooled connection is recorded
+    :param db_session: Async database session for testing, provides the URL
+    :param monkeypatch: Swaps in a fresh shedder
+    """
+    tracker = LoadShedder()
+    monkeypatch.setattr("backend.db.shedder", tracker)
+    engine = create_async_engine(
+        db_session.bind.engine.url,
+        poolclass=TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+    )
+    try:
+        async with engine.connect() as first:
+            await first.execute(text("SELECT 1"))
+            waited_before = tracker.pool_wait()
+
+            async def second_checkout() -> None:
+                async with engine.connect() as second:
+                    await second.execute(text("SELECT 1"))
+
+            waiting = asyncio.create_task(second_checkout())
+            await asyncio.sleep(0.3)
+        await waiting
+    finally:
+        await engine.dispose()
+    assert waited_before < 0.05
+    assert tracker.pool_wait() > 0.05
+
+
+@pytest.mark.asyncio
+async def test_ready(
+    async_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Tests the readiness endpoint
+    :param async_client: Async client for testing
+    :param monkeypatch: Lowers the in-flight limit
+    """
+    response = await async_client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+    # counts itself
+    assert response.json()["in_flight"] == 1
+
+    monkeypatch.setattr(shedder, "max_in_flight", 0)
+    response = await async_client.get("/ready")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_sheds_non_critical_routes(
+    async_client: AsyncClient,
+    create_user_in_db: User,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Tests that reads are shed while timer transitions are still served
+    :param async_client: Async client for testing
+    :param create_user_in_db: Created User object saved to database
+    :param monkeypatch: Lowers the in-flight limit
+    """
+    headers = {"X-User-ID": str(create_user_in_db.user_id)}
+    response = await async_client.post(
+        "/api/standard", json={"minutes": 5, "hours": 0}, headers=headers
+    )
+    timer_id = response.json()["timer_id"]
+
+    monkeypatch.setattr(shedder, "max_in_flight", 0)
+    response = await async_client.get(f"/users/{create_user_in_db.user_id}")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    response = await async_client.get(f"/api/standard/{timer_id}", headers=headers)
+    assert response.status_code == 503
+
+    response = await async_client.post(
+        f"/api/standard/start/{timer_id}", headers=headers
+    )
+    assert response.status_code == 200
+    assert shedder.counters["shed"] == 2
@@ -0,0 +1,160 @@
+"""
+Testing file for the `logging` module
+"""
+
+import gzip
+import logging
+import queue
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from backend.logging import (
+    CompressingRotatingFileHandler,
+    RequestIdFilter,
+    RequestIdMiddleware,
+    SamplingFilter,
+    SamplingQueueHandler,
+    request_id,
+)
+
+
+def build_app() -> FastAPI:
+    app = FastAPI(root_path="/api")
+
+    @app.get("/standard/ping")
+    async def ping() -> dict[str, str | None]:
+        logging.getLogger("standard").info("inside the request")
+        return {"request_id": request_id.get()}
+
+    app.add_middleware(RequestIdMiddleware)
+    return app
+
+
+def make_record(level: int = logging.INFO, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("standard", level, __file__, 1, "message", None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+@pytest.mark.asyncio
+async def test_request_id_is_propagated(caplog: pytest.LogCaptureFixture) -> None:
+    transport = ASGITransport(app=build_app())
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        with caplog.at_level(logging.INFO, logger="standard"):
+            response = await client.get(
+                "/api/standard/ping", headers={"X-Request-ID": "abc-123"}
+            )
+    assert response.json() == {"request_id": "abc-123"}
+    assert response.headers["X-Request-ID"] == "abc-123"
+    # the handler's line and the access line
+    assert [record.getMessage() for record in caplog.records] == [
+        "inside the request",
+        "GET /api/standard/ping 200",
+    ]
+    assert caplog.records[1].duration_ms >= 0
+    assert request_id.get() is None
+
+
+@pytest.mark.asyncio
+async def test_request_id_is_generated() -> None:
+    transport = ASGITransport(app=build_app())
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        first = await client.get("/api/standard/ping")
+        # unsafe header values are replaced
+        second = await client.get(
+            "/api/standard/ping", headers={"X-Request-ID": "bad id\t"}
+        )
+    assert len(first.headers["X-Request-ID"]) == 32
+    assert second.headers["X-Request-ID"] not in (
+        "bad id\t",
+        first.headers["X-Request-ID"],
+    )
+
+
+def test_request_id_filter() -> None:
+    record = make_record()
+    token = request_id.set("abc-123")
+    try:
+        assert RequestIdFilter().filter(record)
+    finally:
+        request_id.reset(token)
+    assert record.request_id == "abc-123"
+
+
+def test_sampling_keeps_errors_and_slow_requests() -> None:
+    dropping = SamplingFilter(rate=0.0, slow_ms=500)
+    assert not dropping.filter(make_record(request_id="a"))
+    assert dropping.filter(make_record(logging.WARNING, request_id="a"))
+    assert dropping.filter(make_record(logging.ERROR, request_id="a"))
+    assert dropping.filter(make_record(request_id="a", duration_ms=750.0))
+
+    # the decision is the same for every line of a request
+    half = SamplingFilter(rate=0.5)
+    ids = [f"request-{n}" for n in range(1000)]
+    kept = [i for i in ids if half.filter(make_record(request_id=i))]
+    assert 400 < len(kept) < 600
+    assert kept == [i for i in ids if half.filter(make_record(request_id=i))]
+
+
+def test_sampling_keeps_the_rest_of_a_failing_request() -> None:
+    records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    handler = SamplingQueueHandler(records, SamplingFilter(rate=0.0, slow_ms=500))
+    lines = [
+        make_record(request_id="failing", msg="before"),
+        make_record(request_id="fast", msg="dropped"),
+        make_record(logging.ERROR, request_id="failing", msg="error"),
+        make_record(request_id="failing", msg="after"),
+        make_record(request_id="slow", msg="slow line"),
+        make_record(request_id="fast", msg="fast access", duration_ms=10.0),
+        make_record(request_id="failing", msg="failing access", duration_ms=10.0),
+        make_record(request_id="slow", msg="slow access", duration_ms=750.0),
+    ]
+    for record in lines:
+        handler.handle(record)
+    emitted = []
+    while not records.empty():
+        emitted.append(records.get().getMessage())
+    assert emitted == [
+        "before",
+        "error",
+        "after",
+        "failing access",
+        "slow line",
+        "slow access",
+    ]
+    # nothing is held once the requests end
+    assert not handler.held and not handler.kept
+
+
+def test_held_lines_are_bounded() -> None:
+    records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    handler = SamplingQueueHandler(
+        records, SamplingFilter(rate=0.0), max_requests=2, max_lines=3
+    )
+    for n in range(5):
+        handler.handle(make_record(request_id="chatty", msg=f"line {n}"))
+    assert len(handler.held["chatty"]) == 3
+    for name in ("second", "third"):
+        handler.handle(make_record(request_id=name))
+    assert list(handler.held) == ["second", "third"]
+
+
+def test_rotated_files_are_compressed(tmp_path: Path) -> None:
+    handler = CompressingRotatingFileHandler(
+        tmp_path / "standard.log", maxBytes=100, backupCount=2
+    )
+    try:
+        for n in range(10):
+            handler.emit(make_record(msg=f"line {n} " + "x" * 40))
+    finally:
+        handler.close()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "standard.log",
+        "standard.log.1.gz",
+        "standard.log.2.gz",
+    ]
+    with gzip.open(tmp_path / "standard.log.1.gz", "rt") as file:
+        assert file.read().startswith("line 6")
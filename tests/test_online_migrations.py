@@ -0,0 +1,146 @@
+"""
+Testing file for the `online_migrations` module
+"""
+
+import os
+from typing import Iterator
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import Connection, create_engine, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from backend import online_migrations
+from backend.online_migrations import (
+    PROGRESS_TABLE,
+    add_not_null,
+    backfill,
+    create_index_concurrently,
+    run_guarded,
+)
+
+# the helpers run in migrations, through the sync driver
+SYNC_TEST_DATABASE_URL = (
+    f"postgresql+psycopg2://{os.getenv('DB_TEST_USER')}:{os.getenv('DB_TEST_PASSWORD')}"
+    f"@{os.getenv('DB_TEST_HOST')}:{os.getenv('DB_TEST_PORT')}/{os.getenv('DB_TEST_NAME')}"
+)
+
+
+@pytest.fixture
+def migration() -> Iterator[Connection]:
+    """
+    Runs the test inside a migration's autocommit block, dropping the tables
+    it creates afterwards
+    """
+    engine = create_engine(SYNC_TEST_DATABASE_URL)
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection)
+        with Operations.context(context), context.autocommit_block():
+            yield context.connection  # type: ignore[misc]
+            for table in ("online_demo", "online_demo_parted", PROGRESS_TABLE):
+                context.connection.execute(text(f"DROP TABLE IF EXISTS {table}"))  # type: ignore[union-attr]
+    engine.dispose()
+
+
+def test_backfill_resumes(migration: Connection) -> None:
+    migration.execute(
+        text(
+            "CREATE TABLE online_demo AS "
+            "SELECT n AS id, n AS a, NULL::integer AS b FROM generate_series(1, 1000) n"
+        )
+    )
+    migration.execute(text("ALTER TABLE online_demo ADD PRIMARY KEY (id)"))
+    # the new app version already wrote some rows
+    migration.execute(text("UPDATE online_demo SET b = a * 2 WHERE id % 3 = 0"))
+    # a previous run committed the batches up to id 400, then stopped
+    migration.execute(text("UPDATE online_demo SET b = a * 2 WHERE id <= 400"))
+    run_guarded(
+        f"CREATE TABLE {PROGRESS_TABLE} (name text PRIMARY KEY, last_key bigint "
+        "NOT NULL, rows_updated bigint NOT NULL, updated_at timestamptz NOT NULL "
+        "DEFAULT now())"
+    )
+    migration.execute(
+        text(f"INSERT INTO {PROGRESS_TABLE} VALUES ('demo', 400, 267, now())")
+    )
+
+    updated = backfill(
+        "online_demo", "b = a * 2", "b IS NULL", name="demo", batch_size=64, throttle=0
+    )
+    assert updated == 400  # ids 401 to 1000 not divisible by 3
+    assert not migration.scalar(
+        text("SELECT count(*) FROM online_demo WHERE b IS DISTINCT FROM a * 2")
+    )
+    # done, a later run starts from the beginning
+    assert not migration.scalar(text(f"SELECT count(*) FROM {PROGRESS_TABLE}"))
+
+
+def test_partitioned_index_and_not_null(migration: Connection) -> None:
+    migration.execute(
+        text(
+            "CREATE TABLE online_demo_parted (id integer, a integer) "
+            "PARTITION BY RANGE (id)"
+        )
+    )
+    for n, (low, high) in enumerate(((0, 100), (100, 200))):
+        migration.execute(
+            text(
+                f"CREATE TABLE online_demo_parted_p{n} PARTITION OF "
+                f"online_demo_parted FOR VALUES FROM ({low}) TO ({high})"
+            )
+        )
+    migration.execute(
+        text(
+            "INSERT INTO online_demo_parted SELECT n, n FROM generate_series(0, 199) n"
+        )
+    )
+    # an interrupted run built one partition's index without attaching it
+    migration.execute(
+        text("CREATE INDEX ix_online_demo_p0 ON online_demo_parted_p0 (a)")
+    )
+
+    create_index_concurrently("ix_online_demo", "online_demo_parted", "a")
+    add_not_null("online_demo_parted", "a")
+
+    indexes = migration.execute(
+        text(
+            "SELECT x.indexrelid::regclass::text, x.indisvalid FROM pg_index x "
+            "WHERE x.indexrelid IN (SELECT inhrelid FROM pg_inherits "
+            "WHERE inhparent = 'ix_online_demo'::regclass) "
+            "OR x.indexrelid = 'ix_online_demo'::regclass ORDER BY 1"
+        )
+    ).all()
+    assert indexes == [
+        ("ix_online_demo", True),
+        ("ix_online_demo_p0", True),
+        ("ix_online_demo_p1", True),
+    ]
+    assert migration.scalar(
+        text(
+            "SELECT attnotnull FROM pg_attribute WHERE attname = 'a' "
+            "AND attrelid = 'online_demo_parted'::regclass"
+        )
+    )
+    with pytest.raises(IntegrityError):
+        migration.execute(text("INSERT INTO online_demo_parted VALUES (5, NULL)"))
+
+
+def test_lock_timeout_gives_up(
+    migration: Connection, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(online_migrations, "RETRY_DELAY", 0.01)
+    migration.execute(text("CREATE TABLE online_demo (id integer)"))
+    engine = create_engine(SYNC_TEST_DATABASE_URL)
+    with engine.connect() as other, other.begin():
+        # a long transaction holding a lock the DDL needs
+        other.execute(text("SELECT * FROM online_demo"))
+        with pytest.raises(OperationalError) as error:
+            run_guarded(
+                "ALTER TABLE online_demo ADD COLUMN a integer",
+                lock_timeout="50ms",
+                attempts=3,
+            )
+        assert error.value.orig.pgcode == online_migrations.LOCK_NOT_AVAILABLE  # type: ignore[union-attr]
+    engine.dispose()
+    # the timeout only applied to the guarded statement
+    assert migration.scalar(text("SHOW lock_timeout")) == "0"
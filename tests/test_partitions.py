@@ -0,0 +1,256 @@
+"""
+Testing file for the `partitions` maintenance jobs
+"""
+
+import importlib.util
+from datetime import date, datetime, timezone
+from pathlib import Path
+from types import ModuleType
+
+import pytest
+import pytest_asyncio
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import Connection, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models import User
+from backend.partitions import (
+    DEFAULT_PARTITION,
+    add_months,
+    archive_old_partitions,
+    archive_partition,
+    create_future_partitions,
+    get_partition_months,
+    parse_partition_name,
+    partition_name,
+)
+
+
+def test_add_months_wraps_years() -> None:
+    assert add_months(date(2026, 11, 15), 2) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 31), -1) == date(2025, 12, 1)
+    assert add_months(date(2026, 6, 1), 0) == date(2026, 6, 1)
+
+
+def test_partition_name_round_trip() -> None:
+    month = date(2026, 3, 1)
+    assert partition_name(month) == "standard_timer_y2026m03"
+    assert parse_partition_name(partition_name(month)) == month
+    assert parse_partition_name("standard_timer_default") is None
+    assert parse_partition_name("standard_timer_archive") is None
+
+
+MIGRATIONS = Path(__file__).parent.parent / "alembic" / "versions"
+# the partitioning migration and the later ones that changed standard_timer
+TIMER_MIGRATIONS = (
+    "5e81f0a7c2d4_partitioned_standard_timer_by_created_at",
+    "a3e7c5b90d18_added_standard_timer_version",
+    "b8d2f4a61c93_added_standard_timer_pause_intervals",
+)
+INSERT_TIMER = text(
+    "INSERT INTO standard_timer (user_id, minutes, hours, elapsed_seconds, "
+    "total_paused_seconds, total_pause_count, is_started, is_paused, "
+    "is_completed, created_at, updated_at) VALUES (:user_id, 25, 0, 0, 0, 0, "
+    "true, false, :is_completed, :created_at, :created_at) RETURNING id"
+)
+
+
+def load_migration(name: str) -> ModuleType:
+    spec = importlib.util.spec_from_file_location(name, MIGRATIONS / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)  # type: ignore[arg-type]
+    spec.loader.exec_module(module)  # type: ignore[union-attr]
+    return module
+
+
+async def migrate(db: AsyncSession, direction: str) -> None:
+    """
+    Runs the standard_timer migrations on the test session's connection, so
+    the test's rollback undoes them
+    :param db: Database session
+    :param direction: "upgrade" or "downgrade"
+    """
+    names = TIMER_MIGRATIONS if direction == "upgrade" else TIMER_MIGRATIONS[::-1]
+
+    def run(connection: Connection) -> None:
+        with Operations.context(MigrationContext.configure(connection)):
+            for name in names:
+                getattr(load_migration(name), direction)()
+
+    connection = await db.connection()
+    await connection.run_sync(run)
+
+
+async def add_timer(
+    db: AsyncSession, user: User, created_at: datetime, is_completed: bool = False
+) -> int:
+    return await db.scalar(
+        INSERT_TIMER,
+        {
+            "user_id": user.user_id,
+            "is_completed": is_completed,
+            "created_at": created_at,
+        },
+    )
+
+
+async def partition_of(db: AsyncSession, timer_id: int) -> str:
+    return await db.scalar(
+        text("SELECT tableoid::regclass::text FROM standard_timer WHERE id = :id"),
+        {"id": timer_id},
+    )
+
+
+def in_month(month: date) -> datetime:
+    return datetime(month.year, month.month, 15, 12, tzinfo=timezone.utc)
+
+
+THIS_MONTH = datetime.now(timezone.utc).date().replace(day=1)
+
+
+class TestPartitionJobs:
+    """
+    Tests the maintenance jobs against standard_timer partitioned by the
+    migration, with rows that existed before it
+    """
+
+    @pytest_asyncio.fixture
+    async def old_timers(
+        self, db_session: AsyncSession, create_user_in_db: User
+    ) -> tuple[int, int]:
+        """
+        Adds a completed and a running timer from 8 months ago, then
+        partitions the table
+        :return: tuple of (completed timer ID, running timer ID)
+        """
+        old = in_month(add_months(THIS_MONTH, -8))
+        completed = await add_timer(db_session, create_user_in_db, old, True)
+        running = await add_timer(db_session, create_user_in_db, old)
+        await migrate(db_session, "upgrade")
+        return completed, running
+
+    @pytest.mark.asyncio
+    async def test_migration_partitions_existing_rows(
+        self, db_session: AsyncSession, old_timers: tuple[int, int]
+    ) -> None:
+        """
+        Tests that the migration creates a partition per month from the oldest
+        row to 3 months ahead and keeps the rows and their ids
+        """
+        months = await get_partition_months(db_session)
+        assert months == [add_months(THIS_MONTH, n) for n in range(-8, 4)]
+        old_partition = partition_name(add_months(THIS_MONTH, -8))
+        for timer_id in old_timers:
+            assert await partition_of(db_session, timer_id) == old_partition
+        # ids keep coming from the same sequence
+        user_id = await db_session.scalar(text("SELECT user_id FROM users LIMIT 1"))
+        new_id = await db_session.scalar(
+            INSERT_TIMER,
+            {
+                "user_id": user_id,
+                "is_completed": False,
+                "created_at": datetime.now(timezone.utc),
+            },
+        )
+        assert new_id > max(old_timers)
+
+    @pytest.mark.asyncio
+    async def test_migration_downgrade_restores_archived(
+        self, db_session: AsyncSession, old_timers: tuple[int, int]
+    ) -> None:
+        """
+        Tests that downgrading unpacks archived timers back into a plain table
+        """
+        await archive_partition(db_session, add_months(THIS_MONTH, -8))
+        await migrate(db_session, "downgrade")
+        assert (
+            await db_session.scalar(
+                text(
+                    "SELECT relkind::text FROM pg_class WHERE relname = 'standard_timer'"
+                )
+            )
+            == "r"
+        )
+        ids = await db_session.scalars(text("SELECT id FROM standard_timer"))
+        assert sorted(ids) == sorted(old_timers)
+
+    @pytest.mark.asyncio
+    async def test_create_future_partitions(
+        self, db_session: AsyncSession, old_timers: tuple[int, int]
+    ) -> None:
+        """
+        Tests that only the missing months are created
+        """
+        created = await create_future_partitions(
+            db_session, 3, today=add_months(THIS_MONTH, 2)
+        )
+        assert created == [partition_name(add_months(THIS_MONTH, n)) for n in (4, 5)]
+        assert (
+            await create_future_partitions(
+                db_session, 3, today=add_months(THIS_MONTH, 2)
+            )
+            == []
+        )
+
+    @pytest.mark.asyncio
+    async def test_create_partition_over_default_rows(
+        self,
+        db_session: AsyncSession,
+        old_timers: tuple[int, int],
+        create_user_in_db: User,
+    ) -> None:
+        """
+        Tests that rows the default partition caught while the job lagged are
+        moved into the partition created for their month
+        """
+        month = add_months(THIS_MONTH, 6)
+        caught = await add_timer(db_session, create_user_in_db, in_month(month))
+        later = await add_timer(
+            db_session, create_user_in_db, in_month(add_months(month, 6))
+        )
+        assert await partition_of(db_session, caught) == DEFAULT_PARTITION
+
+        created = await create_future_partitions(db_session, 0, today=month)
+        assert created == [partition_name(month)]
+        assert await partition_of(db_session, caught) == partition_name(month)
+        # rows outside the new month stay, and the default partition is back
+        assert await partition_of(db_session, later) == DEFAULT_PARTITION
+        newest = await add_timer(
+            db_session, create_user_in_db, in_month(add_months(month, 7))
+        )
+        assert await partition_of(db_session, newest) == DEFAULT_PARTITION
+
+    @pytest.mark.asyncio
+    async def test_archive_old_partitions(
+        self, db_session: AsyncSession, old_timers: tuple[int, int]
+    ) -> None:
+        """
+        Tests that completed timers are packed into the archive, and that a
+        partition is dropped once its running timers complete too
+        """
+        completed, running = old_timers
+        month = add_months(THIS_MONTH, -8)
+        summary = await archive_old_partitions(db_session, 6)
+        assert summary == {
+            partition_name(month): (1, False),
+            partition_name(add_months(month, 1)): (0, True),
+        }
+        assert await partition_of(db_session, running) == partition_name(month)
+
+        await db_session.execute(
+            text("UPDATE standard_timer SET is_completed = true WHERE id = :id"),
+            {"id": running},
+        )
+        assert await archive_partition(db_session, month) == (1, True)
+        assert month not in await get_partition_months(db_session)
+        count, ids = (
+            await db_session.execute(
+                text(
+                    "SELECT timer_count, jsonb_path_query_array(timers, '$[*].id') "
+                    "FROM standard_timer_archive WHERE month = :month"
+                ),
+                {"month": month},
+            )
+        ).one()
+        assert count == 2
+        assert ids == [completed, running]
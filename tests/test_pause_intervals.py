@@ -0,0 +1,89 @@
+"""
+Testing file for the `pause_intervals` module
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models import StandardTimer, User
+from backend.pause_intervals import (
+    HISTOGRAM_EDGES,
+    append_interval,
+    decode_intervals,
+    get_pause_stats,
+)
+from backend.standard_timer import services
+
+START = datetime(2026, 1, 1, 9, tzinfo=timezone.utc)
+
+
+def at(seconds: int) -> datetime:
+    return START + timedelta(seconds=seconds)
+
+
+def test_append_and_decode() -> None:
+    packed = append_interval(None, START, at(100), at(130))
+    packed = append_interval(packed, START, at(200), at(205))
+    # offsets count from the end of the previous pause
+    assert packed == [100, 30, 70, 5]
+    assert decode_intervals(packed) == [(100, 30), (200, 5)]
+    assert decode_intervals([]) == []
+
+
+def test_resume_records_the_pause() -> None:
+    timer = StandardTimer(minutes=30, hours=0)
+    timer.total_paused_seconds = 0
+    timer.total_pause_count = 0
+    timer.elapsed_seconds = 0
+    timer.is_paused = timer.is_completed = False
+    services.mark_started(timer, START)
+    services.mark_paused(timer, at(60))
+    services.mark_resumed(timer, at(90))
+    services.mark_paused(timer, at(300))
+    # ending a paused timer ends its pause
+    services.mark_ended(timer, at(320))
+    assert decode_intervals(timer.pause_intervals) == [(60, 30), (300, 20)]
+    assert sum(timer.pause_intervals[1::2]) == timer.total_paused_seconds
+
+
+@pytest.mark.asyncio
+async def test_pause_stats(db_session: AsyncSession, create_user_in_db: User) -> None:
+    """
+    Tests the median and histogram computed over several timers
+    :param db_session: Async database session for testing
+    :param create_user_in_db: Created User object saved to database
+    """
+    lengths = [[5, 40], [45, 700, 4000], []]
+    for timer_lengths in lengths:
+        packed: list[int] = []
+        for n, length in enumerate(timer_lengths):
+            paused_at = at(n * 5000)
+            packed = append_interval(
+                packed, START, paused_at, paused_at + timedelta(seconds=length)
+            )
+        db_session.add(
+            StandardTimer(
+                user_id=create_user_in_db.user_id,
+                minutes=0,
+                hours=3,
+                pause_intervals=packed,
+            )
+        )
+    await db_session.commit()
+
+    stats = await get_pause_stats(
+        db_session, StandardTimer.user_id == create_user_in_db.user_id
+    )
+    assert stats["pauses"] == 5
+    assert stats["median_seconds"] == 45
+    histogram = {
+        bucket["from_seconds"]: bucket["count"] for bucket in stats["histogram"]
+    }
+    assert list(histogram) == [0, *HISTOGRAM_EDGES]
+    assert histogram[0] == 1
+    assert histogram[30] == 2
+    assert histogram[600] == 1
+    assert histogram[3600] == 1
+    assert sum(histogram.values()) == 5
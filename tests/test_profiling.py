@@ -0,0 +1,120 @@
+"""
+Testing file for the `profiling` module
+"""
+
+import asyncio
+import os
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from backend.profiling import ProfilingMiddleware
+
+ADMIN_TOKEN = "test-admin-token"
+
+
+def busy_wait(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def build_app(tmp_path: Path, **options) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow_endpoint() -> dict[str, str]:
+        await asyncio.sleep(0.05)
+        busy_wait(0.05)
+        return {"status": "ok"}
+
+    app.add_middleware(
+        ProfilingMiddleware, profiles_dir=str(tmp_path), max_profiles=2, **options
+    )
+    return app
+
+
+@pytest.fixture
+def admin_token(monkeypatch: pytest.MonkeyPatch) -> str:
+    monkeypatch.setenv("ADMIN_TOKEN", ADMIN_TOKEN)
+    return ADMIN_TOKEN
+
+
+@pytest.mark.asyncio
+async def test_collapsed_profile_in_response(tmp_path: Path, admin_token: str) -> None:
+    """
+    Tests returning the profile instead of the response, with awaited and
+    running time both attributed to the endpoint.
+    """
+    transport = ASGITransport(app=build_app(tmp_path))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get(
+            "/slow", headers={"X-Profile": "collapsed", "X-Admin-Token": admin_token}
+        )
+    assert response.status_code == 200
+    assert response.headers["X-Profiled-Status"] == "200"
+    stacks = dict(line.rsplit(" ", 1) for line in response.text.splitlines())
+    awaiting = [
+        stack for stack in stacks if "slow_endpoint" in stack and "[await" in stack
+    ]
+    running = [
+        stack for stack in stacks if stack.endswith(")") and "busy_wait" in stack
+    ]
+    assert awaiting and running
+    # samples start at the task's root and pass through the middleware
+    assert all("respond_with_profile (profiling.py" in stack for stack in stacks)
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_profiles_written_to_bounded_ring(
+    tmp_path: Path, admin_token: str
+) -> None:
+    """
+    Tests writing profiles to disk and keeping only the newest ones.
+    """
+    transport = ASGITransport(app=build_app(tmp_path))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        names = []
+        for _ in range(3):
+            response = await client.get(
+                "/slow", headers={"X-Profile": "1", "X-Admin-Token": admin_token}
+            )
+            assert response.json() == {"status": "ok"}
+            names.append(response.headers["X-Profile-File"])
+    assert sorted(os.listdir(tmp_path)) == sorted(names[1:])
+    assert "slow_endpoint" in (tmp_path / names[-1]).read_text()
+
+
+@pytest.mark.asyncio
+async def test_untriggered_requests_are_not_profiled(
+    tmp_path: Path, admin_token: str
+) -> None:
+    """
+    Tests that requests without a valid trigger are passed through untouched.
+    """
+    transport = ASGITransport(app=build_app(tmp_path))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        plain = await client.get("/slow")
+        unauthorized = await client.get(
+            "/slow", headers={"X-Profile": "collapsed", "X-Admin-Token": "wrong"}
+        )
+    for response in (plain, unauthorized):
+        assert response.json() == {"status": "ok"}
+        assert "X-Profile-File" not in response.headers
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_sampled_requests_are_profiled(tmp_path: Path) -> None:
+    """
+    Tests profiling a sampled fraction of requests without any header.
+    """
+    transport = ASGITransport(app=build_app(tmp_path, sample_rate=1.0))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/slow")
+    assert response.json() == {"status": "ok"}
+    assert os.listdir(tmp_path) == [response.headers["X-Profile-File"]]
@@ -0,0 +1,69 @@
+"""
+Testing file for the `rate_limit` module
+"""
+
+import uuid
+
+import pytest
+from conftest import FakeClock
+from httpx import AsyncClient
+
+from backend.rate_limit import RATE_LIMIT_CONFIG, RateLimiter
+
+
+class TestRateLimiter:
+    """
+    Tests the token-bucket behaviour of the rate limiter.
+    """
+
+    def test_rejects_once_bucket_is_empty(self, fake_clock: FakeClock) -> None:
+        limiter = RateLimiter(capacity=3, refill_per_second=1, clock=fake_clock)
+        assert [limiter.acquire("user") for _ in range(4)] == [True, True, True, False]
+        assert limiter.counters["allowed"] == 3
+        assert limiter.counters["rejected"] == 1
+
+    def test_refills_over_time(self, fake_clock: FakeClock) -> None:
+        limiter = RateLimiter(capacity=2, refill_per_second=0.5, clock=fake_clock)
+        assert limiter.acquire("user") and limiter.acquire("user")
+        assert not limiter.acquire("user")
+        assert limiter.retry_after("user") == 2
+        fake_clock.now = 2.0
+        assert limiter.acquire("user")
+        assert not limiter.acquire("user")
+
+    def test_users_do_not_share_buckets(self, fake_clock: FakeClock) -> None:
+        limiter = RateLimiter(capacity=1, refill_per_second=1, clock=fake_clock)
+        assert limiter.acquire("first")
+        assert not limiter.acquire("first")
+        assert limiter.acquire("second")
+
+    def test_evicts_least_recently_used_bucket(self, fake_clock: FakeClock) -> None:
+        limiter = RateLimiter(
+            capacity=1, refill_per_second=1, max_buckets=2, clock=fake_clock
+        )
+        limiter.acquire("a")
+        limiter.acquire("b")
+        limiter.acquire("a")  # "b" is now the least recently used
+        limiter.acquire("c")
+        assert list(limiter.buckets) == ["a", "c"]
+        assert limiter.counters["evicted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_get_user_rate_limited(async_client: AsyncClient) -> None:
+    """
+    Tests that excess requests from one user are rejected with 429.
+    :param async_client: Async client for testing.
+    """
+    user_id = str(uuid.uuid4())
+    capacity = int(RATE_LIMIT_CONFIG["users"]["capacity"])
+    for _ in range(capacity):
+        response = await async_client.get(
+            f"/users/{user_id}", headers={"X-User-ID": user_id}
+        )
+        assert response.status_code != 429
+    response = await async_client.get(
+        f"/users/{user_id}", headers={"X-User-ID": user_id}
+    )
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] is not None
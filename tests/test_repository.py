@@ -0,0 +1,181 @@
+"""
+Contract tests run against every storage backend
+"""
+
+import uuid
+from dataclasses import FrozenInstanceError
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models import StandardTimer, User
+from backend.queries import UserRow
+from backend.repository import MemoryRepository, PostgresRepository, Repository
+from backend.standard_timer.queries import StandardTimerRow
+
+
+@pytest.fixture(params=["memory", "postgres"])
+def repository(request: pytest.FixtureRequest) -> Repository:
+    """
+    Provides each repository implementation in turn.
+    """
+    if request.param == "memory":
+        return MemoryRepository()
+    return PostgresRepository(request.getfixturevalue("db_session"))
+
+
+async def add_user(repository: Repository) -> User:
+    # the repository only reads, rows are seeded the way each backend stores them
+    user = User(user_id=uuid.uuid4(), timezone="America/New_York")
+    if isinstance(repository, MemoryRepository):
+        return await repository.add_user(user)
+    assert isinstance(repository, PostgresRepository)
+    repository.db.add(user)
+    await repository.db.commit()
+    await repository.db.refresh(user)
+    return user
+
+
+async def add_timer(repository: Repository, user: User, **values) -> StandardTimer:
+    timer = StandardTimer(user_id=user.user_id, **values)
+    if isinstance(repository, MemoryRepository):
+        return await repository.add_standard_timer(timer)
+    assert isinstance(repository, PostgresRepository)
+    repository.db.add(timer)
+    await repository.db.commit()
+    await repository.db.refresh(timer)
+    return timer
+
+
+class TestRepositoryContract:
+    """
+    Tests that every repository behaves the same way.
+    """
+
+    @pytest.mark.asyncio
+    async def test_get_user(self, repository: Repository) -> None:
+        user = await add_user(repository)
+        found = await repository.get_user_by_uuid(str(user.user_id))
+        assert isinstance(found, UserRow)
+        assert found.user_id == user.user_id
+        assert found.timezone == "America/New_York"
+        assert found.created_at is not None
+        assert found.updated_at == user.updated_at
+
+    @pytest.mark.asyncio
+    async def test_get_unknown_user(self, repository: Repository) -> None:
+        assert await repository.get_user_by_uuid(str(uuid.uuid4())) is None
+
+    @pytest.mark.asyncio
+    async def test_get_standard_timer(self, repository: Repository) -> None:
+        user = await add_user(repository)
+        timer = await add_timer(repository, user, minutes=20, hours=1)
+        found = await repository.get_standard_timer(timer.id, str(user.user_id))
+        assert isinstance(found, StandardTimerRow)
+        assert (found.minutes, found.hours) == (20, 1)
+        # column defaults
+        assert found.elapsed_seconds == 0
+        assert found.total_pause_count == 0
+        assert found.is_started is False
+        assert found.version == 1
+
+    @pytest.mark.asyncio
+    async def test_get_standard_timer_other_user(self, repository: Repository) -> None:
+        user = await add_user(repository)
+        timer = await add_timer(repository, user, minutes=20, hours=0)
+        assert await repository.get_standard_timer(timer.id, str(uuid.uuid4())) is None
+        assert await repository.get_standard_timer(-1, str(user.user_id)) is None
+
+    @pytest.mark.asyncio
+    async def test_reads_are_read_only(self, repository: Repository) -> None:
+        user = await add_user(repository)
+        timer = await add_timer(repository, user, minutes=20, hours=0)
+        found = await repository.get_standard_timer(timer.id, str(user.user_id))
+        assert found is not None
+        with pytest.raises(FrozenInstanceError):
+            found.is_started = True  # type: ignore[misc]
+
+
+class TestMemorySeeding:
+    """
+    Tests that seeding the in-memory repository enforces the constraints
+    the database does.
+    """
+
+    @pytest.mark.asyncio
+    async def test_duplicate_user(self, memory_repository: MemoryRepository) -> None:
+        user = await add_user(memory_repository)
+        with pytest.raises(IntegrityError):
+            await memory_repository.add_user(
+                User(user_id=user.user_id, timezone="Europe/London")
+            )
+
+    @pytest.mark.asyncio
+    async def test_timer_unknown_user(
+        self, memory_repository: MemoryRepository
+    ) -> None:
+        with pytest.raises(IntegrityError):
+            await memory_repository.add_standard_timer(
+                StandardTimer(user_id=uuid.uuid4(), minutes=20, hours=0)
+            )
+
+
+@pytest.mark.asyncio
+async def test_get_user_memory_backend(
+    memory_client: AsyncClient, memory_repository: MemoryRepository
+) -> None:
+    """
+    Tests reading a user through the API without a database.
+    :param memory_client: Async client backed by in-memory storage.
+    :param memory_repository: In-memory storage used by the client.
+    """
+    user = await add_user(memory_repository)
+    response = await memory_client.get(f"/users/{user.user_id}")
+    assert response.status_code == 200
+    assert response.json()["timezone"] == "America/New_York"
+
+    missing = await memory_client.get(f"/users/{uuid.uuid4()}")
+    assert missing.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_standard_timer_memory_backend(
+    memory_client: AsyncClient, memory_repository: MemoryRepository
+) -> None:
+    """
+    Tests reading a timer through the API without a database.
+    :param memory_client: Async client backed by in-memory storage.
+    :param memory_repository: In-memory storage used by the client.
+    """
+    user = await add_user(memory_repository)
+    timer = await memory_repository.add_standard_timer(
+        StandardTimer(user_id=user.user_id, minutes=20, hours=0)
+    )
+    response = await memory_client.get(
+        f"/api/standard/{timer.id}", headers={"X-User-ID": str(user.user_id)}
+    )
+    assert response.status_code == 200
+    assert response.json()["minutes"] == 20
+    assert response.json()["server_time"] is not None
+
+
+@pytest.mark.asyncio
+async def test_postgres_reads_skip_identity_map(db_session: AsyncSession) -> None:
+    """
+    Tests that the Core fast path returns plain rows the session doesn't track.
+    :param db_session: Async database session for testing.
+    """
+    repository = PostgresRepository(db_session)
+    user = await add_user(repository)
+    timer = await add_timer(repository, user, minutes=20, hours=0)
+    db_session.expunge_all()
+
+    found_user = await repository.get_user_by_uuid(str(user.user_id))
+    found_timer = await repository.get_standard_timer(timer.id, str(user.user_id))
+    assert isinstance(found_user, UserRow)
+    assert isinstance(found_timer, StandardTimerRow)
+    assert found_user.updated_at == user.updated_at
+    assert found_timer.user_id == user.user_id
+    assert len(db_session.identity_map) == 0
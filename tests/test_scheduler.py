@@ -0,0 +1,112 @@
+"""
+Testing file for the `scheduler` module
+"""
+
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from conftest import FakeClock
+
+from backend.scheduler import TimerScheduler, TimingWheel
+
+
+class TestTimingWheel:
+    """
+    Tests scheduling, cancelling and firing deadlines.
+    """
+
+    def test_fires_at_deadline(self) -> None:
+        wheel = TimingWheel()
+        wheel.schedule("a", 5)
+        wheel.schedule("b", 3)
+        assert wheel.advance(2) == []
+        assert wheel.advance(4) == ["b"]
+        assert wheel.advance(5) == ["a"]
+        assert len(wheel) == 0
+
+    def test_past_deadline_fires_on_next_tick(self) -> None:
+        wheel = TimingWheel(current_tick=100)
+        wheel.schedule("late", 10)
+        assert wheel.deadline("late") == 101
+        assert wheel.advance(101) == ["late"]
+
+    def test_cancel(self) -> None:
+        wheel = TimingWheel()
+        wheel.schedule("a", 10)
+        assert wheel.cancel("a")
+        assert not wheel.cancel("a")
+        assert wheel.advance(20) == []
+
+    def test_reschedule_replaces_deadline(self) -> None:
+        wheel = TimingWheel()
+        wheel.schedule("a", 10)
+        wheel.schedule("a", 30)
+        assert wheel.advance(29) == []
+        assert wheel.advance(30) == ["a"]
+
+    def test_cascades_through_levels(self) -> None:
+        wheel = TimingWheel(current_tick=7, slot_bits=2, levels=3)
+        deadlines = {key: 7 + key for key in range(1, 60)}
+        for key, deadline in deadlines.items():
+            wheel.schedule(key, deadline)
+        fired = []
+        for tick in range(8, 70):
+            for key in wheel.advance(tick):
+                assert deadlines[key] == tick
+                fired.append(key)
+        assert fired == sorted(deadlines)
+
+    def test_deadline_beyond_range(self) -> None:
+        # 4**2 = 16 ticks of range
+        wheel = TimingWheel(slot_bits=2, levels=2)
+        wheel.schedule("far", 100)
+        assert wheel.advance(99) == []
+        assert wheel.advance(100) == ["far"]
+
+
+class TestTimerScheduler:
+    """
+    Tests driving the wheel from the clock.
+    """
+
+    @pytest.mark.asyncio
+    async def test_dispatches_expired_keys(self, fake_clock: FakeClock) -> None:
+        fake_clock.now = 1000.0
+        scheduler = TimerScheduler(clock=fake_clock)
+        fired: list = []
+
+        async def handler(key) -> None:
+            fired.append(key)
+
+        scheduler.subscribe(handler)
+        scheduler.schedule(1, datetime.fromtimestamp(1010.5, timezone.utc))
+        scheduler.schedule(2, datetime.fromtimestamp(1020, timezone.utc))
+        scheduler.cancel(2)
+        fake_clock.now = 1010.9
+        assert await scheduler.run_once() == []
+        fake_clock.now = 1011.0
+        assert await scheduler.run_once() == [1]
+        await asyncio.gather(*scheduler._dispatches)
+        assert fired == [1]
+
+    @pytest.mark.asyncio
+    async def test_handler_errors_do_not_stop_dispatch(
+        self, fake_clock: FakeClock
+    ) -> None:
+        scheduler = TimerScheduler(clock=fake_clock)
+        fired: list = []
+
+        async def failing(key) -> None:
+            raise RuntimeError("boom")
+
+        async def handler(key) -> None:
+            fired.append(key)
+
+        scheduler.subscribe(failing)
+        scheduler.subscribe(handler)
+        scheduler.schedule("a", datetime.fromtimestamp(1, timezone.utc))
+        fake_clock.now = 1.0
+        await scheduler.run_once()
+        await scheduler.stop()
+        assert fired == ["a"]
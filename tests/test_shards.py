@@ -0,0 +1,278 @@
+"""
+Testing file for the shard map in `db` and the `shards` maintenance jobs,
+with the test database and a second one created next to it as shards
+"""
+
+import asyncio
+import os
+import uuid
+from typing import AsyncGenerator
+
+import pytest
+import pytest_asyncio
+from fastapi import Request
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+import backend.db as db_module
+from backend.db import HashRing, ShardMap, get_db, new_user_id
+from backend.models import (
+    Base,
+    StandardTimer,
+    Timezone,
+    User,
+    WebhookDelivery,
+    WebhookSubscription,
+)
+from backend.shards import move_user, rebalance
+from backend.timezones import iana_rows
+
+
+def shard_url(name: str) -> str:
+    return (
+        f"postgresql+asyncpg://{os.getenv('DB_TEST_USER')}:{os.getenv('DB_TEST_PASSWORD')}"
+        f"@{os.getenv('DB_TEST_HOST')}:{os.getenv('DB_TEST_PORT')}/{name}"
+    )
+
+
+SECOND_DATABASE = f"{os.getenv('DB_TEST_NAME')}_shard_b"
+
+
+def test_adding_a_shard_moves_few_users() -> None:
+    user_ids = [uuid.uuid4() for _ in range(20_000)]
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b", "c", "d"])
+    moved = 0
+    counts = {"a": 0, "b": 0, "c": 0, "d": 0}
+    for user_id in user_ids:
+        old, new = before.get(user_id.bytes), after.get(user_id.bytes)
+        counts[new] += 1
+        if old != new:
+            # users only ever move to the new shard
+            assert new == "d"
+            moved += 1
+    assert 0.15 < moved / len(user_ids) < 0.35
+    for count in counts.values():
+        assert abs(count - len(user_ids) / 4) < len(user_ids) / 4 * 0.3
+
+
+def test_new_user_id_lands_on_the_session_shard(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    shard_map = ShardMap({"a": shard_url("a"), "b": shard_url("b")})
+    monkeypatch.setattr(db_module, "_shard_map", shard_map)
+    for shard in ("a", "b"):
+        session = AsyncSession(info={"shard": shard})
+        for _ in range(20):
+            assert shard_map.home(new_user_id(session)) == shard
+
+
+@pytest.mark.asyncio
+async def test_dispose_keeps_the_map_while_draining(
+    monkeypatch: pytest.MonkeyPatch, setup_test_db: None
+) -> None:
+    shard_map = ShardMap(
+        {"a": shard_url(os.getenv("DB_TEST_NAME", "")), "b": shard_url("b")}
+    )
+    monkeypatch.setattr(db_module, "_shard_map", shard_map)
+    engine = db_module.get_engine("a")
+    connection = await engine.connect()
+    disposing = asyncio.create_task(db_module.dispose_engine(drain_timeout=5))
+    await asyncio.sleep(0.1)
+    assert not disposing.done()
+    # late callers get the draining map and its engines, not fresh pools
+    assert db_module.get_shard_map() is shard_map
+    assert db_module.get_engine("a") is engine
+    with pytest.raises(RuntimeError):
+        db_module.get_engine("b")
+    await connection.close()
+    await disposing
+    assert db_module._shard_map is None
+    assert not shard_map.engines
+    assert engine.pool.checkedout() == 0  # type: ignore[attr-defined]
+
+
+@pytest_asyncio.fixture
+async def shard_map(setup_test_db: None) -> AsyncGenerator[ShardMap, None]:
+    """
+    Two shards: the test database and a second database with the same tables
+    """
+    admin = create_async_engine(
+        shard_url(os.getenv("DB_TEST_NAME", "")),
+        poolclass=NullPool,
+        isolation_level="AUTOCOMMIT",
+    )
+    async with admin.connect() as connection:
+        exists = await connection.scalar(
+            text("SELECT 1 FROM pg_database WHERE datname = :name"),
+            {"name": SECOND_DATABASE},
+        )
+        if not exists:
+            await connection.execute(text(f'CREATE DATABASE "{SECOND_DATABASE}"'))
+    second = create_async_engine(shard_url(SECOND_DATABASE), poolclass=NullPool)
+    async with second.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(
+            insert(Timezone), [{"id": id, "name": name} for id, name in iana_rows()]
+        )
+    await second.dispose()
+
+    shards = ShardMap(
+        {"a": shard_url(os.getenv("DB_TEST_NAME", "")), "b": shard_url(SECOND_DATABASE)}
+    )
+    created: list[uuid.UUID] = []
+    shards.created = created  # type: ignore[attr-defined]
+    yield shards
+    async with shards.session_generator("a")() as db:
+        await db.execute(
+            text("DELETE FROM standard_timer WHERE user_id = ANY(:ids)"),
+            {"ids": created},
+        )
+        await db.execute(
+            text("DELETE FROM users WHERE user_id = ANY(:ids)"), {"ids": created}
+        )
+        await db.commit()
+    await shards.dispose()
+    async with admin.connect() as connection:
+        await connection.execute(
+            text(f'DROP DATABASE IF EXISTS "{SECOND_DATABASE}" WITH (FORCE)')
+        )
+    await admin.dispose()
+
+
+async def add_user(shards: ShardMap, shard: str, home: str) -> uuid.UUID:
+    # a user the ring assigns to `home`, created on `shard`
+    while True:
+        user_id = uuid.uuid4()
+        if shards.home(user_id) == home:
+            break
+    async with shards.session_generator(shard)() as db:
+        db.add(User(user_id=user_id, timezone="UTC"))
+        await db.flush()
+        for minutes in (5, 10):
+            db.add(StandardTimer(user_id=user_id, minutes=minutes, hours=0))
+        await db.commit()
+    shards.created.append(user_id)  # type: ignore[attr-defined]
+    return user_id
+
+
+@pytest.mark.asyncio
+async def test_move_user(shard_map: ShardMap) -> None:
+    user_id = await add_user(shard_map, "a", "b")
+    async with shard_map.session_generator("a")() as db:
+        subscription = WebhookSubscription(
+            user_id=user_id, url="https://example.com/hook", secret="s"
+        )
+        db.add(subscription)
+        await db.flush()
+        db.add(
+            WebhookDelivery(
+                subscription_id=subscription.id, event="timer.completed", payload={}
+            )
+        )
+        await db.commit()
+        timer_ids = sorted(
+            await db.scalars(
+                select(StandardTimer.id).where(StandardTimer.user_id == user_id)
+            )
+        )
+
+    assert await move_user(shard_map, user_id, "a", "b")
+    async with shard_map.session_generator("b")() as db:
+        moved = (await db.scalars(select(User).where(User.user_id == user_id))).one()
+        assert moved.timezone == "UTC"
+        # ids are kept, clients keep addressing timers by them
+        assert (
+            sorted(
+                await db.scalars(
+                    select(StandardTimer.id).where(StandardTimer.user_id == user_id)
+                )
+            )
+            == timer_ids
+        )
+        assert await db.scalar(text("SELECT count(*) FROM webhook_deliveries")) == 1
+    async with shard_map.session_generator("a")() as db:
+        assert not await db.scalar(
+            text("SELECT count(*) FROM users WHERE user_id = :id"), {"id": user_id}
+        )
+        assert not await db.scalar(
+            text("SELECT count(*) FROM standard_timer WHERE user_id = :id"),
+            {"id": user_id},
+        )
+    # already moved
+    assert not await move_user(shard_map, user_id, "a", "b")
+
+
+@pytest.mark.asyncio
+async def test_rebalance_after_adding_a_shard(shard_map: ShardMap) -> None:
+    # every user was on "a" before "b" was added
+    stays = [await add_user(shard_map, "a", "a") for _ in range(3)]
+    moves = [await add_user(shard_map, "a", "b") for _ in range(3)]
+    during = ShardMap(shard_map.urls, previous=["a"])
+    try:
+        # not moved yet, still served from the previous shard
+        assert await during.locate(moves[0]) == "a"
+        assert (await rebalance(during, dry_run=True))["a -> b"] == 3
+        assert (await rebalance(during))["a -> b"] == 3
+        assert await during.locate(moves[0]) == "b"
+        assert await during.locate(stays[0]) == "a"
+        assert not await rebalance(during)
+    finally:
+        await during.dispose()
+
+
+def route(
+    user_id: uuid.UUID | None = None, path_user_id: uuid.UUID | None = None
+) -> Request:
+    # a request for `get_db` with the user in the header or the path
+    scope = {
+        "type": "http",
+        "headers": [(b"x-user-id", str(user_id).encode())] if user_id else [],
+        "path_params": {"user_uuid": str(path_user_id)} if path_user_id else {},
+    }
+    return Request(scope)
+
+
+async def routed_shard(request: Request) -> str:
+    async for session in get_db(request):
+        return session.info["shard"]
+    raise AssertionError("get_db yielded no session")
+
+
+@pytest.mark.asyncio
+async def test_get_db_routes_to_the_users_shard(
+    shard_map: ShardMap, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(db_module, "_shard_map", shard_map)
+    on_a = await add_user(shard_map, "a", "a")
+    on_b = await add_user(shard_map, "b", "b")
+    assert await routed_shard(route(on_a)) == "a"
+    assert await routed_shard(route(on_b)) == "b"
+    assert await routed_shard(route(path_user_id=on_a)) == "a"
+    assert await routed_shard(route(path_user_id=on_b)) == "b"
+    # no user, or one the handler rejects, goes to the primary
+    assert await routed_shard(route()) == "a"
+    request = Request({"type": "http", "headers": [(b"x-user-id", b"not-a-uuid")]})
+    assert await routed_shard(request) == "a"
+
+
+@pytest.mark.asyncio
+async def test_get_db_during_rebalance(
+    shard_map: ShardMap, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # every user was on "a" before "b" was added
+    moves = await add_user(shard_map, "a", "b")
+    stays = await add_user(shard_map, "a", "a")
+    during = ShardMap(shard_map.urls, previous=["a"])
+    monkeypatch.setattr(db_module, "_shard_map", during)
+    try:
+        assert await routed_shard(route(moves)) == "a"
+        assert await routed_shard(route(path_user_id=moves)) == "a"
+        assert await move_user(during, moves, "a", "b")
+        assert await routed_shard(route(moves)) == "b"
+        assert await routed_shard(route(path_user_id=moves)) == "b"
+        assert await routed_shard(route(stays)) == "a"
+    finally:
+        await during.dispose()
@@ -0,0 +1,116 @@
+"""
+Testing file for the `single_flight` module
+"""
+
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models import User
+from backend.queries import fetch_user
+from backend.single_flight import single_flight
+
+
+class SlowRead:
+    """
+    Stand-in for a query, held until `release` is set
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.error: Exception | None = None
+        self.cancelled = False
+
+        @single_flight
+        async def read(key: str, db: object = None) -> str:
+            self.calls += 1
+            try:
+                await self.release.wait()
+            except asyncio.CancelledError:
+                self.cancelled = True
+                raise
+            if self.error is not None:
+                raise self.error
+            return f"value of {key}"
+
+        self.read = read
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_read() -> None:
+    slow = SlowRead()
+    # each caller passes its own session, which isn't part of the key
+    tasks = [asyncio.create_task(slow.read("a", db=object())) for _ in range(5)]
+    other = asyncio.create_task(slow.read("b"))
+    await asyncio.sleep(0)
+    slow.release.set()
+    assert await asyncio.gather(*tasks) == ["value of a"] * 5
+    assert await other == "value of b"
+    assert slow.calls == 2
+    assert slow.read.flight.counters == {"calls": 2, "joined": 4}
+    # finished calls are forgotten, the next read queries again
+    assert await slow.read("a") == "value of a"
+    assert slow.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_error_reaches_every_caller() -> None:
+    slow = SlowRead()
+    slow.error = ValueError("boom")
+    tasks = [asyncio.create_task(slow.read("a")) for _ in range(3)]
+    await asyncio.sleep(0)
+    slow.release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert slow.calls == 1
+    assert slow.read.flight.calls == {}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_leaves_the_others_waiting() -> None:
+    slow = SlowRead()
+    leader = asyncio.create_task(slow.read("a"))
+    follower = asyncio.create_task(slow.read("a"))
+    await asyncio.sleep(0)
+    leader.cancel()
+    await asyncio.sleep(0)
+    # the leader's session runs the read, so its cancellation waits for it
+    assert not leader.done()
+    slow.release.set()
+    assert await follower == "value of a"
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert slow.cancelled is False
+
+
+@pytest.mark.asyncio
+async def test_read_is_cancelled_when_every_caller_leaves() -> None:
+    slow = SlowRead()
+    tasks = [asyncio.create_task(slow.read("a")) for _ in range(2)]
+    await asyncio.sleep(0)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    assert slow.cancelled is True
+    assert slow.read.flight.calls == {}
+
+
+@pytest.mark.asyncio
+async def test_fetch_user_shares_the_query(
+    db_session: AsyncSession, create_user_in_db: User
+) -> None:
+    """
+    Tests that concurrent identical reads can run on one session, which a
+    session can't do for separate queries
+    :param db_session: Async database session for testing
+    :param create_user_in_db: Created User object saved to database
+    """
+    user_id = str(create_user_in_db.user_id)
+    rows = await asyncio.gather(*(fetch_user(user_id, db_session) for _ in range(5)))
+    assert {row.user_id for row in rows if row is not None} == {
+        create_user_in_db.user_id
+    }
+    assert await fetch_user(str(uuid.uuid4()), db_session) is None
@@ -2,13 +2,21 @@
 Testing file for the `standard_timer` package
 """
 
+import csv
+import io
+import json
 import uuid
+from datetime import datetime, timedelta, timezone
 
 import pytest
 from httpx import AsyncClient
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from backend.models import User
+from backend.models import StandardTimer, User
+from backend.standard_timer import queries, services
+from backend.standard_timer.routers import commit_transition
+from backend.standard_timer.services import scheduler
 
 
 class TestCreateStandardTimer:
@@ -138,3 +146,515 @@ class TestCreateStandardTimer:
         assert response.json()["timer_id"] is not None
         assert response.json()["minutes"] is not None
         assert response.json()["hours"] is not None
+
+
+class TestExportStandardTimers:
+    """
+    Tests streaming a user's timer history.
+    """
+
+    @staticmethod
+    async def create_timers(
+        async_client: AsyncClient, user: User, count: int
+    ) -> list[str]:
+        timer_ids = []
+        for minutes in range(1, count + 1):
+            response = await async_client.post(
+                "/api/standard",
+                json={"minutes": minutes, "hours": 0},
+                headers={"X-User-ID": str(user.user_id)},
+            )
+            timer_ids.append(response.json()["timer_id"])
+        return timer_ids
+
+    @pytest.mark.asyncio
+    async def test_export_ndjson(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+    ) -> None:
+        """
+        Tests exporting timers as NDJSON in the user's timezone
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        """
+        timer_ids = await self.create_timers(async_client, create_user_in_db, 3)
+        response = await async_client.get(
+            "/api/standard/export?format=ndjson",
+            headers={"X-User-ID": str(create_user_in_db.user_id)},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [str(row["timer_id"]) for row in rows] == timer_ids
+        # America/New_York is UTC-4 or UTC-5 depending on daylight saving time
+        assert rows[0]["created_at"][-6:] in ("-04:00", "-05:00")
+
+    @pytest.mark.asyncio
+    async def test_export_csv(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+    ) -> None:
+        """
+        Tests exporting timers as CSV
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        """
+        await self.create_timers(async_client, create_user_in_db, 2)
+        response = await async_client.get(
+            "/api/standard/export?format=csv",
+            headers={"X-User-ID": str(create_user_in_db.user_id)},
+        )
+        assert response.status_code == 200
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert rows[0][0] == "timer_id"
+        assert [row[1] for row in rows[1:]] == ["1", "2"]
+
+    @pytest.mark.asyncio
+    async def test_export_unknown_user(
+        self, async_client: AsyncClient, db_session: AsyncSession
+    ) -> None:
+        """
+        Tests exporting timers for a user that doesn't exist
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        """
+        response = await async_client.get(
+            "/api/standard/export", headers={"X-User-ID": str(uuid.uuid4())}
+        )
+        assert response.status_code == 400
+        assert response.json()["message"] is not None
+
+    @pytest.mark.asyncio
+    async def test_export_invalid_format(
+        self, async_client: AsyncClient, create_user_in_db: User
+    ) -> None:
+        """
+        Tests requesting an unsupported export format
+        :param async_client: Async client for testing
+        :param create_user_in_db: Created User object saved to database
+        """
+        response = await async_client.get(
+            "/api/standard/export?format=xml",
+            headers={"X-User-ID": str(create_user_in_db.user_id)},
+        )
+        assert response.status_code == 422
+
+
+class TestImportStandardTimers:
+    """
+    Tests bulk importing a user's timer history.
+    """
+
+    @pytest.mark.asyncio
+    async def test_import_ndjson(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+    ) -> None:
+        """
+        Tests importing valid and invalid NDJSON rows
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        """
+        lines = [
+            {
+                "minutes": 25,
+                "hours": 0,
+                "start_time": "2025-01-02T09:00:00",
+                "end_time": "2025-01-02T09:25:00",
+            },
+            {"minutes": 0, "hours": 0},  # zero duration
+            {"minutes": 60, "hours": 1},  # minutes out of range
+            {
+                "minutes": 30,
+                "hours": 1,
+                "start_time": "2025-01-03T09:00:00+00:00",
+                "end_time": "2025-01-03T10:30:00+00:00",
+                "elapsed_seconds": 5400,
+            },
+            # still running, the scheduler would complete it
+            {"minutes": 5, "hours": 0, "start_time": "2025-01-04T09:00:00Z"},
+        ]
+        body = "\n".join(json.dumps(line) for line in lines) + "\nnot json\n"
+        response = await async_client.post(
+            "/api/standard/import?format=ndjson",
+            content=body,
+            headers={"X-User-ID": str(create_user_in_db.user_id)},
+        )
+        assert response.status_code == 200
+        summary = response.json()
+        assert summary["accepted"] == 2
+        assert summary["rejected"] == 4
+        assert [error["line"] for error in summary["errors"]] == [2, 3, 5, 6]
+        assert "at least 1 minute" in summary["errors"][0]["message"]
+        assert "requires an end_time" in summary["errors"][2]["message"]
+
+        timers = (
+            await db_session.scalars(
+                select(StandardTimer)
+                .where(StandardTimer.user_id == create_user_in_db.user_id)
+                .order_by(StandardTimer.id)
+            )
+        ).all()
+        assert [(timer.minutes, timer.hours) for timer in timers] == [(25, 0), (30, 1)]
+        # naive timestamps are read in the user's timezone (America/New_York)
+        assert timers[0].start_time.isoformat() == "2025-01-02T14:00:00+00:00"
+        assert timers[1].is_completed is True
+
+    @pytest.mark.asyncio
+    async def test_import_csv(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+    ) -> None:
+        """
+        Tests importing CSV rows with a header line
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        """
+        body = (
+            "minutes,hours,start_time,end_time\r\n"
+            "5,0,2025-02-01T08:00:00Z,2025-02-01T08:05:00Z\r\n10,2\r\nx,0,,\r\n"
+        )
+        response = await async_client.post(
+            "/api/standard/import?format=csv",
+            content=body,
+            headers={"X-User-ID": str(create_user_in_db.user_id)},
+        )
+        assert response.status_code == 200
+        assert response.json()["accepted"] == 1
+        assert response.json()["rejected"] == 2
+
+    @pytest.mark.asyncio
+    async def test_import_csv_quoted_newline(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+    ) -> None:
+        """
+        Tests that a quoted CSV field may contain a newline
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        """
+        body = (
+            'note,minutes,hours\r\n"first\r\nsecond ""quoted""",5,0\r\n'
+            "plain,x,0\r\n"
+            '"never closed,5,0\r\n'
+        )
+        response = await async_client.post(
+            "/api/standard/import?format=csv",
+            content=body,
+            headers={"X-User-ID": str(create_user_in_db.user_id)},
+        )
+        assert response.status_code == 200
+        summary = response.json()
+        assert summary["accepted"] == 1
+        # numbered by the line each record starts on
+        assert [error["line"] for error in summary["errors"]] == [4, 5]
+        assert summary["errors"][1]["message"] == "Unterminated quoted field"
+
+    @pytest.mark.asyncio
+    async def test_import_too_large(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """
+        Tests that uploads and lines over their limits are refused with 413
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        :param monkeypatch: Lowers the upload limit
+        """
+        headers = {"X-User-ID": str(create_user_in_db.user_id)}
+        line = '{"minutes": 5, "hours": 0}' + " " * services.MAX_IMPORT_LINE_LENGTH
+        response = await async_client.post(
+            "/api/standard/import", content=line, headers=headers
+        )
+        assert response.status_code == 413
+        assert response.json()["accepted"] == 0
+
+        monkeypatch.setattr(services, "MAX_IMPORT_BYTES", 100)
+        response = await async_client.post(
+            "/api/standard/import",
+            content='{"minutes": 5, "hours": 0}\n' * 10,
+            headers=headers,
+        )
+        assert response.status_code == 413
+        assert (await db_session.scalars(select(StandardTimer))).all() == []
+
+    @pytest.mark.asyncio
+    async def test_streamed_upload_limit(self) -> None:
+        """
+        Tests the limit on a body sent without a Content-Length
+        """
+
+        async def chunks():
+            for _ in range(10):
+                yield b'{"minutes": 5, "hours": 0}\n'
+
+        lines = []
+        with pytest.raises(services.ImportTooLarge):
+            async for line in services.iter_lines(chunks(), max_bytes=100):
+                lines.append(line)
+        assert len(lines) == 3
+
+    @pytest.mark.asyncio
+    async def test_import_unknown_user(
+        self, async_client: AsyncClient, db_session: AsyncSession
+    ) -> None:
+        """
+        Tests importing timers for a user that doesn't exist
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        """
+        response = await async_client.post(
+            "/api/standard/import",
+            content='{"minutes": 5, "hours": 0}\n',
+            headers={"X-User-ID": str(uuid.uuid4())},
+        )
+        assert response.status_code == 400
+
+
+class TestStandardTimerTransitions:
+    """
+    Tests starting, pausing, resuming and ending a standard timer, and the
+    completion deadlines kept by the scheduler.
+    """
+
+    @staticmethod
+    async def create_timer(async_client: AsyncClient, user: User) -> str:
+        response = await async_client.post(
+            "/api/standard",
+            json={"minutes": 25, "hours": 0},
+            headers={"X-User-ID": str(user.user_id)},
+        )
+        return response.json()["timer_id"]
+
+    @pytest.mark.asyncio
+    async def test_full_lifecycle(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+    ) -> None:
+        """
+        Tests every transition in order and the scheduled deadline after each
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        """
+        headers = {"X-User-ID": str(create_user_in_db.user_id)}
+        timer_id = await self.create_timer(async_client, create_user_in_db)
+
+        started = await async_client.post(
+            f"/api/standard/start/{timer_id}", headers=headers
+        )
+        assert started.status_code == 200
+        assert started.json()["is_paused"] is False
+        assert started.json()["server_time"] is not None
+        start_time = datetime.fromisoformat(started.json()["start_time"])
+        deadline = scheduler.wheel.deadline(int(timer_id))
+        assert deadline == scheduler.to_tick(start_time + timedelta(minutes=25))
+
+        paused = await async_client.post(
+            f"/api/standard/pause/{timer_id}", headers=headers
+        )
+        assert paused.status_code == 200
+        assert paused.json()["is_paused"] is True
+        assert paused.json()["total_pause_count"] == 1
+        assert int(timer_id) not in scheduler.wheel
+
+        # pretend the pause lasted a minute
+        timer = await db_session.get(StandardTimer, int(timer_id))
+        assert timer is not None
+        timer.last_pause_time = timer.last_pause_time - timedelta(seconds=60)
+        await db_session.commit()
+
+        resumed = await async_client.post(
+            f"/api/standard/resume/{timer_id}", headers=headers
+        )
+        assert resumed.status_code == 200
+        assert resumed.json()["total_paused_seconds"] == 60
+        assert scheduler.wheel.deadline(int(timer_id)) == scheduler.to_tick(
+            start_time + timedelta(minutes=26)
+        )
+
+        ended = await async_client.post(
+            f"/api/standard/end/{timer_id}", headers=headers
+        )
+        assert ended.status_code == 200
+        assert ended.json()["total_pause_count"] == 1
+        assert int(timer_id) not in scheduler.wheel
+        await db_session.refresh(timer)
+        assert timer.is_completed is True
+        assert timer.end_time is not None
+
+    @pytest.mark.asyncio
+    async def test_invalid_transitions(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+    ) -> None:
+        """
+        Tests transitions that don't apply to the timer's state
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        """
+        headers = {"X-User-ID": str(create_user_in_db.user_id)}
+        timer_id = await self.create_timer(async_client, create_user_in_db)
+        for action in ("pause", "resume", "end"):
+            response = await async_client.post(
+                f"/api/standard/{action}/{timer_id}", headers=headers
+            )
+            assert response.status_code == 400
+        await async_client.post(f"/api/standard/start/{timer_id}", headers=headers)
+        response = await async_client.post(
+            f"/api/standard/start/{timer_id}", headers=headers
+        )
+        assert response.json()["message"] == "Timer has already started"
+        response = await async_client.post(
+            f"/api/standard/resume/{timer_id}", headers=headers
+        )
+        assert response.json()["message"] == "Timer is not paused"
+
+    @pytest.mark.asyncio
+    async def test_other_users_timer(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+    ) -> None:
+        """
+        Tests that a user can't start a timer they don't own
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        """
+        timer_id = await self.create_timer(async_client, create_user_in_db)
+        other = User(user_id=uuid.uuid4(), timezone="UTC")
+        db_session.add(other)
+        await db_session.commit()
+        response = await async_client.post(
+            f"/api/standard/start/{timer_id}",
+            headers={"X-User-ID": str(other.user_id)},
+        )
+        assert response.status_code == 404
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("timer_id", ["0", "-1", str(2**31), str(2**63)])
+    async def test_timer_id_out_of_range(
+        self, async_client: AsyncClient, create_user_in_db: User, timer_id: str
+    ) -> None:
+        """
+        Tests that ids the column can't hold are not found rather than errors
+        :param async_client: Async client for testing
+        :param create_user_in_db: Created User object saved to database
+        :param timer_id: Timer ID outside the column's range
+        """
+        headers = {"X-User-ID": str(create_user_in_db.user_id)}
+        response = await async_client.get(f"/api/standard/{timer_id}", headers=headers)
+        assert response.status_code == 404
+        response = await async_client.post(
+            f"/api/standard/start/{timer_id}", headers=headers
+        )
+        assert response.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_complete_expired_timer(
+        self, db_session: AsyncSession, create_user_in_db: User
+    ) -> None:
+        """
+        Tests rescheduling running timers and completing them once expired
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        """
+        now = datetime.now(timezone.utc)
+        expired = StandardTimer(user_id=create_user_in_db.user_id, minutes=1, hours=0)
+        running = StandardTimer(user_id=create_user_in_db.user_id, minutes=30, hours=0)
+        paused = StandardTimer(user_id=create_user_in_db.user_id, minutes=1, hours=0)
+        for timer in (expired, running, paused):
+            timer.start_time = now - timedelta(minutes=5)
+            timer.is_started = True
+        paused.is_paused = True
+        paused.last_pause_time = now - timedelta(minutes=4, seconds=30)
+        db_session.add_all([expired, running, paused])
+        await db_session.commit()
+
+        assert await services.load_running_timers(db_session) == 2
+        # already expired, so it fires on the next tick
+        assert scheduler.wheel.deadline(expired.id) <= scheduler.current_tick() + 1
+        assert scheduler.wheel.deadline(running.id) == scheduler.to_tick(
+            now + timedelta(minutes=25)
+        )
+        assert paused.id not in scheduler.wheel
+
+        assert await queries.complete_expired_timer(running.id, db_session) is None
+        assert await queries.complete_expired_timer(paused.id, db_session) is None
+        row = await queries.complete_expired_timer(expired.id, db_session)
+        assert row is not None and row.user_id == create_user_in_db.user_id
+        assert await queries.complete_expired_timer(expired.id, db_session) is None
+        await db_session.commit()
+        await db_session.refresh(expired)
+        assert expired.is_completed is True
+        assert expired.elapsed_seconds == 60
+        assert expired.end_time == expired.start_time + timedelta(minutes=1)
+
+    @pytest.mark.asyncio
+    async def test_conflicting_transition(self, db_session: AsyncSession) -> None:
+        """
+        Tests two tabs pausing the same timer on separate connections: one
+        pause applies, the other answers 409 with the state it lost to
+        :param db_session: Async database session for testing
+        """
+        # the racing transactions must see committed rows
+        sessions = async_sessionmaker(db_session.bind.engine, expire_on_commit=False)
+        now = datetime.now(timezone.utc)
+        user = User(user_id=uuid.uuid4(), timezone="UTC")
+        timer = StandardTimer(
+            user=user, minutes=25, hours=0, start_time=now, is_started=True
+        )
+        async with sessions() as setup:
+            setup.add_all([user, timer])
+            await setup.commit()
+        user_id = str(user.user_id)
+        try:
+            async with sessions() as first, sessions() as second:
+                first_tab = await queries.get_timer_by_id(timer.id, user_id, first)
+                second_tab = await queries.get_timer_by_id(timer.id, user_id, second)
+                assert first_tab is not None and second_tab is not None
+                assert first_tab.version == second_tab.version == 1
+                services.mark_paused(first_tab, now)
+                services.mark_paused(second_tab, now)
+                assert await commit_transition(first_tab, first) is None
+                response = await commit_transition(second_tab, second)
+
+            assert response is not None and response.status_code == 409
+            state = json.loads(response.body)["timer"]
+            assert state["version"] == 2
+            assert state["is_paused"] is True
+            # the losing pause was not counted
+            assert state["total_pause_count"] == 1
+        finally:
+            async with sessions() as cleanup:
+                await cleanup.execute(
+                    delete(StandardTimer).where(StandardTimer.id == timer.id)
+                )
+                await cleanup.execute(delete(User).where(User.user_id == user.user_id))
+                await cleanup.commit()
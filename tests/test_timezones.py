@@ -0,0 +1,123 @@
+"""
+Testing file for the `timezones` module
+"""
+
+import uuid
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models import Timezone, User
+from backend.timezones import TimezoneRegistry, iana_rows, registry
+
+
+def test_registry_translates_ids() -> None:
+    registry = TimezoneRegistry()
+    registry.load_rows(iana_rows())
+    timezone_id = registry.get_id("Europe/London")
+    assert timezone_id is not None
+    assert registry.name(timezone_id) == "Europe/London"
+    assert registry.zone(timezone_id).key == "Europe/London"
+    assert registry.zone(timezone_id) is registry.zone(timezone_id)
+    assert registry.get_id("Not/AZone") is None
+
+
+@pytest.mark.asyncio
+async def test_user_stores_timezone_id(
+    async_client: AsyncClient, db_session: AsyncSession
+) -> None:
+    """
+    Tests that users keep a timezone id while the API uses names
+    :param async_client: Async client for testing
+    :param db_session: Async database session for testing
+    """
+    response = await async_client.post("/users", json={"timezone": "Asia/Tokyo"})
+    assert response.json()["timezone"] == "Asia/Tokyo"
+    user = await db_session.scalar(
+        select(User).where(User.user_id == response.json()["user_id"])
+    )
+    assert user is not None
+    assert user.timezone_id == registry.get_id("Asia/Tokyo")
+
+    response = await async_client.get(f"/users/{user.user_id}")
+    assert response.json()["timezone"] == "Asia/Tokyo"
+
+
+@pytest.mark.asyncio
+async def test_new_zone_is_added(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Tests creating a user in a zone missing from the table, as after a tzdata update
+    :param async_client: Async client for testing
+    :param db_session: Async database session for testing
+    :param monkeypatch: Restores the registry afterwards
+    """
+    monkeypatch.setattr(registry, "ids", dict(registry.ids))
+    monkeypatch.setattr(registry, "names", dict(registry.names))
+    old_id = registry.ids.pop("Pacific/Chatham")
+    del registry.names[old_id]
+    await db_session.execute(delete(Timezone).where(Timezone.name == "Pacific/Chatham"))
+
+    response = await async_client.post("/users", json={"timezone": "Pacific/Chatham"})
+    assert response.status_code == 200
+    new_id = registry.get_id("Pacific/Chatham")
+    assert new_id == max(registry.names)
+    assert (
+        await db_session.scalar(select(Timezone.name).where(Timezone.id == new_id))
+        == "Pacific/Chatham"
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", ["America/NewYork", "../../etc/passwd"])
+async def test_invalid_timezone(async_client: AsyncClient, name: str) -> None:
+    response = await async_client.post("/users", json={"timezone": name})
+    assert response.status_code == 400
+    assert registry.get_id(name) is None
+
+
+@pytest.mark.asyncio
+async def test_zone_added_by_another_worker(
+    async_client: AsyncClient,
+    db_session: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Tests serving a user whose zone another worker added after this worker
+    loaded its registry
+    :param async_client: Async client for testing
+    :param db_session: Async database session for testing
+    :param monkeypatch: Restores the registry afterwards
+    """
+    monkeypatch.setattr(registry, "ids", dict(registry.ids))
+    monkeypatch.setattr(registry, "names", dict(registry.names))
+    old_id = registry.ids.pop("Pacific/Chatham")
+    del registry.names[old_id]
+    await db_session.execute(delete(Timezone).where(Timezone.name == "Pacific/Chatham"))
+    # the other worker's registry, loaded from the same table
+    other = TimezoneRegistry()
+    await other.load(db_session)
+    new_id = await other.add("Pacific/Chatham", db_session)
+    user = User(user_id=uuid.uuid4(), timezone_id=new_id)
+    db_session.add(user)
+    await db_session.commit()
+    assert registry.get_id("Pacific/Chatham") is None
+
+    response = await async_client.get(f"/users/{user.user_id}")
+    assert response.status_code == 200
+    assert response.json()["timezone"] == "Pacific/Chatham"
+    headers = {"X-User-ID": str(user.user_id)}
+    response = await async_client.post(
+        "/api/standard", json={"minutes": 5, "hours": 0}, headers=headers
+    )
+    response = await async_client.post(
+        f"/api/standard/start/{response.json()['timer_id']}", headers=headers
+    )
+    assert response.status_code == 200
+    assert registry.name(new_id) == "Pacific/Chatham"
+    assert registry.zone(new_id).key == "Pacific/Chatham"
@@ -0,0 +1,143 @@
+"""
+Testing file for the `usage` module
+"""
+
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import usage
+from backend.models import User
+from backend.usage import HyperLogLog, MinuteCounters, UsageRecorder
+
+ADMIN_TOKEN = "test-admin-token"
+NOON = datetime(2026, 10, 19, 12, 0, 30, tzinfo=timezone.utc).timestamp()
+
+
+def test_hyperloglog_estimate() -> None:
+    estimator = HyperLogLog()
+    for n in range(50_000):
+        estimator.add(f"user-{n}")
+        estimator.add(f"user-{n}")  # repeats don't count
+    assert abs(estimator.count() / 50_000 - 1) < 0.03
+    assert HyperLogLog().count() == 0
+
+
+def test_hyperloglog_merge_is_union() -> None:
+    first, second, both = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    for n in range(3000):
+        first.add(f"user-{n}")
+        both.add(f"user-{n}")
+    for n in range(2000, 6000):
+        second.add(f"user-{n}")
+        both.add(f"user-{n}")
+    first.merge(second)
+    assert first.registers == both.registers
+    with pytest.raises(ValueError):
+        HyperLogLog(registers=b"\x00" * 10)
+
+
+def test_minute_counters_reuse_slots() -> None:
+    counters = MinuteCounters(minutes=3)
+    counters.increment("started", 100)
+    counters.increment("started", 100)
+    counters.increment("paused", 101)
+    assert counters.get(100) == {"started": 2}
+    counters.increment("ended", 103)  # same slot as minute 100
+    assert counters.get(100) == {}
+    assert counters.get(103) == {"ended": 1}
+
+
+@pytest.mark.asyncio
+async def test_workers_are_merged(db_session: AsyncSession) -> None:
+    """
+    Tests that shards flushed by two workers are combined on read
+    :param db_session: Async database session for testing
+    """
+    workers = [UsageRecorder(clock=lambda: NOON) for _ in range(2)]
+    for n in range(300):
+        # users seen by both workers are counted once
+        workers[n % 2].record_user(f"user-{n // 2}")
+        workers[n % 2].record_event("started")
+    workers[0].record_event("ended")
+    for worker in workers:
+        await worker.flush(db_session)
+        # flushes replace the worker's rows, repeating one changes nothing
+        worker.dirty_minutes.add(int(NOON // 60))
+        await worker.flush(db_session)
+
+    day = datetime.fromtimestamp(NOON, timezone.utc).date()
+    assert abs(await usage.get_active_users(day, db_session) - 150) <= 3
+    minute = datetime.fromtimestamp(NOON - 30, timezone.utc)
+    assert await usage.get_events_per_minute(minute, db_session) == {
+        minute: {"started": 300, "ended": 1}
+    }
+
+
+@pytest.mark.asyncio
+async def test_get_usage(
+    async_client: AsyncClient,
+    create_user_in_db: User,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Tests the admin usage endpoint after a user starts a timer
+    :param async_client: Async client for testing
+    :param create_user_in_db: Created User object saved to database
+    :param monkeypatch: Sets the admin token
+    """
+    monkeypatch.setenv("ADMIN_TOKEN", ADMIN_TOKEN)
+    monkeypatch.setattr(usage.recorder, "worker_id", uuid.uuid4().hex)
+    headers = {"X-User-ID": str(create_user_in_db.user_id)}
+    response = await async_client.post(
+        "/api/standard", json={"minutes": 5, "hours": 0}, headers=headers
+    )
+    await async_client.post(
+        f"/api/standard/start/{response.json()['timer_id']}", headers=headers
+    )
+
+    response = await async_client.get(
+        "/admin/usage", headers={"X-Admin-Token": ADMIN_TOKEN}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["active_users"] == 1
+    assert body["timers_per_minute"][-1]["started"] == 1
+    assert body["timers_per_minute"][-1]["ended"] == 0
+
+    denied = await async_client.get("/admin/usage")
+    assert denied.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_only_known_users_are_counted(
+    async_client: AsyncClient, create_user_in_db: User
+) -> None:
+    """
+    Tests that X-User-ID values failing validation don't count as active users
+    :param async_client: Async client for testing
+    :param create_user_in_db: Created User object saved to database
+    """
+    for user_id in ("garbage", str(uuid.uuid4()), str(uuid.uuid4())):
+        await async_client.post(
+            "/api/standard",
+            json={"minutes": 5, "hours": 0},
+            headers={"X-User-ID": user_id},
+        )
+        await async_client.post("/api/standard/start/1", headers={"X-User-ID": user_id})
+    assert not usage.recorder.daily_users
+
+    # spelled two ways, counted once
+    user_id = str(create_user_in_db.user_id)
+    for header in (user_id, user_id.upper()):
+        response = await async_client.post(
+            "/api/standard",
+            json={"minutes": 5, "hours": 0},
+            headers={"X-User-ID": header},
+        )
+        assert response.status_code == 200
+    (estimator,) = usage.recorder.daily_users.values()
+    assert estimator.count() == 1
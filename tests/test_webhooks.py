@@ -0,0 +1,413 @@
+"""
+Testing file for the `webhooks` package
+"""
+
+import asyncio
+import ipaddress
+import json
+import uuid
+from typing import AsyncGenerator
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models import User, WebhookDelivery, WebhookSubscription
+from backend.webhooks import services
+from backend.webhooks.services import WebhookDispatcher
+
+
+class StandInReceiver:
+    """
+    Minimal keep-alive HTTP/1.1 server recording the webhooks it receives
+    """
+
+    def __init__(self) -> None:
+        self.status_code = 200
+        self.requests: list[tuple[dict[str, str], bytes]] = []
+        self.connections = 0
+        self.server: asyncio.Server | None = None
+
+    @property
+    def url(self) -> str:
+        assert self.server is not None
+        port = self.server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/hook"
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers: dict[str, str] = {}
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                self.requests.append((headers, body))
+                writer.write(
+                    f"HTTP/1.1 {self.status_code} X\r\nContent-Length: 0\r\n\r\n".encode()
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+@pytest.fixture(autouse=True)
+def dns(monkeypatch: pytest.MonkeyPatch) -> dict[str, str]:
+    """
+    Answers lookups from a dict instead of the network, IP literals resolve
+    to themselves
+    """
+    records = {
+        "example.com": "93.184.215.14",
+        "internal.example.com": "10.0.0.5",
+        "localhost": "127.0.0.1",
+    }
+
+    async def resolve(host: str, port: int) -> list[str]:
+        try:
+            return [str(ipaddress.ip_address(host))]
+        except ValueError:
+            return [records[host]] if host in records else []
+
+    monkeypatch.setattr(services, "resolve", resolve)
+    return records
+
+
+@pytest_asyncio.fixture
+async def receiver(
+    monkeypatch: pytest.MonkeyPatch,
+) -> AsyncGenerator[StandInReceiver, None]:
+    # the stand-in listens on loopback, allowed like an internal receiver
+    monkeypatch.setattr(
+        services, "ALLOWED_NETWORKS", [ipaddress.ip_network("127.0.0.1/32")]
+    )
+    stand_in = StandInReceiver()
+    stand_in.server = await asyncio.start_server(stand_in.handle, "127.0.0.1", 0)
+    yield stand_in
+    await services.close_client()
+    stand_in.server.close()
+    await stand_in.server.wait_closed()
+
+
+async def subscribe(async_client: AsyncClient, user: User, url: str) -> dict[str, str]:
+    response = await async_client.post(
+        "/webhooks", json={"url": url}, headers={"X-User-ID": str(user.user_id)}
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+async def end_new_timer(async_client: AsyncClient, user: User) -> str:
+    headers = {"X-User-ID": str(user.user_id)}
+    response = await async_client.post(
+        "/api/standard", json={"minutes": 5, "hours": 0}, headers=headers
+    )
+    timer_id = response.json()["timer_id"]
+    await async_client.post(f"/api/standard/start/{timer_id}", headers=headers)
+    response = await async_client.post(f"/api/standard/end/{timer_id}", headers=headers)
+    assert response.status_code == 200
+    return timer_id
+
+
+class TestWebhookSubscriptions:
+    """
+    Tests managing a user's webhooks.
+    """
+
+    @pytest.mark.asyncio
+    async def test_create_list_delete(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+    ) -> None:
+        """
+        Tests creating, listing and deleting a webhook
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        """
+        headers = {"X-User-ID": str(create_user_in_db.user_id)}
+        created = await subscribe(
+            async_client, create_user_in_db, "https://example.com/hook"
+        )
+        assert len(created["secret"]) == 64
+
+        listed = await async_client.get("/webhooks", headers=headers)
+        assert listed.json() == [
+            {"webhook_id": created["webhook_id"], "url": "https://example.com/hook"}
+        ]
+        assert "secret" not in listed.json()[0]
+
+        deleted = await async_client.delete(
+            f"/webhooks/{created['webhook_id']}", headers=headers
+        )
+        assert deleted.status_code == 204
+        listed = await async_client.get("/webhooks", headers=headers)
+        assert listed.json() == []
+
+    @pytest.mark.asyncio
+    async def test_invalid_url(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+    ) -> None:
+        """
+        Tests creating a webhook with an invalid URL
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        """
+        response = await async_client.post(
+            "/webhooks",
+            json={"url": "not a url"},
+            headers={"X-User-ID": str(create_user_in_db.user_id)},
+        )
+        assert response.status_code == 422
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "url",
+        [
+            "http://example.com/hook",
+            "https://localhost/hook",
+            "https://169.254.169.254/latest/meta-data",
+            "https://internal.example.com/hook",
+            "https://[::ffff:10.0.0.1]/hook",
+            "https://unknown.example.com/hook",
+        ],
+    )
+    async def test_unsafe_url(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+        url: str,
+    ) -> None:
+        """
+        Tests that webhooks must be public https endpoints
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        :param url: Webhook URL
+        """
+        response = await async_client.post(
+            "/webhooks",
+            json={"url": url},
+            headers={"X-User-ID": str(create_user_in_db.user_id)},
+        )
+        assert response.status_code == 400
+        assert (await db_session.scalars(select(WebhookSubscription))).all() == []
+
+    @pytest.mark.asyncio
+    async def test_delete_other_users_webhook(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+    ) -> None:
+        """
+        Tests that a user can't delete a webhook they don't own
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        """
+        created = await subscribe(
+            async_client, create_user_in_db, "https://example.com/hook"
+        )
+        response = await async_client.delete(
+            f"/webhooks/{created['webhook_id']}",
+            headers={"X-User-ID": str(uuid.uuid4())},
+        )
+        assert response.status_code == 404
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("webhook_id", ["0", str(2**31), "99999999999"])
+    async def test_delete_webhook_id_out_of_range(
+        self, async_client: AsyncClient, create_user_in_db: User, webhook_id: str
+    ) -> None:
+        """
+        Tests that ids the column can't hold are not found rather than errors
+        :param async_client: Async client for testing
+        :param create_user_in_db: Created User object saved to database
+        :param webhook_id: Webhook ID outside the column's range
+        """
+        response = await async_client.delete(
+            f"/webhooks/{webhook_id}",
+            headers={"X-User-ID": str(create_user_in_db.user_id)},
+        )
+        assert response.status_code == 404
+
+
+class TestWebhookDelivery:
+    """
+    Tests queueing and sending timer completion events.
+    """
+
+    @pytest.mark.asyncio
+    async def test_end_timer_delivers_event(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+        receiver: StandInReceiver,
+    ) -> None:
+        """
+        Tests that ending a timer queues an event which the dispatcher sends
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        :param receiver: Local stand-in for the user's endpoint
+        """
+        created = await subscribe(async_client, create_user_in_db, receiver.url)
+        timer_id = await end_new_timer(async_client, create_user_in_db)
+        # nothing is sent on the request path
+        assert receiver.requests == []
+
+        dispatcher = WebhookDispatcher()
+        assert await dispatcher.run_once(db_session) == 1
+        assert len(receiver.requests) == 1
+        headers, body = receiver.requests[0]
+        assert headers["x-webhook-event"] == services.EVENT_TIMER_COMPLETED
+        assert headers["x-webhook-signature"] == services.sign(created["secret"], body)
+        event = json.loads(body)
+        assert event["data"]["timer_id"] == timer_id
+        assert event["data"]["completed_by"] == "user"
+        # delivered rows leave the queue
+        assert (await db_session.scalars(select(WebhookDelivery))).all() == []
+
+    @pytest.mark.asyncio
+    async def test_failed_delivery_is_retried(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+        receiver: StandInReceiver,
+    ) -> None:
+        """
+        Tests that failed deliveries are rescheduled, then given up on
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        :param receiver: Local stand-in for the user's endpoint
+        """
+        await subscribe(async_client, create_user_in_db, receiver.url)
+        await end_new_timer(async_client, create_user_in_db)
+        receiver.status_code = 503
+        dispatcher = WebhookDispatcher()
+        assert await dispatcher.run_once(db_session) == 1
+
+        delivery = (await db_session.scalars(select(WebhookDelivery))).one()
+        await db_session.refresh(delivery)
+        assert delivery.attempts == 1
+        assert delivery.last_error == "HTTP 503"
+        assert delivery.is_failed is False
+        assert delivery.next_attempt_at > delivery.created_at
+        # not due yet
+        assert await dispatcher.run_once(db_session) == 0
+
+        delivery.attempts = services.MAX_ATTEMPTS - 1
+        delivery.next_attempt_at = delivery.created_at
+        await db_session.commit()
+        assert await dispatcher.run_once(db_session) == 1
+        await db_session.refresh(delivery)
+        assert delivery.is_failed is True
+        assert dispatcher.counters == {"delivered": 0, "retried": 1, "failed": 1}
+
+    @pytest.mark.asyncio
+    async def test_delivery_connects_to_checked_address(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+        receiver: StandInReceiver,
+        dns: dict[str, str],
+    ) -> None:
+        """
+        Tests that deliveries connect to the address checked before sending,
+        keeping the host name in the Host header
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        :param receiver: Local stand-in for the user's endpoint
+        :param dns: Fake DNS records
+        """
+        dns["hooks.internal"] = "127.0.0.1"
+        url = receiver.url.replace("127.0.0.1", "hooks.internal")
+        await subscribe(async_client, create_user_in_db, url)
+        await end_new_timer(async_client, create_user_in_db)
+        assert await WebhookDispatcher().run_once(db_session) == 1
+        headers, _ = receiver.requests[0]
+        assert headers["host"] == url.split("/")[2]
+
+    @pytest.mark.asyncio
+    async def test_rebound_host_is_not_sent_to(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+        receiver: StandInReceiver,
+        dns: dict[str, str],
+    ) -> None:
+        """
+        Tests that a host resolving to a private address after the webhook
+        was created gets nothing
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        :param receiver: Local stand-in for the user's endpoint
+        :param dns: Fake DNS records
+        """
+        dns["rebind.example.com"] = "93.184.215.14"
+        await subscribe(async_client, create_user_in_db, "https://rebind.example.com/")
+        await end_new_timer(async_client, create_user_in_db)
+        dns["rebind.example.com"] = "169.254.169.254"
+        assert await WebhookDispatcher().run_once(db_session) == 1
+        delivery = (await db_session.scalars(select(WebhookDelivery))).one()
+        await db_session.refresh(delivery)
+        assert delivery.last_error is not None
+        assert delivery.last_error.startswith("UnsafeWebhookURL")
+
+    @pytest.mark.asyncio
+    async def test_no_subscription_queues_nothing(
+        self,
+        async_client: AsyncClient,
+        db_session: AsyncSession,
+        create_user_in_db: User,
+    ) -> None:
+        """
+        Tests ending a timer for a user without webhooks
+        :param async_client: Async client for testing
+        :param db_session: Async database session for testing
+        :param create_user_in_db: Created User object saved to database
+        """
+        await end_new_timer(async_client, create_user_in_db)
+        assert (await db_session.scalars(select(WebhookDelivery))).all() == []
+        assert (await db_session.scalars(select(WebhookSubscription))).all() == []
+
+
+def test_backoff_doubles_up_to_cap() -> None:
+    delays = [
+        services.backoff_seconds(attempt, rng=lambda: 1.0) for attempt in (1, 2, 3)
+    ]
+    assert delays == [
+        services.BACKOFF_BASE_SECONDS,
+        services.BACKOFF_BASE_SECONDS * 2,
+        services.BACKOFF_BASE_SECONDS * 4,
+    ]
+    assert services.backoff_seconds(50, rng=lambda: 1.0) == services.BACKOFF_CAP_SECONDS
+    assert (
+        services.backoff_seconds(1, rng=lambda: 0.0)
+        == services.BACKOFF_BASE_SECONDS / 2
+    )